@@ -0,0 +1,320 @@
+"""
+Admission control for work that ends up at Gemini or GitHub.
+
+Each upstream has a concurrency limit, a bounded wait queue and a rate budget.
+Interactive calls (both agents) and background calls (the refresher and the job
+workers, which run inside `background()`) get separate limiters, and the
+upstream's rate budget is split between them by ADMISSION_BACKGROUND_SHARE, so
+background work can never take the slots or budget of interactive users. When
+the queue is full, or the budget cannot cover a call within the queue timeout,
+`AdmissionRejected` is raised immediately instead of piling more requests onto
+an upstream that is already returning 429s. The HTTP layer turns that into a
+429/503 response with a `Retry-After` header.
+
+Gemini is called from coroutines, so its limiter is asyncio-based; GitHub
+requests are blocking calls made from worker threads, so its limiter uses
+threading primitives.
+"""
+
+import asyncio
+import contextvars
+import math
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Iterator, Optional
+
+import deadlines
+from github_tokens import configured_tokens
+from metrics import registry as metrics
+
+queue_depth = metrics.gauge(
+    "admission_queue_depth", "Callers waiting for an upstream slot", ("upstream",)
+)
+in_flight = metrics.gauge(
+    "admission_in_flight", "Calls currently holding an upstream slot", ("upstream",)
+)
+rejections = metrics.counter(
+    "admission_rejections_total", "Calls rejected by admission control", ("upstream", "reason")
+)
+admitted = metrics.counter(
+    "admission_admitted_total", "Calls admitted by admission control", ("upstream",)
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when an upstream cannot take more work right now."""
+
+    def __init__(self, upstream: str, reason: str, status_code: int, retry_after: float):
+        super().__init__(f"{upstream}: {reason}")
+        self.upstream = upstream
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class RateBudget:
+    """Thread-safe token bucket measured in arbitrary units (requests or tokens)."""
+
+    def __init__(self, per_second: float, capacity: float):
+        self.per_second = per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.per_second)
+        self._updated = now
+
+    def seconds_until(self, units: float) -> float:
+        """How long until `units` could be spent without waiting."""
+        with self._lock:
+            self._refill()
+            deficit = min(units, self.capacity) - self._tokens
+            return max(0.0, deficit / self.per_second)
+
+    def reserve(self, units: float, max_wait: float) -> Optional[float]:
+        """Spend `units` and return how long to wait first, or None if that exceeds `max_wait`."""
+        units = min(units, self.capacity)
+        with self._lock:
+            self._refill()
+            wait = max(0.0, (units - self._tokens) / self.per_second)
+            if wait > max_wait:
+                return None
+            self._tokens -= units
+            return wait
+
+    def try_spend(self, units: float = 1) -> bool:
+        """Spend `units` only if they are available right now."""
+        return self.reserve(units, 0.0) is not None
+
+
+class _Limiter:
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_queue: int,
+        queue_timeout: float,
+        budget: Optional[RateBudget] = None,
+    ):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.budget = budget
+        self.waiting = 0
+        self.active = 0
+        self._count_lock = threading.Lock()
+        queue_depth.set_function(lambda: self.waiting, upstream=name)
+        in_flight.set_function(lambda: self.active, upstream=name)
+
+    def reject(self, reason: str, status_code: int, retry_after: float) -> AdmissionRejected:
+        rejections.inc(upstream=self.name, reason=reason)
+        return AdmissionRejected(self.name, reason, status_code, retry_after)
+
+    def check(self, units: float = 1) -> None:
+        """Raise now if a new call would be rejected, without taking a slot."""
+        if self.waiting >= self.max_queue:
+            raise self.reject("queue_full", 503, self.queue_timeout)
+        if self.budget is not None:
+            wait = self.budget.seconds_until(units)
+            if wait > self.queue_timeout:
+                raise self.reject("rate_budget", 429, wait)
+
+    def _enqueue(self) -> None:
+        with self._count_lock:
+            if self.waiting >= self.max_queue:
+                raise self.reject("queue_full", 503, self.queue_timeout)
+            self.waiting += 1
+
+    def _dequeue(self, admitted_slot: bool, queued: bool = True) -> None:
+        with self._count_lock:
+            if queued:
+                self.waiting -= 1
+            if admitted_slot:
+                self.active += 1
+
+    def _release(self) -> None:
+        with self._count_lock:
+            self.active -= 1
+
+    def _budget_wait(self, units: float, deadline: float) -> float:
+        if self.budget is None:
+            return 0.0
+        wait = self.budget.reserve(units, max(0.0, deadline - time.monotonic()))
+        if wait is None:
+            raise self.reject("rate_budget", 429, self.budget.seconds_until(units))
+        return wait
+
+
+class AsyncLimiter(_Limiter):
+    """Admission for coroutines: `async with limiter.slot(units): ...`."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+    async def _acquire(self, wait_limit: float) -> None:
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            self._dequeue(True, queued=False)
+            return
+        self._enqueue()
+        acquired = False
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), wait_limit)
+            acquired = True
+        except asyncio.TimeoutError:
+            raise self.reject("queue_timeout", 503, self.queue_timeout)
+        finally:
+            self._dequeue(acquired)
+
+    @asynccontextmanager
+    async def slot(self, units: float = 1):
+        wait_limit = deadlines.timeout(self.queue_timeout)
+        deadline = time.monotonic() + wait_limit
+        await self._acquire(wait_limit)
+        try:
+            wait = self._budget_wait(units, deadline)
+            if wait:
+                await asyncio.sleep(wait)
+            admitted.inc(upstream=self.name)
+            yield
+        finally:
+            self._release()
+            self._semaphore.release()
+
+
+class ThreadLimiter(_Limiter):
+    """Admission for blocking code: `with limiter.slot(units): ...`."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrent)
+
+    @contextmanager
+    def slot(self, units: float = 1):
+        wait_limit = deadlines.timeout(self.queue_timeout)
+        deadline = time.monotonic() + wait_limit
+        if self._semaphore.acquire(blocking=False):
+            self._dequeue(True, queued=False)
+        else:
+            self._enqueue()
+            acquired = False
+            try:
+                acquired = self._semaphore.acquire(timeout=wait_limit)
+            finally:
+                self._dequeue(acquired)
+            if not acquired:
+                raise self.reject("queue_timeout", 503, self.queue_timeout)
+        try:
+            wait = self._budget_wait(units, deadline)
+            if wait:
+                time.sleep(wait)
+            admitted.inc(upstream=self.name)
+            yield
+        finally:
+            self._release()
+            self._semaphore.release()
+
+
+_background: contextvars.ContextVar[bool] = contextvars.ContextVar("admission_background", default=False)
+
+
+@contextmanager
+def background() -> Iterator[None]:
+    """Charge upstream calls made inside the block, and the tasks and threads it starts, to the background pools."""
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+class Upstream:
+    """One upstream with an interactive and a background limiter; calls use the one matching their context."""
+
+    def __init__(self, interactive: _Limiter, background: _Limiter):
+        self.interactive = interactive
+        self.background = background
+
+    def limiter(self) -> _Limiter:
+        return self.background if _background.get() else self.interactive
+
+    def check(self, units: float = 1) -> None:
+        self.limiter().check(units)
+
+    def slot(self, units: float = 1):
+        return self.limiter().slot(units)
+
+
+# Rough token count for budgeting: about four characters per token
+def estimate_tokens(*texts: str) -> int:
+    return max(1, sum(len(t or "") for t in texts) // 4)
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+# Fraction of each upstream's rate budget reserved for background work; neither side is ever left with nothing
+BACKGROUND_SHARE = min(0.9, max(0.05, float(os.getenv("ADMISSION_BACKGROUND_SHARE", "0.25"))))
+
+
+# Split a per-second rate and burst between the interactive and background budgets
+def _budgets(per_second: float, capacity: float):
+    shares = (1.0 - BACKGROUND_SHARE, BACKGROUND_SHARE)
+    return tuple(RateBudget(per_second * share, max(1.0, capacity * share)) for share in shares)
+
+
+_gemini_tpm = _env_int("GEMINI_TOKENS_PER_MINUTE", 1_000_000)
+_gemini_budgets = _budgets(_gemini_tpm / 60.0, _gemini_tpm / 4.0)
+gemini = Upstream(
+    AsyncLimiter(
+        "gemini",
+        max_concurrent=_env_int("GEMINI_MAX_CONCURRENT", 8),
+        max_queue=_env_int("GEMINI_MAX_QUEUE", 32),
+        queue_timeout=QUEUE_TIMEOUT,
+        budget=_gemini_budgets[0],
+    ),
+    AsyncLimiter(
+        "gemini_background",
+        max_concurrent=_env_int("GEMINI_BACKGROUND_MAX_CONCURRENT", 2),
+        max_queue=_env_int("GEMINI_BACKGROUND_MAX_QUEUE", 32),
+        queue_timeout=QUEUE_TIMEOUT,
+        budget=_gemini_budgets[1],
+    ),
+)
+
+# Each pooled token brings its own hourly quota
+_github_tokens = max(1, len(configured_tokens()))
+_github_per_hour = _env_int("GITHUB_REQUESTS_PER_HOUR", 5000 * _github_tokens)
+_github_budgets = _budgets(_github_per_hour / 3600.0, max(1.0, _github_per_hour / 20.0))
+github = Upstream(
+    ThreadLimiter(
+        "github",
+        max_concurrent=_env_int("GITHUB_MAX_CONCURRENT", 16 * _github_tokens),
+        max_queue=_env_int("GITHUB_MAX_QUEUE", 64),
+        queue_timeout=QUEUE_TIMEOUT,
+        budget=_github_budgets[0],
+    ),
+    ThreadLimiter(
+        "github_background",
+        max_concurrent=_env_int("GITHUB_BACKGROUND_MAX_CONCURRENT", 4 * _github_tokens),
+        max_queue=_env_int("GITHUB_BACKGROUND_MAX_QUEUE", 64),
+        queue_timeout=QUEUE_TIMEOUT,
+        budget=_github_budgets[1],
+    ),
+)
+
+agent_runs = AsyncLimiter(
+    "agent_runs",
+    max_concurrent=_env_int("AGENT_MAX_CONCURRENT_RUNS", 16),
+    max_queue=_env_int("AGENT_MAX_QUEUED_RUNS", 32),
+    queue_timeout=QUEUE_TIMEOUT,
+)
@@ -0,0 +1,95 @@
+"""
+Lazily builds the CopilotKit SDK and the LangGraph agents it serves.
+
+Importing copilotkit, langgraph and the Gemini SDKs and compiling both graphs
+takes seconds, so none of it happens at import time of `main`. The registry
+loads everything on first use, or earlier from a background warmup thread.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Optional
+
+
+class AgentRegistry:
+    """Owns the lazily constructed CopilotKit SDK."""
+
+    def __init__(self) -> None:
+        self._sdk: Optional[Any] = None
+        self._lock = threading.Lock()
+        self._warmup_thread: Optional[threading.Thread] = None
+        self.error: Optional[BaseException] = None
+        self.load_seconds: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._sdk is not None
+
+    def status(self) -> str:
+        if self._sdk is not None:
+            return "ready"
+        if self.error is not None:
+            return "error"
+        return "warming"
+
+    # Import the heavy modules and compile both graphs exactly once
+    def load(self) -> Any:
+        if self._sdk is not None:
+            return self._sdk
+        with self._lock:
+            if self._sdk is not None:
+                return self._sdk
+            started = time.perf_counter()
+            try:
+                from copilotkit import CopilotKitSDK, LangGraphAgent
+                from posts_generator_agent import post_generation_graph
+                from stack_agent import stack_analysis_graph
+
+                sdk = CopilotKitSDK(
+                    agents=[
+                        LangGraphAgent(
+                            name="post_generation_agent",
+                            description="An agent that can help with the generation of LinkedIn posts and X posts.",
+                            graph=post_generation_graph,
+                        ),
+                        LangGraphAgent(
+                            name="stack_analysis_agent",
+                            description="Analyze a GitHub repository URL to infer purpose and tech stack (frontend, backend, DB, infra).",
+                            graph=stack_analysis_graph,
+                        ),
+                    ]
+                )
+            except BaseException as exc:
+                self.error = exc
+                raise
+            self.error = None
+            self.load_seconds = time.perf_counter() - started
+            self._sdk = sdk
+        return self._sdk
+
+    # Resolve the SDK from async code without blocking the event loop
+    async def get_sdk(self) -> Any:
+        if self._sdk is not None:
+            return self._sdk
+        return await asyncio.to_thread(self.load)
+
+    def _warmup(self) -> None:
+        try:
+            self.load()
+        except Exception:
+            # The error is kept on the registry and reported by /readyz;
+            # the next request retries the load.
+            pass
+
+    # Start loading in the background so the first request finds a warm SDK
+    def start_warmup(self) -> None:
+        if self._sdk is not None or self._warmup_thread is not None:
+            return
+        self._warmup_thread = threading.Thread(
+            target=self._warmup, name="agent-warmup", daemon=True
+        )
+        self._warmup_thread.start()
+
+
+registry = AgentRegistry()
@@ -0,0 +1,102 @@
+"""
+Headless stack analysis for the REST API and background work.
+
+Runs the same gather and structured-analysis steps as `stack_analysis_graph`,
+without the chat summary, and stores the result in the analysis store.
+"""
+
+import asyncio
+import contextvars
+import functools
+import importlib
+import logging
+import os
+import time
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Optional
+
+import admission
+import logs
+from analysis_store import store
+
+logger = logging.getLogger(__name__)
+
+# Shortest time between two on-demand refreshes of the same repository
+REFRESH_MIN_INTERVAL = float(os.getenv("ANALYSIS_REFRESH_MIN_INTERVAL", "300"))
+
+# Running refreshes by repo key; also keeps the tasks referenced until done
+_in_flight: Dict[str, asyncio.Task] = {}
+# Monotonic time of the last on-demand refresh started, by repo key
+_last_scheduled: Dict[str, float] = {}
+
+
+# Import the heavy stack agent module off the event loop
+async def _stack_agent():
+    return await asyncio.to_thread(importlib.import_module, "stack_agent")
+
+
+# run_in_executor does not carry context variables over; copy them so the
+# admission pool and run deadline of the caller still apply in the thread
+async def _in_executor(executor: Optional[Executor], fn: Callable, *args: Any) -> Any:
+    call = functools.partial(contextvars.copy_context().run, fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+
+async def head_sha(owner: str, repo: str, executor: Optional[Executor] = None) -> Optional[str]:
+    """Commit SHA at the tip of the repository's default branch."""
+    stack_agent = await _stack_agent()
+    return await _in_executor(executor, stack_agent._fetch_head_sha, owner, repo)
+
+
+async def analyze_repository(
+    owner: str, repo: str, executor: Optional[Executor] = None
+) -> Optional[Dict[str, Any]]:
+    """Gather context, run the structured analysis and store it; return the stored record."""
+    stack_agent = await _stack_agent()
+    context = await _in_executor(executor, stack_agent._gather_repo_context, owner, repo)
+    if not context.get("repo_info"):
+        return None
+    payload, _ = await stack_agent._run_structured_analysis(context, None)
+    if payload is None:
+        return None
+    return await asyncio.to_thread(store.save, owner, repo, payload, context.get("commit_sha"))
+
+
+def refresh_retry_after(owner: str, repo: str) -> float:
+    """Seconds until `schedule_refresh` will accept the repository again (0 when it would now)."""
+    last = _last_scheduled.get(store.key(owner, repo))
+    return 0.0 if last is None else max(0.0, last + REFRESH_MIN_INTERVAL - time.monotonic())
+
+
+def schedule_refresh(owner: str, repo: str) -> bool:
+    """Start a background re-analysis unless one is running or one started within
+    REFRESH_MIN_INTERVAL; return True if started."""
+    key = store.key(owner, repo)
+    if key in _in_flight or refresh_retry_after(owner, repo) > 0:
+        return False
+    now = time.monotonic()
+    if len(_last_scheduled) >= 4096:
+        for stale in [k for k, t in _last_scheduled.items() if t + REFRESH_MIN_INTERVAL <= now]:
+            del _last_scheduled[stale]
+    _last_scheduled[key] = now
+    # The refresh runs on after the request returns, so it is background work
+    with admission.background():
+        task = asyncio.get_running_loop().create_task(analyze_repository(owner, repo))
+    _in_flight[key] = task
+
+    def _done(t: asyncio.Task):
+        _in_flight.pop(key, None)
+        if t.cancelled():
+            return
+        fields = logs.fields(repo=f"{owner}/{repo}")
+        if t.exception() is not None:
+            logger.warning("Background refresh failed", exc_info=t.exception(), extra=fields)
+        elif t.result() is None:
+            logger.warning("Background refresh produced no analysis", extra=fields)
+
+    task.add_done_callback(_done)
+    return True
+
+
+def is_refreshing(owner: str, repo: str) -> bool:
+    return store.key(owner, repo) in _in_flight
@@ -0,0 +1,195 @@
+"""
+SQLite store of the most recent stack analysis per GitHub repository.
+
+Every successful analysis (interactive or background) is written here, so the
+REST endpoint can answer "the stack of repo X" without a graph run. Request
+counts are buffered in memory and written in one transaction every
+ANALYSIS_REQUEST_FLUSH_SECONDS, off the event loop.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+REQUEST_FLUSH_SECONDS = float(os.getenv("ANALYSIS_REQUEST_FLUSH_SECONDS", "5"))
+
+logger = logging.getLogger(__name__)
+
+
+# Hash the canonical JSON so equal analyses share an ETag
+def _etag(analysis: Dict[str, Any]) -> str:
+    canonical = json.dumps(analysis, sort_keys=True, separators=(",", ":"))
+    return '"%s"' % hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+class AnalysisStore:
+    """Latest analysis per (owner, repo), keyed case-insensitively."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        # repo_key -> [owner, repo, hits, last_requested] not yet written
+        self._pending_requests: Dict[str, List[Any]] = {}
+        self._pending_lock = threading.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        with self._conn() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS analyses (
+                    repo_key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    repo TEXT NOT NULL,
+                    analysis TEXT NOT NULL,
+                    etag TEXT NOT NULL,
+                    commit_sha TEXT,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS analysis_requests (
+                    repo_key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    repo TEXT NOT NULL,
+                    hits INTEGER NOT NULL,
+                    last_requested REAL NOT NULL
+                )
+                """
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def key(owner: str, repo: str) -> str:
+        return f"{owner}/{repo}".lower()
+
+    def get(self, owner: str, repo: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT * FROM analyses WHERE repo_key = ?", (self.key(owner, repo),)
+        ).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        record["analysis"] = json.loads(record["analysis"])
+        return record
+
+    def save(
+        self,
+        owner: str,
+        repo: str,
+        analysis: Dict[str, Any],
+        commit_sha: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        record = {
+            "repo_key": self.key(owner, repo),
+            "owner": owner,
+            "repo": repo,
+            "analysis": json.dumps(analysis),
+            "etag": _etag(analysis),
+            "commit_sha": commit_sha,
+            "updated_at": time.time(),
+        }
+        with self._conn() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO analyses
+                    (repo_key, owner, repo, analysis, etag, commit_sha, updated_at)
+                VALUES
+                    (:repo_key, :owner, :repo, :analysis, :etag, :commit_sha, :updated_at)
+                """,
+                record,
+            )
+        return {**record, "analysis": analysis}
+
+    # Count a request for a repository's analysis (API read or interactive run);
+    # only touches memory, so it is safe to call on the event loop
+    def record_request(self, owner: str, repo: str) -> None:
+        key = self.key(owner, repo)
+        now = time.time()
+        with self._pending_lock:
+            entry = self._pending_requests.get(key)
+            if entry is None:
+                self._pending_requests[key] = [owner, repo, 1, now]
+            else:
+                entry[2] += 1
+                entry[3] = now
+
+    # Write the buffered request counts in one transaction; returns the repositories written
+    def flush_requests(self) -> int:
+        with self._pending_lock:
+            pending, self._pending_requests = self._pending_requests, {}
+        if not pending:
+            return 0
+        try:
+            self._write_requests(pending)
+        except sqlite3.Error:
+            # Put the counts back so the next flush retries them
+            with self._pending_lock:
+                for key, (owner, repo, hits, last) in pending.items():
+                    entry = self._pending_requests.setdefault(key, [owner, repo, 0, last])
+                    entry[2] += hits
+                    entry[3] = max(entry[3], last)
+            raise
+        return len(pending)
+
+    def _write_requests(self, pending: Dict[str, List[Any]]) -> None:
+        with self._conn() as conn:
+            conn.executemany(
+                """
+                INSERT INTO analysis_requests (repo_key, owner, repo, hits, last_requested)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (repo_key) DO UPDATE
+                    SET hits = hits + excluded.hits,
+                        last_requested = max(last_requested, excluded.last_requested)
+                """,
+                [(key, *entry) for key, entry in pending.items()],
+            )
+
+    # Most requested repositories seen since `since` (epoch seconds)
+    def most_requested(self, limit: int, since: float = 0.0) -> List[Tuple[str, str]]:
+        self.flush_requests()
+        rows = self._conn().execute(
+            """
+            SELECT owner, repo FROM analysis_requests
+            WHERE last_requested >= ?
+            ORDER BY hits DESC LIMIT ?
+            """,
+            (since, limit),
+        ).fetchall()
+        return [(row["owner"], row["repo"]) for row in rows]
+
+    async def _flush_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.flush_requests)
+            except sqlite3.Error:
+                logger.warning("Writing analysis request counts failed", exc_info=True)
+
+    def start(self, interval: float = REQUEST_FLUSH_SECONDS) -> None:
+        if self._flusher is None:
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_loop(interval))
+
+    async def stop(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await asyncio.to_thread(self.flush_requests)
+
+
+store = AnalysisStore(os.getenv("ANALYSIS_DB_PATH", "analyses.db"))
@@ -0,0 +1,195 @@
+"""
+Content-addressed store of file contents fetched from GitHub, keyed by git blob SHA.
+
+The Contents and Trees APIs report each file's blob SHA, so a file seen in any
+repository (the same `package.json`, `Dockerfile` or README template) is read
+from here instead of being downloaded again. Blobs are compressed on disk
+with zstd (`zstandard`, declared in pyproject.toml), and the most recently
+used ones are also kept decompressed in memory. An environment installed
+without `zstandard` falls back to zlib; each file is tagged by its magic
+bytes, so either kind is read back, but zstd blobs written elsewhere are
+treated as missing and downloaded again.
+
+A blob may hold only the start of a file when the download was capped;
+callers compare its length with what they need. A complete blob is checked
+against its SHA before it is stored. `put_content` stores any complete
+content under its own SHA, for callers that keep large values out of graph
+state and hold only the reference.
+
+The directory is kept under `max_disk_bytes`: every PRUNE_EVERY writes, the
+least recently used files (by modification time, refreshed on reads) are
+removed until it is back under 90% of the cap.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from metrics import registry as metrics
+
+try:
+    import zstandard
+except ImportError:  # declared dependency, but keep working with zlib if it is missing
+    zstandard = None
+
+SHA = re.compile(r"^[0-9a-f]{40}$")
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+PRUNE_EVERY = 100
+READ_ERRORS = (OSError, ValueError, zlib.error) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+blob_hits = metrics.counter("blob_store_hits_total", "Blob reads served without a download", ("tier",))
+blob_misses = metrics.counter("blob_store_misses_total", "Blob reads that had to be downloaded")
+blob_rejected = metrics.counter("blob_store_rejected_total", "Complete blobs whose content did not match their SHA")
+
+
+# Git object id of a complete file
+def git_blob_sha(data: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def _compress(data: bytes) -> bytes:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, 9)
+
+
+def _decompress(raw: bytes) -> Optional[bytes]:
+    if raw.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            return None
+        return zstandard.ZstdDecompressor().decompress(raw)
+    return zlib.decompress(raw)
+
+
+class BlobStore:
+    """Compressed blobs on disk plus a byte-capped LRU of decompressed ones in memory."""
+
+    def __init__(self, directory: str, cache_bytes: int, max_disk_bytes: int):
+        self.directory = directory
+        self.cache_bytes = cache_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.cached_bytes = 0
+        self._writes = 0
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        metrics.gauge("blob_store_memory_bytes", "Decompressed blob bytes held in memory").set_function(
+            lambda: self.cached_bytes
+        )
+
+    def _path(self, sha: str) -> str:
+        return os.path.join(self.directory, sha[:2], sha)
+
+    def _remember(self, sha: str, data: bytes) -> None:
+        with self._lock:
+            previous = self._cache.pop(sha, None)
+            if previous is not None:
+                self.cached_bytes -= len(previous)
+            if len(data) > self.cache_bytes:
+                return
+            self._cache[sha] = data
+            self.cached_bytes += len(data)
+            while self.cached_bytes > self.cache_bytes:
+                _, old = self._cache.popitem(last=False)
+                self.cached_bytes -= len(old)
+
+    def _load(self, sha: str) -> Tuple[Optional[bytes], str]:
+        if not SHA.match(sha):
+            return None, "memory"
+        with self._lock:
+            data = self._cache.get(sha)
+            if data is not None:
+                self._cache.move_to_end(sha)
+                return data, "memory"
+        try:
+            with open(self._path(sha), "rb") as f:
+                data = _decompress(f.read())
+            os.utime(self._path(sha))
+        except READ_ERRORS:
+            data = None
+        if data is not None:
+            self._remember(sha, data)
+        return data, "disk"
+
+    def get(self, sha: str) -> Optional[bytes]:
+        """Stored content for `sha` (possibly only its start), or None."""
+        data, tier = self._load(sha)
+        if data is None:
+            blob_misses.inc()
+        else:
+            blob_hits.inc(tier=tier)
+        return data
+
+    def put_content(self, data: bytes) -> Optional[str]:
+        """Store complete content under its own blob SHA; the SHA, or None when it could not be kept."""
+        sha = git_blob_sha(data)
+        return sha if self.put(sha, data, len(data)) else None
+
+    def put(self, sha: str, data: bytes, size: Optional[int] = None) -> bool:
+        """Store `data` under `sha`; `size` is the full file size. False when the blob was not kept."""
+        if not SHA.match(sha):
+            return False
+        if size is not None and len(data) == size and git_blob_sha(data) != sha:
+            blob_rejected.inc()
+            return False
+        current, _ = self._load(sha)
+        if current is not None and len(current) >= len(data):
+            return True
+        path = self._path(sha)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(_compress(data))
+                os.replace(tmp, path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        except OSError:
+            # Disk trouble only costs a later download
+            pass
+        self._remember(sha, data)
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+        return True
+
+    def prune(self) -> int:
+        """Remove the least recently used files until the directory is under 90% of its cap; returns files removed."""
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        if total <= self.max_disk_bytes:
+            return 0
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+store = BlobStore(
+    os.getenv("BLOB_STORE_DIR", "blobs"),
+    int(os.getenv("BLOB_CACHE_BYTES", str(64 * 1024 * 1024))),
+    int(os.getenv("BLOB_STORE_MAX_BYTES", str(1024 * 1024 * 1024))),
+)
@@ -0,0 +1,377 @@
+"""
+Bulk post generation from a topic file.
+
+Topics come from CSV (a `topic` column, optional `id`) or JSONL (`{"topic": ...,
+"id": ...}` per line, or plain strings). Topics whose content words overlap are
+grouped and researched with one grounded search, so near-duplicates ("Nvidia
+earnings", "Nvidia Q3 earnings") share search results. Research and drafting
+run with bounded parallelism and every finished topic is appended to a JSONL
+output file right away.
+
+The output file is the checkpoint: a rerun with the same output skips topics
+already written with status "ok" and retries the failed ones. Before resuming,
+the file is rewritten with one record per topic id (the last one written wins)
+and without the failed records about to be retried, so a finished run holds
+exactly one record per topic. Research is also kept next to it
+(`<output>.research.jsonl`), so a resumed run does not search again for topics
+whose research finished.
+
+Usage:
+    python bulk_posts.py topics.csv -o posts.jsonl [--concurrency 4] [--candidates 1]
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import admission
+import drafts
+
+CONCURRENCY = int(os.getenv("BULK_POSTS_CONCURRENCY", "4"))
+# Minimum content-word overlap (Jaccard) for two topics to share research
+RESEARCH_SIMILARITY = float(os.getenv("BULK_POSTS_RESEARCH_SIMILARITY", "0.5"))
+MAX_GROUP = int(os.getenv("BULK_POSTS_MAX_GROUP", "5"))
+OUTPUT_DIR = os.getenv("BULK_POSTS_OUTPUT_DIR", "bulk_posts")
+ADMISSION_RETRIES = 5
+
+STOPWORDS = {
+    "a", "about", "an", "and", "are", "as", "at", "be", "by", "for", "from", "generate", "how", "in",
+    "is", "it", "its", "latest", "new", "news", "of", "on", "or", "post", "posts", "the", "this",
+    "to", "what", "why", "with", "write",
+}
+WORD = re.compile(r"[a-z0-9][a-z0-9+#.-]*")
+
+
+class Topic:
+    __slots__ = ("id", "text")
+
+    def __init__(self, id: str, text: str):
+        self.id = id
+        self.text = text
+
+
+def _topic_id(text: str) -> str:
+    return hashlib.sha1(" ".join(text.lower().split()).encode()).hexdigest()[:12]
+
+
+def _topic(item: Any) -> Optional[Topic]:
+    if isinstance(item, str):
+        text, topic_id = item, None
+    elif isinstance(item, dict):
+        text = item.get("topic") or item.get("prompt") or ""
+        topic_id = item.get("id")
+    else:
+        return None
+    text = str(text).strip()
+    if not text:
+        return None
+    return Topic(str(topic_id) if topic_id not in (None, "") else _topic_id(text), text)
+
+
+def parse_topics(content: str, fmt: str) -> List[Topic]:
+    """Topics from CSV or JSONL text; repeated ids keep their first occurrence."""
+    if fmt == "csv":
+        reader = csv.DictReader(io.StringIO(content))
+        column = "topic" if "topic" in (reader.fieldnames or []) else (reader.fieldnames or [None])[0]
+        items = [{"id": row.get("id"), "topic": row.get(column)} for row in reader]
+    elif fmt == "jsonl":
+        items = [json.loads(line) for line in content.splitlines() if line.strip()]
+    else:
+        raise ValueError(f"Unsupported topic format: {fmt}")
+    return unique_topics(items)
+
+
+def unique_topics(items: Iterable[Any]) -> List[Topic]:
+    topics, seen = [], set()
+    for item in items:
+        topic = _topic(item)
+        if topic is not None and topic.id not in seen:
+            seen.add(topic.id)
+            topics.append(topic)
+    return topics
+
+
+# Stable key for a batch: the same topics and candidate count give the same job
+def batch_key(topics: List[Topic], candidates: int) -> str:
+    return hashlib.sha1(f"{candidates}:{','.join(sorted(t.id for t in topics))}".encode()).hexdigest()
+
+
+def job_output_path(job_id: str) -> str:
+    return os.path.join(OUTPUT_DIR, f"{job_id}.jsonl")
+
+
+def read_topics(path: str) -> List[Topic]:
+    fmt = "csv" if path.lower().endswith(".csv") else "jsonl"
+    with open(path, encoding="utf-8") as f:
+        return parse_topics(f.read(), fmt)
+
+
+def _terms(text: str) -> frozenset:
+    return frozenset(w.rstrip("s") for w in WORD.findall(text.lower()) if w not in STOPWORDS)
+
+
+# Greedy grouping: each topic joins the first group whose first topic it overlaps enough
+def group_topics(topics: List[Topic], threshold: float = RESEARCH_SIMILARITY, max_group: int = MAX_GROUP) -> List[List[Topic]]:
+    groups: List[List[Topic]] = []
+    heads: List[frozenset] = []
+    for topic in topics:
+        terms = _terms(topic.text)
+        for group, head in zip(groups, heads):
+            if len(group) < max_group and terms and head and len(terms & head) / len(terms | head) >= threshold:
+                group.append(topic)
+                break
+        else:
+            groups.append([topic])
+            heads.append(terms)
+    return groups
+
+
+def research_prompt(group: List[Topic]) -> str:
+    if len(group) == 1:
+        return group[0].text
+    listed = "\n".join(f"- {topic.text}" for topic in group)
+    return f"Research these closely related topics together and cover what each of them needs:\n{listed}"
+
+
+def _read_jsonl(path: str) -> List[Dict[str, Any]]:
+    records = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue  # a line cut short by an interrupted run
+    except FileNotFoundError:
+        pass
+    return records
+
+
+# Rewrite the output with the last record per topic id, minus failures of topics
+# in `retrying`; return the ids that already succeeded
+def _compact_output(path: str, retrying: set) -> set:
+    if not os.path.exists(path):
+        return set()
+    latest: Dict[Any, Dict[str, Any]] = {}
+    for record in _read_jsonl(path):
+        latest.pop(record.get("id"), None)
+        latest[record.get("id")] = record
+    done = {topic_id for topic_id, record in latest.items() if record.get("status") == "ok"}
+    temp = path + ".tmp"
+    with open(temp, "w", encoding="utf-8") as f:
+        for topic_id, record in latest.items():
+            if topic_id in done or topic_id not in retrying:
+                f.write(json.dumps(record) + "\n")
+    os.replace(temp, path)
+    return done
+
+
+class _JsonlWriter:
+    """Appends one record per line and flushes it, so results survive an interruption.
+
+    Blocking; `run_bulk` calls it from worker threads, so writes take a lock.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class BulkStats:
+    def __init__(self, total: int, skipped: int):
+        self.total = total
+        self.skipped = skipped
+        self.succeeded = 0
+        self.failed = 0
+        self.research_calls = 0
+        self.research_reused = 0
+        self.started = time.perf_counter()
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        finished = self.succeeded + self.failed
+        return {
+            "total": self.total,
+            "skipped": self.skipped,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "research_calls": self.research_calls,
+            "research_reused": self.research_reused,
+            "elapsed_seconds": round(elapsed, 1),
+            "topics_per_minute": round(finished * 60 / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+
+# Retry calls the Gemini limiter turned away, after the wait it suggests
+async def _admitted(factory: Callable[[], Any]) -> Any:
+    for attempt in range(ADMISSION_RETRIES):
+        try:
+            return await factory()
+        except admission.AdmissionRejected as exc:
+            if attempt == ADMISSION_RETRIES - 1:
+                raise
+            await asyncio.sleep(exc.retry_after)
+
+
+async def _research(text: str) -> str:
+    from posts_generator_agent import research
+
+    response = await _admitted(lambda: research(text))
+    return response.text or ""
+
+
+async def _draft(topic: Topic, context: str, candidates: int) -> List[Dict[str, Any]]:
+    from langchain_core.messages import HumanMessage, SystemMessage
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    import deadlines
+    from prompts import system_prompt_3
+
+    prompt = drafts.candidate_prompt(system_prompt_3.replace("{context}", context), candidates)
+    messages = [SystemMessage(content=prompt), HumanMessage(content=topic.text)]
+    model = ChatGoogleGenerativeAI(
+        model="gemini-2.5-pro",
+        temperature=1.0,
+        max_retries=2,
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+    ).with_structured_output(drafts.DraftCandidates)
+
+    async def call():
+        async with admission.gemini.slot(admission.estimate_tokens(prompt, topic.text)):
+            return await deadlines.call(model.ainvoke(messages))
+
+    ranked = drafts.rank_candidates(drafts.parse_candidates(await _admitted(call)))
+    if not ranked:
+        raise ValueError("The model returned no drafts")
+    return ranked
+
+
+async def run_bulk(
+    topics: List[Topic],
+    output_path: str,
+    concurrency: int = CONCURRENCY,
+    candidates: int = 1,
+    similarity: float = RESEARCH_SIMILARITY,
+    on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    research: Callable[[str], Any] = _research,
+    draft: Callable[[Topic, str, int], Any] = _draft,
+) -> Dict[str, Any]:
+    """Research and draft `topics` into `output_path`, resuming from what it already holds."""
+    done = await asyncio.to_thread(_compact_output, output_path, {t.id for t in topics})
+    research_path = output_path + ".research.jsonl"
+    known: Dict[str, str] = {}
+    for record in await asyncio.to_thread(_read_jsonl, research_path):
+        for topic_id in record.get("topic_ids", []):
+            known[topic_id] = record.get("text", "")
+
+    pending = [t for t in topics if t.id not in done]
+    stats = BulkStats(len(topics), len(topics) - len(pending))
+    groups = [[t] for t in pending if t.id in known]
+    groups += group_topics([t for t in pending if t.id not in known], similarity)
+    candidates = max(1, min(candidates, drafts.MAX_CANDIDATES))
+    semaphore = asyncio.Semaphore(concurrency)
+    output = await asyncio.to_thread(_JsonlWriter, output_path)
+    research_log = await asyncio.to_thread(_JsonlWriter, research_path)
+
+    async def finish(topic: Topic, record: Dict[str, Any]) -> None:
+        await asyncio.to_thread(output.write, {"id": topic.id, "topic": topic.text, **record})
+        if record["status"] == "ok":
+            stats.succeeded += 1
+        else:
+            stats.failed += 1
+        if on_progress is not None:
+            await on_progress(stats.as_dict())
+
+    async def draft_one(topic: Topic, context: str, group_id: str) -> None:
+        started = time.perf_counter()
+        try:
+            async with semaphore:
+                ranked = await draft(topic, context, candidates)
+        except Exception as exc:
+            await finish(topic, {"status": "failed", "error": repr(exc)})
+            return
+        best = ranked[0]
+        record = {
+            "status": "ok",
+            "tweet": best["tweet"],
+            "linkedIn": best["linkedIn"],
+            "score": best["score"],
+            "research_group": group_id,
+            "seconds": round(time.perf_counter() - started, 2),
+        }
+        if len(ranked) > 1:
+            record["alternatives"] = ranked[1:]
+        await finish(topic, record)
+
+    async def run_group(group: List[Topic]) -> None:
+        group_id = _topic_id(" ".join(sorted(t.id for t in group)))
+        context = known.get(group[0].id)
+        if context is None:
+            try:
+                async with semaphore:
+                    context = await research(research_prompt(group))
+            except Exception as exc:
+                for topic in group:
+                    await finish(topic, {"status": "failed", "error": f"research: {exc!r}"})
+                return
+            stats.research_calls += 1
+            stats.research_reused += len(group) - 1
+            await asyncio.to_thread(
+                research_log.write, {"group": group_id, "topic_ids": [t.id for t in group], "text": context}
+            )
+        await asyncio.gather(*(draft_one(topic, context, group_id) for topic in group))
+
+    try:
+        await asyncio.gather(*(run_group(group) for group in groups))
+    finally:
+        await asyncio.to_thread(output.close)
+        await asyncio.to_thread(research_log.close)
+    return stats.as_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate posts for every topic in a CSV or JSONL file.")
+    parser.add_argument("topics", help="CSV with a 'topic' column, or JSONL with a 'topic' field")
+    parser.add_argument("-o", "--output", required=True, help="JSONL output; rerun with the same file to resume")
+    parser.add_argument("-c", "--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--candidates", type=int, default=1, help="drafts per topic; the best ranked one is kept")
+    parser.add_argument("--similarity", type=float, default=RESEARCH_SIMILARITY)
+    args = parser.parse_args()
+
+    topics = read_topics(args.topics)
+
+    async def report(stats: Dict[str, Any]) -> None:
+        finished = stats["succeeded"] + stats["failed"]
+        print(
+            f"\r{finished}/{stats['total'] - stats['skipped']} topics, {stats['failed']} failed, "
+            f"{stats['research_calls']} searches, {stats['topics_per_minute']} topics/min",
+            end="", file=sys.stderr, flush=True,
+        )
+
+    stats = asyncio.run(run_bulk(topics, args.output, args.concurrency, args.candidates, args.similarity, report))
+    print(file=sys.stderr)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
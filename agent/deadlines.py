@@ -0,0 +1,123 @@
+"""
+Per-run deadlines and cancellation for agent runs.
+
+`/copilotkit` opens a `RunScope` for every agent run and stores it in a
+context variable, which is inherited by the graph task, its nodes and any
+worker threads started with `asyncio.to_thread`. Upstream calls go through
+`call()` (coroutines) or `timeout()`/`check()` (blocking requests), so each
+one gets only the time left in the run. When the client disconnects, or the
+deadline passes, the scope cancels the calls still in flight and every later
+call fails fast with `RunCancelled`.
+
+Code running outside a scope (background refreshes, jobs) is unaffected.
+"""
+
+import asyncio
+import contextvars
+import os
+import time
+from typing import Awaitable, Optional, Set, TypeVar
+
+from metrics import registry as metrics
+
+T = TypeVar("T")
+
+RUN_DEADLINE_SECONDS = float(os.getenv("RUN_DEADLINE_SECONDS", "300"))
+
+runs_cancelled = metrics.counter(
+    "agent_runs_cancelled_total", "Agent runs cancelled before finishing", ("reason",)
+)
+calls_cancelled = metrics.counter(
+    "upstream_calls_cancelled_total", "In-flight upstream calls cancelled with their run", ("reason",)
+)
+
+
+class RunCancelled(Exception):
+    """Raised when the current run was cancelled or ran out of time."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"run cancelled: {reason}")
+        self.reason = reason
+
+
+class RunScope:
+    """Deadline and in-flight calls of one agent run."""
+
+    def __init__(self, seconds: float):
+        self.deadline = time.monotonic() + seconds
+        self.cancelled: Optional[str] = None
+        self._tasks: Set[asyncio.Future] = set()
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def cancel(self, reason: str) -> None:
+        """Cancel the run once; later calls raise `RunCancelled`."""
+        if self.cancelled is not None:
+            return
+        self.cancelled = reason
+        runs_cancelled.inc(reason=reason)
+        pending = [task for task in self._tasks if not task.done()]
+        if pending:
+            calls_cancelled.inc(len(pending), reason=reason)
+        for task in pending:
+            task.cancel()
+
+
+_scope: contextvars.ContextVar[Optional[RunScope]] = contextvars.ContextVar("run_scope", default=None)
+
+
+def begin(seconds: Optional[float] = None) -> RunScope:
+    """Open a scope for the current task and everything it starts."""
+    scope = RunScope(RUN_DEADLINE_SECONDS if seconds is None else seconds)
+    _scope.set(scope)
+    return scope
+
+
+def current() -> Optional[RunScope]:
+    return _scope.get()
+
+
+def check() -> None:
+    """Raise `RunCancelled` if the current run is cancelled or past its deadline."""
+    scope = _scope.get()
+    if scope is None:
+        return
+    if scope.cancelled is None and scope.remaining() <= 0:
+        scope.cancel("deadline")
+    if scope.cancelled is not None:
+        raise RunCancelled(scope.cancelled)
+
+
+def timeout(cap: float) -> float:
+    """A timeout for a blocking call: `cap`, shortened to the time left in the run."""
+    check()
+    scope = _scope.get()
+    return cap if scope is None else min(cap, scope.remaining())
+
+
+async def call(awaitable: Awaitable[T]) -> T:
+    """Await an upstream call within the run's remaining time, cancellable with the run."""
+    scope = _scope.get()
+    if scope is None:
+        return await awaitable
+    try:
+        check()
+    except RunCancelled:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise
+    task = asyncio.ensure_future(awaitable)
+    scope._tasks.add(task)
+    try:
+        return await asyncio.wait_for(task, scope.remaining())
+    except asyncio.TimeoutError:
+        calls_cancelled.inc(reason="deadline")
+        scope.cancel("deadline")
+        raise RunCancelled("deadline")
+    except asyncio.CancelledError:
+        if scope.cancelled is not None and not asyncio.current_task().cancelling():
+            raise RunCancelled(scope.cancelled)
+        raise
+    finally:
+        scope._tasks.discard(task)
@@ -0,0 +1,142 @@
+"""
+Several alternative post drafts from one model call, ranked locally.
+
+`candidate_prompt` asks for N variants of the LinkedIn and X posts as one
+structured reply (`DraftCandidates`), so N choices cost a single request
+instead of N research + drafting rounds. `rank_candidates` orders them with
+cheap heuristics: platform length limits, hashtag counts, repeated lines
+inside a post, and overlap with drafts already ranked higher or shown before.
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+from pydantic import BaseModel, Field
+
+# Drafts per request when the client does not ask for a count; 1 keeps the single generate_post call
+CANDIDATES = int(os.getenv("POST_DRAFT_CANDIDATES", "1"))
+MAX_CANDIDATES = int(os.getenv("POST_DRAFT_MAX_CANDIDATES", "5"))
+
+# Per platform: hard character limit, comfortable length range and hashtag range
+PLATFORMS = {
+    "tweet": {"limit": 280, "length": (80, 260), "hashtags": (1, 2)},
+    "linkedIn": {"limit": 3000, "length": (600, 2000), "hashtags": (3, 5)},
+}
+# How much overlap with a higher-ranked or earlier draft costs
+DUPLICATE_PENALTY = 0.4
+
+HASHTAG = re.compile(r"(?<!\w)#\w+")
+WORD = re.compile(r"\w+")
+
+
+class PostDraft(BaseModel):
+    title: str = ""
+    content: str = ""
+
+
+class DraftSet(BaseModel):
+    tweet: PostDraft = Field(default_factory=PostDraft)
+    linkedIn: PostDraft = Field(default_factory=PostDraft)
+
+
+class DraftCandidates(BaseModel):
+    """Alternative versions of the posts, each with an X (Twitter) post and a LinkedIn post."""
+
+    candidates: List[DraftSet] = Field(default_factory=list)
+
+
+def requested_count(value: Any) -> int:
+    """Number of drafts to generate: the client's request or the default, within 1..MAX_CANDIDATES."""
+    try:
+        count = int(value) if value else CANDIDATES
+    except (TypeError, ValueError):
+        count = CANDIDATES
+    return max(1, min(count, MAX_CANDIDATES))
+
+
+def candidate_prompt(prompt: str, count: int) -> str:
+    return (
+        f"{prompt}\n"
+        f"Instead of calling generate_post, return {count} distinct alternatives as candidates. "
+        "Vary the hook, structure and tone between them, keep every X (Twitter) post within 280 characters, "
+        "and leave a platform's title and content empty in every candidate when the user asked only for the other one."
+    )
+
+
+def _range_score(value: int, low: int, high: int) -> float:
+    if low <= value <= high:
+        return 1.0
+    if value < low:
+        return value / low if low else 1.0
+    return max(0.0, 1.0 - (value - high) / max(high, 1))
+
+
+def _words(text: str) -> set:
+    return {w.lower() for w in WORD.findall(text)}
+
+
+def _overlap(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+# Quality of one post on its own, in [0, 1]
+def score_post(platform: str, post: Dict[str, Any]) -> float:
+    rules = PLATFORMS[platform]
+    content = (post.get("content") or "").strip()
+    if not content:
+        return 0.0
+    length = len(content)
+    score = _range_score(length, *rules["length"])
+    if length > rules["limit"]:
+        score *= 0.25
+    score = 0.6 * score + 0.25 * _range_score(len(HASHTAG.findall(content)), *rules["hashtags"])
+    lines = [line.strip().lower() for line in content.splitlines() if line.strip()]
+    repeated = (len(lines) - len(set(lines))) / len(lines) if lines else 0.0
+    score += 0.1 * (1.0 - repeated)
+    if (post.get("title") or "").strip():
+        score += 0.05
+    return round(score, 4)
+
+
+def _text(draft: Dict[str, Any]) -> str:
+    return " ".join((draft.get(p) or {}).get("content") or "" for p in PLATFORMS)
+
+
+def rank_candidates(
+    candidates: Sequence[Dict[str, Any]], shown: Optional[Sequence[Dict[str, Any]]] = None
+) -> List[Dict[str, Any]]:
+    """Order drafts best first, each with a `score`; near-duplicates of better or shown drafts sink."""
+    pool = []
+    for draft in candidates:
+        draft = {p: {**{"title": "", "content": ""}, **(draft.get(p) or {})} for p in PLATFORMS}
+        scores = [score_post(p, draft[p]) for p in PLATFORMS if draft[p]["content"].strip()]
+        if scores:
+            pool.append((sum(scores) / len(scores), _words(_text(draft)), draft))
+    seen = [_words(_text(draft)) for draft in shown or []]
+    ranked = []
+    while pool:
+        best = max(
+            pool,
+            key=lambda item: item[0] - DUPLICATE_PENALTY * max((_overlap(item[1], s) for s in seen), default=0.0),
+        )
+        pool.remove(best)
+        quality, words, draft = best
+        penalty = DUPLICATE_PENALTY * max((_overlap(words, s) for s in seen), default=0.0)
+        seen.append(words)
+        ranked.append({**draft, "score": round(quality - penalty, 4)})
+    return ranked
+
+
+def parse_candidates(reply: Any) -> List[Dict[str, Any]]:
+    """Drafts from a structured reply (model instance or dict); empty when there are none."""
+    if isinstance(reply, DraftCandidates):
+        return [c.model_dump() for c in reply.candidates]
+    if isinstance(reply, dict):
+        try:
+            return [c.model_dump() for c in DraftCandidates(**reply).candidates]
+        except Exception:
+            return []
+    return []
@@ -0,0 +1,163 @@
+"""
+Pool of GitHub API tokens with per-token quota tracking.
+
+Tokens come from GITHUB_TOKENS (comma-separated) and GITHUB_TOKEN. Each
+request leases the token with the most quota left; its `X-RateLimit-*`
+response headers then update that token's remaining count and reset time. A
+token that runs out, or gets a rate-limit response, is parked until its reset
+time while the others keep serving, so total throughput grows with the number
+of tokens. With no token configured requests go out unauthenticated, as
+before.
+
+Tokens appear in metrics by position and a short hash, never in clear.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from metrics import registry as metrics
+
+# Core REST quota of an authenticated token, until headers say otherwise
+DEFAULT_LIMIT = int(os.getenv("GITHUB_TOKEN_DEFAULT_LIMIT", "5000"))
+# Park a rate-limited token this long when the response gives no reset time
+DEFAULT_PARK_SECONDS = 60
+
+token_remaining = metrics.gauge("github_token_remaining", "Requests left in the token's rate-limit window", ("token",))
+token_parked = metrics.gauge("github_token_parked", "1 while the token is parked until its reset", ("token",))
+token_requests = metrics.counter("github_token_requests_total", "GitHub requests sent with the token", ("token",))
+token_rate_limited = metrics.counter(
+    "github_token_rate_limited_total", "Responses that reported the token rate limited", ("token",)
+)
+
+
+def configured_tokens() -> List[str]:
+    tokens = [t.strip() for t in os.getenv("GITHUB_TOKENS", "").split(",")]
+    tokens.append((os.getenv("GITHUB_TOKEN") or "").strip())
+    return list(dict.fromkeys(t for t in tokens if t))
+
+
+class TokenState:
+    def __init__(self, token: str, index: int, limit: int = DEFAULT_LIMIT):
+        self.token = token
+        self.label = f"{index}-{hashlib.sha256(token.encode()).hexdigest()[:8]}"
+        self.limit = limit
+        self.remaining = limit
+        self.reset_at = 0.0
+        self.parked_until = 0.0
+        self.in_flight = 0
+
+
+class TokenPool:
+    """Hands out the token with the most quota left and tracks quotas from response headers."""
+
+    def __init__(self, tokens: List[str], clock=time.time):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.tokens = [TokenState(token, i) for i, token in enumerate(tokens)]
+        for state in self.tokens:
+            token_remaining.set_function(lambda s=state: s.remaining, token=state.label)
+            token_parked.set_function(lambda s=state: 1 if s.parked_until > self.clock() else 0, token=state.label)
+
+    @property
+    def size(self) -> int:
+        return len(self.tokens)
+
+    def _acquire(self) -> Optional[TokenState]:
+        if not self.tokens:
+            return None
+        now = self.clock()
+        with self._lock:
+            available = []
+            for state in self.tokens:
+                if state.parked_until > now:
+                    continue
+                if state.reset_at and state.reset_at <= now:
+                    # A new window has started since the last response
+                    state.remaining = state.limit
+                    state.reset_at = 0.0
+                available.append(state)
+            if not available:
+                from admission import AdmissionRejected
+
+                wait = min(s.parked_until for s in self.tokens) - now
+                raise AdmissionRejected("github", "tokens_exhausted", 429, max(1, int(wait) + 1))
+            best = max(available, key=lambda s: s.remaining - s.in_flight)
+            best.in_flight += 1
+        token_requests.inc(token=best.label)
+        return best
+
+    def _release(self, state: Optional[TokenState]) -> None:
+        if state is not None:
+            with self._lock:
+                state.in_flight -= 1
+
+    @contextmanager
+    def lease(self) -> Iterator[Optional[TokenState]]:
+        """The token to send a request with (None without tokens); report the response with `observe`."""
+        state = self._acquire()
+        try:
+            yield state
+        finally:
+            self._release(state)
+
+    def observe(self, state: Optional[TokenState], status_code: int, headers) -> bool:
+        """Update the token from a response; True when the response says it is rate limited."""
+        if state is None:
+            return False
+        now = self.clock()
+        remaining = _header_int(headers, "x-ratelimit-remaining")
+        reset = _header_int(headers, "x-ratelimit-reset")
+        limit = _header_int(headers, "x-ratelimit-limit")
+        retry_after = _header_int(headers, "retry-after")
+        limited = status_code in (403, 429) and (remaining == 0 or retry_after is not None)
+        with self._lock:
+            if limit:
+                state.limit = limit
+            if remaining is not None:
+                state.remaining = remaining
+            if reset:
+                state.reset_at = float(reset)
+            if limited or remaining == 0:
+                if retry_after is not None:
+                    until = now + retry_after
+                elif state.reset_at > now:
+                    until = state.reset_at
+                else:
+                    until = now + DEFAULT_PARK_SECONDS
+                state.parked_until = max(state.parked_until, until)
+        if limited:
+            token_rate_limited.inc(token=state.label)
+        return limited
+
+    def snapshot(self) -> List[Dict[str, object]]:
+        now = self.clock()
+        with self._lock:
+            return [
+                {
+                    "token": s.label,
+                    "remaining": s.remaining,
+                    "limit": s.limit,
+                    "reset_at": s.reset_at,
+                    "parked": s.parked_until > now,
+                }
+                for s in self.tokens
+            ]
+
+
+def _header_int(headers, name: str) -> Optional[int]:
+    value = headers.get(name) if headers is not None else None
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def auth_headers(state: Optional[TokenState]) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {state.token}"} if state is not None else {}
+
+
+pool = TokenPool(configured_tokens())
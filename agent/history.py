@@ -0,0 +1,175 @@
+"""
+Bounded conversation history for LLM calls.
+
+Long sessions used to resend the whole chat on every call. `compact_history`
+keeps a sliding window of the most recent turns (a turn starts at a user
+message, so tool calls stay paired with their results), shrinks tool payloads
+in all but the latest turn, and rolls everything older into a running summary.
+The summary is returned with a small state dict that callers store in the graph
+state; it is only extended when the window moves forward, so most calls reuse
+it without an extra model call. The window is narrowed further until the
+estimated prompt fits HISTORY_TOKEN_BUDGET.
+"""
+
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+import admission
+import deadlines
+
+WINDOW_TURNS = int(os.getenv("HISTORY_WINDOW_TURNS", "4"))
+# Let the window overrun by this many turns before summarizing, so summaries are batched
+SUMMARY_BATCH_TURNS = int(os.getenv("HISTORY_SUMMARY_BATCH", "2"))
+TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "6000"))
+SUMMARY_MODEL = os.getenv("HISTORY_SUMMARY_MODEL", "gemini-2.5-flash")
+STALE_PAYLOAD_CHARS = int(os.getenv("HISTORY_STALE_PAYLOAD_CHARS", "200"))
+SUMMARY_MAX_CHARS = 2400
+
+SUMMARY_INSTRUCTIONS = (
+    "Update the running summary of a conversation between a user and a social-post writing assistant. "
+    "Keep the user's goals, topics, tone and formatting preferences, and the titles of posts already written. "
+    "Drop greetings and anything superseded. Answer with the updated summary only, at most 300 words."
+)
+
+Summarizer = Callable[[str, Sequence[BaseMessage]], Awaitable[str]]
+
+
+class CompactedHistory:
+    """Messages to send, an optional summary to put first, and the state to store."""
+
+    def __init__(self, messages: List[BaseMessage], summary: Optional[str], state: Dict[str, Any]):
+        self.messages = messages
+        self.state = state
+        # Gemini only honors a system message in first position
+        self.preamble: List[BaseMessage] = (
+            [SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")] if summary else []
+        )
+
+
+def _text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return " ".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+
+
+def estimate_tokens(messages: Sequence[BaseMessage]) -> int:
+    total = 0
+    for message in messages:
+        total += admission.estimate_tokens(_text(message))
+        for call in getattr(message, "tool_calls", None) or []:
+            total += admission.estimate_tokens(str(call.get("args", "")))
+    return total
+
+
+def _turn_starts(messages: Sequence[BaseMessage]) -> List[int]:
+    starts = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    return starts
+
+
+def _shorten(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > STALE_PAYLOAD_CHARS:
+        return value[:STALE_PAYLOAD_CHARS] + " [...]"
+    if isinstance(value, dict):
+        return {k: _shorten(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_shorten(v) for v in value]
+    return value
+
+
+# Copy a message from an older turn with its tool payloads shortened
+def _prune_stale(message: BaseMessage) -> BaseMessage:
+    if isinstance(message, ToolMessage):
+        return message.model_copy(update={"content": _shorten(_text(message))})
+    if isinstance(message, AIMessage) and message.tool_calls:
+        calls = [{**call, "args": _shorten(call.get("args", {}))} for call in message.tool_calls]
+        return message.model_copy(update={"tool_calls": calls})
+    return message
+
+
+# Summary without a model call: the opening of each evicted message
+async def extractive_summary(previous: str, messages: Sequence[BaseMessage]) -> str:
+    lines = [previous] if previous else []
+    for message in messages:
+        text = _text(message).strip().replace("\n", " ")
+        if text and not isinstance(message, ToolMessage):
+            lines.append(f"{message.type}: {text[:160]}")
+    return "\n".join(lines)[-SUMMARY_MAX_CHARS:]
+
+
+# Fold evicted messages into the running summary with a small model
+async def model_summary(previous: str, messages: Sequence[BaseMessage]) -> str:
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    transcript = "\n".join(
+        f"{m.type}: {_text(m)[:1000]}" for m in messages if not isinstance(m, ToolMessage)
+    )
+    prompt = f"Current summary:\n{previous or '(none)'}\n\nNew messages:\n{transcript}"
+    client = ChatGoogleGenerativeAI(
+        model=SUMMARY_MODEL,
+        temperature=0,
+        max_retries=1,
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+    )
+    try:
+        async with admission.gemini.slot(admission.estimate_tokens(SUMMARY_INSTRUCTIONS, prompt)):
+            reply = await deadlines.call(
+                client.ainvoke([SystemMessage(content=SUMMARY_INSTRUCTIONS), HumanMessage(content=prompt)])
+            )
+        return _text(reply).strip()[:SUMMARY_MAX_CHARS]
+    except (admission.AdmissionRejected, deadlines.RunCancelled):
+        raise
+    except Exception:
+        return await extractive_summary(previous, messages)
+
+
+async def compact_history(
+    messages: Sequence[BaseMessage],
+    cached: Optional[Dict[str, Any]] = None,
+    budget: int = TOKEN_BUDGET,
+    window_turns: int = WINDOW_TURNS,
+    batch_turns: int = SUMMARY_BATCH_TURNS,
+    summarize: Summarizer = model_summary,
+    reserved_tokens: int = 0,
+) -> CompactedHistory:
+    """Fit `messages` into `budget` tokens (minus `reserved_tokens` for the caller's own prompt)."""
+    messages = list(messages)
+    starts = _turn_starts(messages)
+
+    # The summary only moves forward, and only if the messages it covers are unchanged
+    summarized = 0
+    summary = ""
+    if cached and cached.get("count", 0) <= len(messages):
+        count = cached["count"]
+        if count == 0 or getattr(messages[count - 1], "id", None) == cached.get("last_id"):
+            summarized, summary = count, cached.get("text", "")
+
+    candidates = [s for s in starts if s >= summarized] or [summarized]
+    keep = summarized
+    if len(candidates) > window_turns + batch_turns:
+        keep = candidates[len(candidates) - window_turns]
+    last_turn = starts[-1]
+
+    def window_from(start: int) -> List[BaseMessage]:
+        return [m if i >= last_turn else _prune_stale(m) for i, m in enumerate(messages[start:], start)]
+
+    window = window_from(keep)
+    summary_tokens = admission.estimate_tokens(summary) if summary else 0
+    while keep < last_turn and estimate_tokens(window) + summary_tokens + reserved_tokens > budget:
+        keep = next(s for s in starts if s > keep)
+        window = window_from(keep)
+
+    if keep > summarized:
+        summary = await summarize(summary, messages[summarized:keep])
+        summarized = keep
+
+    state = {
+        "count": summarized,
+        "last_id": getattr(messages[summarized - 1], "id", None) if summarized else None,
+        "text": summary,
+    }
+    return CompactedHistory(window, summary or None, state)
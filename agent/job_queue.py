@@ -0,0 +1,360 @@
+"""
+Durable job queue for long-running stack analyses and bulk post batches.
+
+Jobs live in SQLite, so a client can submit a run, disconnect, and later poll or
+subscribe for the result, and a restarted process picks up where the previous
+one stopped. Submissions are idempotent by key, workers run a bounded number of
+jobs at once, failed runs are retried with exponential backoff, and results are
+stored with the job. Jobs call Gemini and GitHub through the background
+admission pools, so queued batches never crowd out interactive agent runs.
+"""
+
+import asyncio
+import importlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import admission
+import logs
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+
+class JobStore:
+    """SQLite persistence for jobs."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    key TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    next_run_at REAL NOT NULL,
+                    lease_until REAL,
+                    progress TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, next_run_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _decode(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        for field in ("payload", "progress", "result"):
+            if job[field] is not None:
+                job[field] = json.loads(job[field])
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._decode(row)
+
+    # Methods below block on SQLite (writes may wait up to 10s for the lock);
+    # JobQueue calls them through asyncio.to_thread
+
+    def submit(
+        self,
+        key: str,
+        kind: str,
+        payload: Dict[str, Any],
+        max_attempts: int,
+        dedupe_window: float,
+    ) -> Dict[str, Any]:
+        """Create a job, or return the existing one with the same key if it is still useful."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE key = ? ORDER BY created_at DESC LIMIT 1", (key,)
+            ).fetchone()
+            if row is not None and (
+                row["status"] not in TERMINAL_STATUSES
+                or (row["status"] == "succeeded" and now - row["updated_at"] < dedupe_window)
+            ):
+                conn.execute("COMMIT")
+                return self._decode(row)
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                """
+                INSERT INTO jobs (id, key, kind, payload, status, max_attempts, next_run_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?)
+                """,
+                (job_id, key, kind, json.dumps(payload), max_attempts, now, now, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(job_id)
+
+    def claim(self, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """Atomically take the next runnable job, including ones whose lease expired."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # A job whose process died during its last attempt fails instead of running forever
+            conn.execute(
+                """
+                UPDATE jobs SET status = 'failed', lease_until = NULL, updated_at = ?,
+                    error = COALESCE(error, 'lease expired during the last attempt')
+                WHERE status = 'running' AND lease_until < ? AND attempts >= max_attempts
+                """,
+                (now, now),
+            )
+            row = conn.execute(
+                """
+                SELECT id FROM jobs
+                WHERE (status = 'queued' AND next_run_at <= ?)
+                   OR (status = 'running' AND lease_until < ? AND attempts < max_attempts)
+                ORDER BY next_run_at LIMIT 1
+                """,
+                (now, now),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                """
+                UPDATE jobs SET status = 'running', attempts = attempts + 1,
+                    lease_until = ?, updated_at = ?
+                WHERE id = ?
+                """,
+                (now + lease_seconds, now, row["id"]),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(row["id"])
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        for field in ("progress", "result"):
+            if field in fields and fields[field] is not None:
+                fields[field] = json.dumps(fields[field])
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._conn().execute(
+            f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id)
+        )
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._conn().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+# Run one stack analysis through the graph and return the parts worth keeping
+async def run_stack_analysis(job: Dict[str, Any], on_progress) -> Dict[str, Any]:
+    from langchain_core.messages import HumanMessage
+
+    stack_agent = await asyncio.to_thread(importlib.import_module, "stack_agent")
+    graph = stack_agent.stack_analysis_graph
+    initial = {
+        "messages": [HumanMessage(content=job["payload"]["url"])],
+        "tool_logs": [],
+        "analysis": {},
+        "show_cards": False,
+        "context": {},
+        "last_user_content": "",
+    }
+    config = {"configurable": {"thread_id": f"job-{job['id']}-{job['attempts']}"}, "recursion_limit": 25}
+    final: Dict[str, Any] = {}
+    async for values in graph.astream(initial, config, stream_mode="values"):
+        final = values
+        await on_progress(values.get("tool_logs") or [])
+
+    analysis = final.get("analysis")
+    if isinstance(analysis, str):
+        analysis = json.loads(analysis) if analysis else {}
+    messages = final.get("messages") or []
+    return {
+        "analysis": analysis or {},
+        "summary": messages[-1].content if messages else "",
+        "show_cards": bool(final.get("show_cards")),
+    }
+
+
+# Run a bulk post batch; output is keyed by job id so a retried or resumed job continues the same file
+async def run_bulk_posts(job: Dict[str, Any], on_progress) -> Dict[str, Any]:
+    bulk_posts = await asyncio.to_thread(importlib.import_module, "bulk_posts")
+    payload = job["payload"]
+    output_path = bulk_posts.job_output_path(job["id"])
+    stats = await bulk_posts.run_bulk(
+        bulk_posts.unique_topics(payload["topics"]),
+        output_path,
+        candidates=int(payload.get("candidates") or 1),
+        on_progress=on_progress,
+    )
+    return {"output": output_path, **stats}
+
+
+JOB_RUNNERS = {"stack_analysis": run_stack_analysis, "bulk_posts": run_bulk_posts}
+
+
+class JobQueue:
+    """Submit, poll and subscribe to jobs; runs a bounded pool of workers."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        concurrency: int = 2,
+        max_attempts: int = 3,
+        backoff_base: float = 5.0,
+        backoff_max: float = 300.0,
+        lease_seconds: float = 900.0,
+        dedupe_window: float = 3600.0,
+        poll_interval: float = 1.0,
+    ):
+        self.store = store
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self.dedupe_window = dedupe_window
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers: List[asyncio.Task] = []
+
+    # Blocking: call from a worker thread (plain `def` endpoints run in one)
+    def submit(self, kind: str, payload: Dict[str, Any], key: Optional[str] = None) -> Dict[str, Any]:
+        job = self.store.submit(
+            key or f"{kind}:{json.dumps(payload, sort_keys=True)}",
+            kind,
+            payload,
+            self.max_attempts,
+            self.dedupe_window,
+        )
+        # asyncio.Event is not thread-safe; wake the workers from their own loop
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return job
+
+    # Blocking, like `submit`
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    async def subscribe(self, job_id: str, interval: float = 0.5) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the job whenever it changes, until it reaches a terminal status."""
+        last_update = None
+        while True:
+            job = await asyncio.to_thread(self.store.get, job_id)
+            if job is None:
+                return
+            if job["updated_at"] != last_update:
+                last_update = job["updated_at"]
+                yield job
+            if job["status"] in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(interval)
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _execute(self, job: Dict[str, Any]) -> None:
+        runner = JOB_RUNNERS[job["kind"]]
+
+        async def on_progress(progress):
+            await asyncio.to_thread(
+                self.store.update,
+                job["id"],
+                progress=progress,
+                lease_until=time.time() + self.lease_seconds,
+            )
+
+        logs.begin_run(job["id"])
+        try:
+            with admission.background():
+                result = await runner(job, on_progress)
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back so another worker can resume it
+            await asyncio.to_thread(self.store.update, job["id"], status="queued", next_run_at=time.time())
+            raise
+        except Exception as exc:
+            logger.warning(
+                "Job failed",
+                exc_info=True,
+                extra=logs.fields(job_id=job["id"], kind=job["kind"], attempt=job["attempts"]),
+            )
+            if job["attempts"] < job["max_attempts"]:
+                await asyncio.to_thread(
+                    self.store.update,
+                    job["id"],
+                    status="queued",
+                    error=repr(exc),
+                    next_run_at=time.time() + self._backoff(job["attempts"]),
+                )
+            else:
+                await asyncio.to_thread(self.store.update, job["id"], status="failed", error=repr(exc))
+            return
+        await asyncio.to_thread(self.store.update, job["id"], status="succeeded", result=result, error=None)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await asyncio.to_thread(self.store.claim, self.lease_seconds)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._execute(job)
+
+    def start(self) -> None:
+        if not self._workers:
+            self._loop = asyncio.get_running_loop()
+            self._workers = [self._loop.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+
+def create_queue() -> JobQueue:
+    """Build the queue from JOBS_* environment settings."""
+    return JobQueue(
+        JobStore(os.getenv("JOBS_DB_PATH", "jobs.db")),
+        concurrency=int(os.getenv("JOBS_CONCURRENCY", "2")),
+        max_attempts=int(os.getenv("JOBS_MAX_ATTEMPTS", "3")),
+        backoff_base=float(os.getenv("JOBS_BACKOFF_BASE", "5")),
+        dedupe_window=float(os.getenv("JOBS_DEDUPE_WINDOW", "3600")),
+    )
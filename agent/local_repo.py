@@ -0,0 +1,245 @@
+"""
+Local checkout analysis: a parallel directory walker with .gitignore support,
+memory-mapped file reads and language byte statistics.
+
+The walker never keeps the full file list; it aggregates language bytes, file
+counts and the root listing as directories are scanned, so memory stays flat
+on repositories with hundreds of thousands of files.
+
+Paths are only accepted under the directories listed in LOCAL_ANALYSIS_ROOTS
+(separated by os.pathsep); local mode is disabled when it is unset.
+"""
+
+import mmap
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+ALLOWED_ROOTS = [
+    os.path.realpath(p) for p in os.getenv("LOCAL_ANALYSIS_ROOTS", "").split(os.pathsep) if p
+]
+WALK_WORKERS = int(os.getenv("LOCAL_WALK_WORKERS", str(min(32, (os.cpu_count() or 1) * 4))))
+
+IGNORE_FILES = (".gitignore", ".ignore")
+ALWAYS_IGNORED = {".git", ".hg", ".svn"}
+
+# Extension -> language, following GitHub's language names
+LANGUAGES = {
+    ".py": "Python", ".pyi": "Python", ".ipynb": "Jupyter Notebook",
+    ".js": "JavaScript", ".mjs": "JavaScript", ".cjs": "JavaScript", ".jsx": "JavaScript",
+    ".ts": "TypeScript", ".tsx": "TypeScript", ".mts": "TypeScript", ".cts": "TypeScript",
+    ".vue": "Vue", ".svelte": "Svelte", ".astro": "Astro",
+    ".html": "HTML", ".htm": "HTML", ".css": "CSS", ".scss": "SCSS", ".sass": "Sass", ".less": "Less",
+    ".go": "Go", ".rs": "Rust", ".java": "Java", ".kt": "Kotlin", ".kts": "Kotlin", ".scala": "Scala",
+    ".groovy": "Groovy", ".gradle": "Groovy", ".swift": "Swift", ".m": "Objective-C",
+    ".c": "C", ".h": "C", ".cc": "C++", ".cpp": "C++", ".cxx": "C++", ".hpp": "C++", ".cs": "C#",
+    ".rb": "Ruby", ".php": "PHP", ".pl": "Perl", ".lua": "Lua", ".r": "R", ".jl": "Julia",
+    ".dart": "Dart", ".ex": "Elixir", ".exs": "Elixir", ".erl": "Erlang", ".hs": "Haskell",
+    ".clj": "Clojure", ".fs": "F#", ".ml": "OCaml", ".zig": "Zig", ".nim": "Nim",
+    ".sh": "Shell", ".bash": "Shell", ".zsh": "Shell", ".ps1": "PowerShell",
+    ".sql": "PLpgSQL", ".tf": "HCL", ".hcl": "HCL", ".nix": "Nix",
+    ".sol": "Solidity", ".proto": "Protocol Buffer", ".graphql": "GraphQL", ".gql": "GraphQL",
+    ".mdx": "MDX", ".tex": "TeX", ".cmake": "CMake", ".mk": "Makefile",
+}
+LANGUAGE_FILENAMES = {"Dockerfile": "Dockerfile", "Makefile": "Makefile", "CMakeLists.txt": "CMake"}
+
+
+# Resolve a user-supplied path (plain or file://) inside an allowed root, else None
+def resolve_local_path(text: str) -> Optional[str]:
+    candidate = (text or "").strip().removeprefix("file://")
+    if not ALLOWED_ROOTS or not candidate.startswith(("/", "~")):
+        return None
+    path = os.path.realpath(os.path.expanduser(candidate))
+    if not os.path.isdir(path):
+        return None
+    for root in ALLOWED_ROOTS:
+        if path == root or path.startswith(root + os.sep):
+            return path
+    return None
+
+
+def _translate(pattern: str) -> str:
+    out, i = [], 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            out.append("/.*")
+            i += 3
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 1:]:
+            end = pattern.index("]", i + 1)
+            out.append("[" + pattern[i + 1:end].replace("!", "^", 1) + "]")
+            i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+
+class IgnoreRule:
+    """One .gitignore pattern, relative to the directory that holds the file."""
+
+    __slots__ = ("base", "negate", "dir_only", "anchored", "regex")
+
+    def __init__(self, base: str, pattern: str):
+        self.base = base
+        self.negate = pattern.startswith("!")
+        pattern = pattern[1:] if self.negate else pattern
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        self.anchored = "/" in pattern
+        self.regex = re.compile(_translate(pattern.lstrip("/")) + r"\Z")
+
+    def matches(self, rel_path: str, name: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if not self.anchored:
+            return bool(self.regex.match(name))
+        if self.base:
+            if not rel_path.startswith(self.base + "/"):
+                return False
+            rel_path = rel_path[len(self.base) + 1:]
+        return bool(self.regex.match(rel_path))
+
+
+def _read_ignore_rules(directory: str, rel_dir: str) -> List[IgnoreRule]:
+    rules = []
+    for filename in IGNORE_FILES:
+        try:
+            with open(os.path.join(directory, filename), encoding="utf-8", errors="ignore") as f:
+                for line in f:
+                    line = line.rstrip("\n").rstrip()
+                    if line and not line.startswith("#"):
+                        rules.append(IgnoreRule(rel_dir, line))
+        except OSError:
+            continue
+    return rules
+
+
+def _ignored(rules: Tuple[IgnoreRule, ...], rel_path: str, name: str, is_dir: bool) -> bool:
+    ignored = False
+    for rule in rules:
+        if rule.negate == ignored and rule.matches(rel_path, name, is_dir):
+            ignored = not rule.negate
+    return ignored
+
+
+class WalkResult:
+    def __init__(self):
+        self.languages: Dict[str, int] = {}
+        self.files = 0
+        self.directories = 0
+        self.total_bytes = 0
+        self.root_items: List[Dict[str, Any]] = []
+
+
+# Scan one directory; returns its files as (name, size) and the subdirectories to visit
+def _scan(directory: str, rel_dir: str, inherited: Tuple[IgnoreRule, ...]):
+    rules = inherited + tuple(_read_ignore_rules(directory, rel_dir))
+    files, subdirs = [], []
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return files, subdirs
+    for entry in entries:
+        if entry.name in ALWAYS_IGNORED:
+            continue
+        rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+        try:
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if _ignored(rules, rel_path, entry.name, is_dir):
+                continue
+            if is_dir:
+                subdirs.append((entry.path, rel_path, rules))
+            elif entry.is_file(follow_symlinks=False):
+                files.append((entry.name, entry.stat(follow_symlinks=False).st_size))
+        except OSError:
+            continue
+    return files, subdirs
+
+
+def walk_repository(root: str, workers: int = WALK_WORKERS) -> WalkResult:
+    """Walk `root` in parallel, honoring ignore files, and aggregate language bytes."""
+    result = WalkResult()
+    files, subdirs = _scan(root, "", ())
+    result.root_items = sorted(
+        [{"name": name, "type": "file", "size": size} for name, size in files]
+        + [{"name": os.path.basename(path), "type": "dir"} for path, _, _ in subdirs],
+        key=lambda item: item["name"],
+    )
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        scanned = [(files, subdirs)]
+        while scanned:
+            for files, subdirs in scanned:
+                result.directories += 1
+                for name, size in files:
+                    result.files += 1
+                    result.total_bytes += size
+                    language = LANGUAGE_FILENAMES.get(name) or LANGUAGES.get(os.path.splitext(name)[1].lower())
+                    if language:
+                        result.languages[language] = result.languages.get(language, 0) + size
+                for path, rel_path, rules in subdirs:
+                    pending.add(pool.submit(_scan, path, rel_path, rules))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            scanned = [future.result() for future in done]
+    result.languages = dict(sorted(result.languages.items(), key=lambda kv: -kv[1]))
+    return result
+
+
+# Yield a file's bytes in chunks from a read-only memory map, up to `max_bytes`
+def iter_mapped(path: str, max_bytes: int, chunk_size: int = 1 << 20) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            end = min(size, max_bytes)
+            for offset in range(0, end, chunk_size):
+                yield mapped[offset:min(offset + chunk_size, end)]
+
+
+# Read up to `max_bytes` of a file through a memory map; None when it cannot be read
+def read_prefix(path: str, max_bytes: int) -> Optional[bytes]:
+    try:
+        return b"".join(iter_mapped(path, max_bytes))
+    except (OSError, ValueError):
+        return None
+
+
+# Current commit and branch of a git checkout, read from .git without running git
+def read_git_head(root: str) -> Tuple[Optional[str], Optional[str]]:
+    git_dir = os.path.join(root, ".git")
+    try:
+        with open(os.path.join(git_dir, "HEAD"), encoding="utf-8") as f:
+            head = f.read().strip()
+    except OSError:
+        return None, None
+    if not head.startswith("ref: "):
+        return head, None
+    ref = head[5:]
+    branch = ref.removeprefix("refs/heads/")
+    try:
+        with open(os.path.join(git_dir, ref), encoding="utf-8") as f:
+            return f.read().strip(), branch
+    except OSError:
+        pass
+    try:
+        with open(os.path.join(git_dir, "packed-refs"), encoding="utf-8") as f:
+            for line in f:
+                sha, _, name = line.strip().partition(" ")
+                if name == ref:
+                    return sha, branch
+    except OSError:
+        pass
+    return None, branch
@@ -0,0 +1,241 @@
+"""
+Streaming summaries of dependency lockfiles.
+
+Lockfiles are mostly integrity hashes, so their raw text tells the model very
+little. The parsers here read a lockfile line by line, holding only the
+summary in memory, and report the direct dependencies with their resolved
+versions, detected frameworks and the number of locked packages.
+
+Supported: pnpm-lock.yaml (v5, v6, v9), yarn.lock (classic and berry) and
+Pipfile.lock (as written by pipenv, one key per line with four-space indents).
+"""
+
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+# Cap the number of direct dependencies listed so huge manifests stay compact
+MAX_DIRECT_DEPENDENCIES = 60
+
+# Package name -> framework label
+FRAMEWORKS = {
+    "next": "Next.js",
+    "react": "React",
+    "react-native": "React Native",
+    "expo": "Expo",
+    "vue": "Vue",
+    "nuxt": "Nuxt",
+    "@angular/core": "Angular",
+    "svelte": "Svelte",
+    "@sveltejs/kit": "SvelteKit",
+    "solid-js": "SolidJS",
+    "astro": "Astro",
+    "@remix-run/react": "Remix",
+    "electron": "Electron",
+    "express": "Express",
+    "fastify": "Fastify",
+    "koa": "Koa",
+    "hono": "Hono",
+    "@nestjs/core": "NestJS",
+    "vite": "Vite",
+    "webpack": "webpack",
+    "tailwindcss": "Tailwind CSS",
+    "@prisma/client": "Prisma",
+    "drizzle-orm": "Drizzle ORM",
+    "mongoose": "Mongoose",
+    "graphql": "GraphQL",
+    "@copilotkit/react-core": "CopilotKit",
+    "@langchain/core": "LangChain.js",
+    "django": "Django",
+    "flask": "Flask",
+    "fastapi": "FastAPI",
+    "starlette": "Starlette",
+    "sqlalchemy": "SQLAlchemy",
+    "celery": "Celery",
+    "langchain": "LangChain",
+    "langgraph": "LangGraph",
+    "streamlit": "Streamlit",
+    "torch": "PyTorch",
+    "tensorflow": "TensorFlow",
+}
+
+_PEER_SUFFIX = re.compile(r"[(_].*$")
+
+
+# Decode byte chunks incrementally and yield complete lines
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    pending = ""
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def _unquote(text: str) -> str:
+    return text.strip().strip("'\"")
+
+
+class _Summary:
+    def __init__(self, fmt: str):
+        self.format = fmt
+        self.packages = 0
+        self.direct: Dict[str, str] = {}
+        self.dev: Dict[str, str] = {}
+        self.frameworks: Dict[str, str] = {}
+
+    def package(self, name: str, version: str) -> None:
+        self.packages += 1
+        self.framework(name, version)
+
+    def framework(self, name: str, version: str) -> None:
+        label = FRAMEWORKS.get(name.lower())
+        if label and label not in self.frameworks:
+            self.frameworks[label] = version
+
+    def dependency(self, name: str, version: str, dev: bool = False) -> None:
+        target = self.dev if dev else self.direct
+        if len(target) < MAX_DIRECT_DEPENDENCIES:
+            target[name] = version
+        self.framework(name, version)
+
+    def to_dict(self) -> Dict[str, Any]:
+        # Versions pinned by direct dependencies win over any transitive copy
+        frameworks = dict(self.frameworks)
+        for name, version in {**self.dev, **self.direct}.items():
+            label = FRAMEWORKS.get(name.lower())
+            if label:
+                frameworks[label] = version
+        return {
+            "format": self.format,
+            "packages": self.packages,
+            "direct_dependencies": self.direct,
+            "dev_dependencies": self.dev,
+            "frameworks": frameworks,
+        }
+
+
+def summarize_pnpm_lock(lines: Iterable[str]) -> Dict[str, Any]:
+    summary = _Summary("pnpm-lock")
+    legacy = False  # lockfile v5 keys packages as /name/version
+    section = None
+    dep_kind = None
+    dep_name = None
+    for line in lines:
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        indent = len(line) - len(line.lstrip(" "))
+        text = line.strip()
+        if indent == 0:
+            key, _, value = text.partition(":")
+            if key == "lockfileVersion":
+                version = _unquote(value)
+                summary.format = f"pnpm-lock v{version}"
+                legacy = version.startswith("5")
+            section = key
+            dep_kind = key if key in ("dependencies", "devDependencies") else None
+            dep_name = None
+            continue
+
+        if section == "packages" and indent == 2 and text.endswith(":"):
+            key = _unquote(text[:-1]).lstrip("/")
+            if legacy:
+                name, _, version = key.rpartition("/")
+            else:
+                at = key.find("@", 1)
+                name, version = (key[:at], key[at + 1:]) if at > 0 else (key, "")
+            summary.package(name, _PEER_SUFFIX.sub("", version))
+            continue
+
+        # Direct dependencies: top level (v5/v6) or under importers (v9)
+        if section == "importers" and indent == 4:
+            dep_kind = text[:-1] if text in ("dependencies:", "devDependencies:") else None
+            continue
+        if section not in ("importers", "dependencies", "devDependencies") or dep_kind is None:
+            continue
+        base = 6 if section == "importers" else 2
+        key, _, value = text.partition(":")
+        if indent == base:
+            dep_name = _unquote(key)
+            if value.strip():
+                summary.dependency(dep_name, _PEER_SUFFIX.sub("", _unquote(value)), dep_kind == "devDependencies")
+        elif indent == base + 2 and key == "version" and dep_name:
+            summary.dependency(dep_name, _PEER_SUFFIX.sub("", _unquote(value)), dep_kind == "devDependencies")
+    return summary.to_dict()
+
+
+def summarize_yarn_lock(lines: Iterable[str], package_json: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """yarn.lock does not mark direct dependencies, so they come from package.json."""
+    summary = _Summary("yarn.lock")
+    wanted: Dict[str, tuple] = {}
+    for field, dev in (("dependencies", False), ("devDependencies", True)):
+        for name, spec in ((package_json or {}).get(field) or {}).items():
+            wanted[f"{name}@{spec}"] = (name, dev)
+            wanted[f"{name}@npm:{spec}"] = (name, dev)
+
+    entry = None
+    for line in lines:
+        if not line.strip() or line.startswith("#"):
+            continue
+        if not line.startswith(" "):
+            header = line.rstrip(":")
+            if header == "__metadata":
+                summary.format = "yarn.lock (berry)"
+                entry = None
+                continue
+            specs = [_unquote(s) for s in header.split(",")]
+            at = specs[0].find("@", 1)
+            name = specs[0][:at] if at > 0 else specs[0]
+            direct = next((wanted[s] for s in specs if s in wanted), None)
+            entry = (name, direct)
+            continue
+        text = line.strip()
+        if entry and (text.startswith("version ") or text.startswith("version:")):
+            version = _unquote(text[len("version"):].lstrip(": "))
+            name, direct = entry
+            summary.package(name, version)
+            if direct:
+                summary.dependency(direct[0], version, direct[1])
+            entry = None
+    return summary.to_dict()
+
+
+def summarize_pipfile_lock(lines: Iterable[str], pipfile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Pipfile.lock lists every package; direct ones come from the Pipfile when available."""
+    summary = _Summary("Pipfile.lock")
+    direct = {
+        "default": {n.lower() for n in (pipfile or {}).get("packages", {})},
+        "develop": {n.lower() for n in (pipfile or {}).get("dev-packages", {})},
+    }
+    section = None
+    name = None
+    for line in lines:
+        indent = len(line) - len(line.lstrip(" "))
+        text = line.strip()
+        if indent == 4 and text.endswith("{"):
+            section = json.loads(text.split(":", 1)[0])
+            continue
+        if section not in ("default", "develop"):
+            continue
+        if indent == 8 and text.endswith("{"):
+            name = json.loads(text.split(":", 1)[0])
+        elif indent == 12 and text.startswith('"version"') and name:
+            version = json.loads(text.split(":", 1)[1].rstrip(","))
+            version = version.lstrip("=")
+            summary.package(name, version)
+            if not pipfile or name.lower() in direct[section]:
+                summary.dependency(name, version, section == "develop")
+            name = None
+    return summary.to_dict()
+
+
+LOCKFILE_SUMMARIZERS = {
+    "pnpm-lock.yaml": summarize_pnpm_lock,
+    "yarn.lock": summarize_yarn_lock,
+    "Pipfile.lock": summarize_pipfile_lock,
+}
@@ -0,0 +1,203 @@
+"""
+Structured logging for the agent server, with the I/O off the event loop.
+
+`setup()` routes the root logger through a QueueHandler: the calling thread
+only tags the record with the current run and graph node, caps large values
+and puts it on a queue, and a listener thread formats and writes it. Output
+is one JSON object per line (LOG_FORMAT=json, the default) or plain text.
+
+Modules log through `logging.getLogger(__name__)`; structured values go in
+`extra=logs.fields(...)`:
+
+    logger.debug("Analysis response", extra=logs.fields(content=response.content))
+
+Strings and reprs longer than LOG_MAX_FIELD_CHARS are cut, so logging a
+large model response costs at most that much. Levels are set with LOG_LEVEL
+and per logger with LOG_LEVELS (`stack_agent=DEBUG,admission=WARNING`), and
+can be changed at runtime with `set_levels` (PUT /debug/log-levels).
+"""
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import reprlib
+import sys
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from metrics import registry as metrics
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# HTTP clients log every request at INFO
+LOG_LEVELS = os.getenv("LOG_LEVELS", "httpx=WARNING,httpcore=WARNING")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "2000"))
+# Records dropped rather than blocking the caller when the writer falls this far behind
+QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Attributes every LogRecord has; anything else set through `extra` is ours
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_run_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("log_run_id", default=None)
+
+_repr = reprlib.Repr()
+_repr.maxstring = _repr.maxother = MAX_FIELD_CHARS
+_repr.maxlist = _repr.maxtuple = _repr.maxdict = _repr.maxset = 20
+_repr.maxlevel = 4
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+records_dropped = metrics.counter("log_records_dropped_total", "Log records dropped because the log queue was full")
+
+
+def begin_run(run_id: Optional[str] = None) -> str:
+    """Tag records logged by the current task, and everything it starts, with a run id."""
+    run_id = run_id or uuid.uuid4().hex[:16]
+    _run_id.set(run_id)
+    return run_id
+
+
+def fields(**values: Any) -> Dict[str, Any]:
+    """`extra` for a log call carrying structured values."""
+    return {"fields": values}
+
+
+def cap(value: Any, limit: int = MAX_FIELD_CHARS) -> Any:
+    """A JSON-safe version of `value`, at most about `limit` characters long."""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = value if isinstance(value, str) else _repr.repr(value)
+    if len(text) > limit:
+        return f"{text[:limit]}...[{len(text) - limit} more chars]"
+    return text
+
+
+def _graph_metadata() -> Dict[str, Any]:
+    # LangGraph exposes the running node's config through this context variable
+    try:
+        from langchain_core.runnables.config import var_child_runnable_config
+    except ImportError:
+        return {}
+    config = var_child_runnable_config.get()
+    return (config or {}).get("metadata") or {}
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Tags and caps records in the caller; formatting and writing happen on the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        metadata = _graph_metadata()
+        record.run_id = _run_id.get()
+        record.thread_id = metadata.get("thread_id")
+        record.node = metadata.get("langgraph_node")
+        record.msg = cap(record.getMessage())
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.fields = {
+            key: cap(value)
+            for key, value in (getattr(record, "fields", None) or {}).items()
+        }
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            records_dropped.inc()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key in ("run_id", "thread_id", "node"):
+            value = getattr(record, key, None)
+            if value:
+                entry[key] = value
+        entry.update(getattr(record, "fields", None) or {})
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in entry and key not in ("fields", "run_id", "thread_id", "node"):
+                entry[key] = cap(value)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        tags = {key: getattr(record, key, None) for key in ("run_id", "node")}
+        tags.update(getattr(record, "fields", None) or {})
+        extras = " ".join(f"{key}={value}" for key, value in tags.items() if value is not None)
+        return f"{text} {extras}" if extras else text
+
+
+def setup() -> None:
+    """Route the root logger through the queue; safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+    records: "queue.Queue[logging.LogRecord]" = queue.Queue(QUEUE_SIZE)
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_QueueHandler(records))
+    root.setLevel(LOG_LEVEL)
+    set_levels(parse_levels(LOG_LEVELS))
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown)
+
+
+def shutdown() -> None:
+    """Write out queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for part in spec.split(","):
+        name, _, level = part.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def set_levels(levels: Dict[str, str]) -> Dict[str, str]:
+    """Set logger levels by name ("root" for the root logger); raises ValueError on unknown levels."""
+    for level in levels.values():
+        if not isinstance(logging.getLevelName(level.upper()), int):
+            raise ValueError(f"unknown log level: {level}")
+    for name, level in levels.items():
+        logging.getLogger(None if name == "root" else name).setLevel(level.upper())
+    return levels_snapshot()
+
+
+def levels_snapshot() -> Dict[str, str]:
+    """Explicitly set levels: the root logger and every named logger with its own level."""
+    levels = {"root": logging.getLevelName(logging.getLogger().level)}
+    for name, logger in sorted(logging.Logger.manager.loggerDict.items()):
+        if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET:
+            levels[name] = logging.getLevelName(logger.level)
+    return levels
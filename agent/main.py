@@ -7,40 +7,349 @@ from dotenv import load_dotenv
 
 load_dotenv()  
 
-from fastapi import FastAPI
+# Route logging through the queue before any module logs
+import logs
+
+logs.setup()
+
+import asyncio
+import json
+import math
+import re
+from email.utils import formatdate
+from typing import Any, Dict, List, Optional, Union
+from fastapi import FastAPI, Header, Request, Response
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
 import uvicorn
-from copilotkit.integrations.fastapi import add_fastapi_endpoint
-from copilotkit import CopilotKitSDK, LangGraphAgent
-from posts_generator_agent import post_generation_graph
-from stack_agent import stack_analysis_graph
+from agent_registry import registry
+from analysis_store import store as analysis_store
+import analysis_service
+from refresh_worker import create_worker
+from job_queue import create_queue
+import bulk_posts
+import admission
+import deadlines
+from prompt_cache import cache as prompt_cache
+from metrics import registry as metrics
+import loop_monitor
 
 app = FastAPI()
+refresh_worker = create_worker() if os.getenv("ANALYSIS_REFRESH_ENABLED", "0") == "1" else None
+job_queue = create_queue()
+
+
+@app.on_event("startup")
+def warmup_agents():
+    """Load the agents in the background unless warmup is disabled."""
+    if os.getenv("AGENT_WARMUP", "1") != "0":
+        registry.start_warmup()
+
+
+@app.on_event("startup")
+async def start_request_count_flusher():
+    """Write buffered analysis request counts periodically."""
+    analysis_store.start()
+
+
+@app.on_event("shutdown")
+async def stop_request_count_flusher():
+    await analysis_store.stop()
+
+
+@app.on_event("startup")
+async def start_refresh_worker():
+    """Start keeping popular stack analyses fresh, when enabled."""
+    if refresh_worker is not None:
+        refresh_worker.start()
+
+
+@app.on_event("shutdown")
+async def stop_refresh_worker():
+    if refresh_worker is not None:
+        await refresh_worker.stop()
+
+
+@app.on_event("shutdown")
+async def stop_prompt_cache_refresher():
+    await prompt_cache.stop()
+
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    """Measure event-loop lag and record what blocks the loop, when LOOP_MONITOR_ENABLED=1."""
+    if loop_monitor.ENABLED:
+        monitor = loop_monitor.monitor
+        metrics.gauge("event_loop_lag_seconds", "Delay of the last event-loop heartbeat").set_function(lambda: monitor.lag)
+        metrics.gauge("event_loop_max_lag_seconds", "Largest event-loop delay seen").set_function(lambda: monitor.max_lag)
+        metrics.gauge("event_loop_stalls", "Times the loop was blocked past the threshold").set_function(lambda: monitor.stalls)
+        monitor.start()
+
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    await loop_monitor.monitor.stop()
+
+
+@app.on_event("startup")
+async def start_job_workers():
+    """Start the job workers unless JOBS_ENABLED=0 (e.g. API-only replicas)."""
+    if os.getenv("JOBS_ENABLED", "1") != "0":
+        job_queue.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_queue.stop()
+
+
+@app.exception_handler(admission.AdmissionRejected)
+async def admission_rejected(request: Request, exc: admission.AdmissionRejected):
+    """Shed load with 429 (rate budget) or 503 (queue full) and a Retry-After hint."""
+    return JSONResponse(
+        {"detail": "Server busy, retry later", "upstream": exc.upstream, "reason": exc.reason},
+        status_code=exc.status_code,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+AGENT_RUN_PATH = re.compile(r"^(agents/execute|agent/[a-zA-Z0-9_-]+)$")
+
+
+class _GuardedRun(Response):
+    """Relays an agent run's stream within its deadline and holds the run slot until it ends.
+
+    The slot is released in `__call__`, which always runs, rather than in the
+    body generator, which Starlette may never start (the send of the response
+    start fails, or a disconnect cancels the stream first). A stream that stops
+    early (client gone, deadline hit) cancels the run's in-flight calls.
+    """
+
+    def __init__(self, inner: StreamingResponse, slot, scope: deadlines.RunScope):
+        self.inner = inner
+        self.slot = slot
+        self.scope = scope
+        self.finished = False
+        self.status_code = inner.status_code
+        self.raw_headers = inner.raw_headers
+        self.background = None
+        inner.body_iterator = self._relay(inner.body_iterator)
+
+    async def _relay(self, body_iterator):
+        iterator = body_iterator.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(iterator.__anext__(), self.scope.remaining())
+            except StopAsyncIteration:
+                self.finished = True
+                return
+            except asyncio.TimeoutError:
+                self.scope.cancel("deadline")
+                return
+            yield chunk
+
+    async def __call__(self, scope, receive, send):
+        if self.inner.background is None:
+            self.inner.background = self.background
+        try:
+            await self.inner(scope, receive, send)
+        finally:
+            if not self.finished:
+                self.scope.cancel("disconnect")
+            await self.slot.__aexit__(None, None, None)
 
 
-sdk = CopilotKitSDK(
-    agents=[
-        LangGraphAgent(
-            name="post_generation_agent",
-            description="An agent that can help with the generation of LinkedIn posts and X posts.",
-            graph=post_generation_graph,
-        ),
-        LangGraphAgent(
-            name="stack_analysis_agent",
-            description="Analyze a GitHub repository URL to infer purpose and tech stack (frontend, backend, DB, infra).",
-            graph=stack_analysis_graph,
-        ),
-    ]
+@app.api_route(
+    "/copilotkit/{path:path}",
+    methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
 )
+async def copilotkit_endpoint(request: Request, path: str):
+    """Serve CopilotKit requests, loading the agents on first use."""
+    sdk = await registry.get_sdk()
+    from copilotkit.integrations.fastapi import handler
 
-add_fastapi_endpoint(app, sdk, "/copilotkit")
+    if request.method != "POST" or not AGENT_RUN_PATH.match(path):
+        return await handler(request, sdk)
+
+    # Agent runs call Gemini; refuse up front rather than failing mid-stream
+    admission.gemini.check()
+    scope = deadlines.begin()
+    logs.begin_run()
+    slot = admission.agent_runs.slot()
+    await slot.__aenter__()
+    try:
+        response = await handler(request, sdk)
+    except BaseException:
+        await slot.__aexit__(None, None, None)
+        raise
+    if isinstance(response, StreamingResponse):
+        return _GuardedRun(response, slot, scope)
+    await slot.__aexit__(None, None, None)
+    return response
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus-style metrics for admission control and background work."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/loop")
+def loop_report(limit: int = 10):
+    """Event-loop lag and the code locations that blocked the loop longest, with stack traces."""
+    if not loop_monitor.monitor.running:
+        return JSONResponse({"detail": "Loop monitor disabled; set LOOP_MONITOR_ENABLED=1"}, status_code=404)
+    return loop_monitor.monitor.report(limit)
+
+
+@app.get("/debug/log-levels")
+def get_log_levels():
+    """Levels of the root logger and of every logger with its own level."""
+    return logs.levels_snapshot()
+
+
+@app.put("/debug/log-levels")
+def put_log_levels(levels: Dict[str, str]):
+    """Change logger levels at runtime, e.g. {"stack_agent": "DEBUG"}; "root" sets the default."""
+    try:
+        return logs.set_levels(levels)
+    except ValueError as exc:
+        return JSONResponse({"detail": str(exc)}, status_code=422)
 
 
 @app.get("/healthz")
 def health():
-    """Health check."""
+    """Liveness check; answers as soon as the process is up."""
     return {"status": "ok"}
 
 
+@app.get("/readyz")
+def ready():
+    """Readiness check; succeeds once the agents are loaded."""
+    status = registry.status()
+    body = {"status": status, "load_seconds": registry.load_seconds}
+    if status == "error":
+        body["error"] = repr(registry.error)
+    return JSONResponse(body, status_code=200 if registry.ready else 503)
+
+
+ANALYSIS_CACHE_CONTROL = f"public, max-age={int(os.getenv('ANALYSIS_CACHE_MAX_AGE', '300'))}"
+
+
+@app.get("/analysis/{owner}/{repo}")
+async def get_analysis(owner: str, repo: str, request: Request, refresh: bool = False):
+    """Return the most recent stored stack analysis of a GitHub repository."""
+    analysis_store.record_request(owner, repo)
+    refreshing = analysis_service.schedule_refresh(owner, repo) if refresh else False
+    record = await asyncio.to_thread(analysis_store.get, owner, repo)
+    if record is None:
+        if refresh and (refreshing or analysis_service.is_refreshing(owner, repo)):
+            return JSONResponse({"status": "analyzing"}, status_code=202)
+        if refresh:
+            retry_after = max(1, math.ceil(analysis_service.refresh_retry_after(owner, repo)))
+            return JSONResponse(
+                {"detail": "This repository was refreshed recently"},
+                status_code=429,
+                headers={"Retry-After": str(retry_after)},
+            )
+        return JSONResponse({"detail": "No analysis stored for this repository"}, status_code=404)
+
+    headers = {
+        "ETag": record["etag"],
+        "Cache-Control": ANALYSIS_CACHE_CONTROL,
+        "Last-Modified": formatdate(record["updated_at"], usegmt=True),
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if record["etag"] in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(
+        {
+            "owner": record["owner"],
+            "repo": record["repo"],
+            "analysis": record["analysis"],
+            "commit_sha": record["commit_sha"],
+            "updated_at": record["updated_at"],
+            "refreshing": refreshing or analysis_service.is_refreshing(owner, repo),
+        },
+        headers=headers,
+    )
+
+
+class StackAnalysisJobRequest(BaseModel):
+    url: str
+    key: Optional[str] = None
+
+
+@app.post("/jobs/stack-analysis", status_code=202)
+def submit_stack_analysis_job(
+    body: StackAnalysisJobRequest,
+    idempotency_key: Optional[str] = Header(default=None),
+):
+    """Queue a stack analysis; repeated submissions with the same key return the same job."""
+    url = body.url.strip().rstrip("/").removesuffix(".git")
+    key = body.key or idempotency_key or f"stack_analysis:{url.lower()}"
+    return job_queue.submit("stack_analysis", {"url": url}, key=key)
+
+
+class BulkPostsJobRequest(BaseModel):
+    topics: Optional[List[Union[str, Dict[str, Any]]]] = None
+    file: Optional[str] = None
+    format: str = "jsonl"
+    candidates: int = 1
+    key: Optional[str] = None
+
+
+@app.post("/jobs/bulk-posts", status_code=202)
+def submit_bulk_posts_job(
+    body: BulkPostsJobRequest,
+    idempotency_key: Optional[str] = Header(default=None),
+):
+    """Queue posts for a list of topics, given inline or as CSV/JSONL text in `file`."""
+    try:
+        topics = bulk_posts.parse_topics(body.file, body.format) if body.file else bulk_posts.unique_topics(body.topics or [])
+    except ValueError as exc:
+        return JSONResponse({"detail": str(exc)}, status_code=400)
+    if not topics:
+        return JSONResponse({"detail": "No topics given"}, status_code=400)
+    payload = {"topics": [{"id": t.id, "topic": t.text} for t in topics], "candidates": body.candidates}
+    key = body.key or idempotency_key or f"bulk_posts:{bulk_posts.batch_key(topics, body.candidates)}"
+    return job_queue.submit("bulk_posts", payload, key=key)
+
+
+@app.get("/jobs/{job_id}/output")
+def get_bulk_posts_output(job_id: str):
+    """Download a bulk post job's JSONL output, including the topics finished so far."""
+    job = job_queue.get(job_id)
+    if job is None or job["kind"] != "bulk_posts":
+        return JSONResponse({"detail": "Job not found"}, status_code=404)
+    path = bulk_posts.job_output_path(job_id)
+    if not os.path.exists(path):
+        return Response(status_code=204)
+    return FileResponse(path, media_type="application/x-ndjson")
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Poll a job's status, progress and result."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return JSONResponse({"detail": "Job not found"}, status_code=404)
+    return job
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Subscribe to a job as server-sent events until it finishes."""
+    if await asyncio.to_thread(job_queue.get, job_id) is None:
+        return JSONResponse({"detail": "Job not found"}, status_code=404)
+
+    async def events():
+        async for job in job_queue.subscribe(job_id):
+            yield f"event: job\ndata: {json.dumps(job)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
 @app.get("/")
 def root():
     """Root endpoint."""
@@ -2,6 +2,7 @@ from google import genai
 from google.genai import types
 from dotenv import load_dotenv
 import os
+import logging
 from langchain_google_genai import ChatGoogleGenerativeAI
 from prompts import system_prompt, system_prompt_3, system_prompt_4
 load_dotenv()
@@ -15,16 +16,94 @@ from langgraph.checkpoint.memory import MemorySaver
 from copilotkit.langgraph import copilotkit_emit_state
 import uuid
 import asyncio
+import time
+import admission
+import deadlines
+import prompt_cache
+import drafts
+from history import compact_history
+from langchain_core.callbacks.manager import adispatch_custom_event
+from langchain_core.messages import AIMessage
+
+logger = logging.getLogger(__name__)
 
 # Define the agent's runtime state schema for CopilotKit/LangGraph
 class AgentState(CopilotKitState):
     tool_logs: List[Dict[str, Any]]
     response: Dict[str, Any]
+    history_summary: Dict[str, Any]
+    drafts: List[Dict[str, Any]]
+    draft_count: int
+    redraft: bool
 
 
-async def chat_node(state: AgentState, config: RunnableConfig):
-    # 1. Define the model
+# Static prefix of the research call: instructions, the model's acknowledgement and the search tool.
+# Registered for explicit context caching; sent inline whenever no cache is available.
+RESEARCH_PREFIX = "posts_research"
+RESEARCH_PREFIX_CONTENTS = [
+    types.Content(role="user", parts=[types.Part(text=system_prompt)]),
+    types.Content(role="model", parts=[types.Part(text=system_prompt_4)]),
+]
+prompt_cache.cache.register(
+    RESEARCH_PREFIX,
+    prompt_cache.PrefixSpec(
+        model="gemini-2.5-pro",
+        contents=RESEARCH_PREFIX_CONTENTS,
+        tools=[types.Tool(google_search=types.GoogleSearch())],
+        approx_tokens=admission.estimate_tokens(system_prompt, system_prompt_4),
+    ),
+)
+
+
+# Grounded web research on `text`. The static prefix comes from the context cache when one is live;
+# otherwise it is sent inline.
+async def research(text: str):
+    # Define the model and the grounding tool to perform google search when needed
     model = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+    grounding_tool = types.Tool(google_search=types.GoogleSearch())
+    model_config = types.GenerateContentConfig(
+        tools=[grounding_tool],
+    )
+    user_turn = types.Content(role="user", parts=[types.Part(text=text)])
+    cache_name = await prompt_cache.cache.get(RESEARCH_PREFIX)
+    async with admission.gemini.slot(admission.estimate_tokens(system_prompt, system_prompt_4, text)):
+        started = time.perf_counter()
+        response = None
+        if cache_name:
+            try:
+                response = await deadlines.call(model.aio.models.generate_content(
+                    model="gemini-2.5-pro",
+                    contents=[user_turn],
+                    config=types.GenerateContentConfig(cached_content=cache_name),
+                ))
+            except deadlines.RunCancelled:
+                raise
+            except Exception:
+                logger.warning("Cached research call failed, sending the full prompt", exc_info=True)
+                prompt_cache.cache.invalidate(RESEARCH_PREFIX)
+                started = time.perf_counter()
+        if response is None:
+            response = await deadlines.call(model.aio.models.generate_content(
+                model="gemini-2.5-pro",
+                contents=[*RESEARCH_PREFIX_CONTENTS, user_turn],
+                config=model_config,
+            ))
+    usage = response.usage_metadata
+    if usage is not None:
+        prompt_cache.record_usage(
+            RESEARCH_PREFIX,
+            usage.prompt_token_count or 0,
+            usage.cached_content_token_count or 0,
+            time.perf_counter() - started,
+        )
+    return response
+
+
+async def chat_node(state: AgentState, config: RunnableConfig):
+    # Asking for new drafts of the same topic reuses the research already in state["response"]
+    if state.get("redraft") and state.get("response") and state["messages"][-1].type == "human":
+        return Command(goto="fe_actions_node")
+
     state["tool_logs"].append(
         {
             "id": str(uuid.uuid4()),
@@ -34,7 +113,7 @@ async def chat_node(state: AgentState, config: RunnableConfig):
     )
     await copilotkit_emit_state(config, state)
 
-    # 2. Defining a condition to check if the last message is a tool so as to handle the FE tool responses
+    # 1. Defining a condition to check if the last message is a tool so as to handle the FE tool responses
     if state["messages"][-1].type == "tool":
         client = ChatGoogleGenerativeAI(
             model="gemini-2.5-pro",
@@ -46,48 +125,30 @@ async def chat_node(state: AgentState, config: RunnableConfig):
         messages[-1].content = (
             "The posts had been generated successfully. Just generate a summary of the posts."
         )
-        resp = await client.ainvoke(
-            [*state["messages"]],
-            config,
-        )
+        history = await compact_history(messages, state.get("history_summary"))
+        async with admission.gemini.slot(
+            admission.estimate_tokens(*(str(m.content) for m in [*history.preamble, *history.messages]))
+        ):
+            resp = await deadlines.call(client.ainvoke(
+                [*history.preamble, *history.messages],
+                config,
+            ))
         state["tool_logs"] = []
         await copilotkit_emit_state(config, state)
-        return Command(goto="fe_actions_node", update={"messages": resp})
+        return Command(goto="fe_actions_node", update={"messages": resp, "history_summary": history.state})
 
-    # 3. Initializing the grounding tool to perform google search when needed. Using the google_search provided in the google.genai.types module
-    grounding_tool = types.Tool(google_search=types.GoogleSearch())
-    model_config = types.GenerateContentConfig(
-        tools=[grounding_tool],
-    )
     if config is None:
         config = RunnableConfig(recursion_limit=25)
     else:
         config = copilotkit_customize_config(config, emit_messages=True, emit_tool_calls=True)
-    # 4. Generating the response using the model. This returns the response along with the web search queries.
-    response = model.models.generate_content(
-        model="gemini-2.5-pro",
-        contents=[
-            types.Content(role="user", parts=[types.Part(text=system_prompt)]),
-            types.Content(
-                role="model",
-                parts=[
-                    types.Part(
-                        text= system_prompt_4
-                    )
-                ],
-            ),
-            types.Content(
-                role="user", parts=[types.Part(text=state["messages"][-1].content)]
-            ),
-        ],
-        config=model_config,
-    )
-    # 5. Updating the tool logs and response so as to see the tool logs in the Frontend Chat UI
+    # 2. Generating the response using the model. This returns the response along with the web search queries.
+    response = await research(state["messages"][-1].content)
+    # 3. Updating the tool logs and response so as to see the tool logs in the Frontend Chat UI
     state["tool_logs"][-1]["status"] = "completed"
     await copilotkit_emit_state(config, state)
     state["response"] = response.text
     
-    # 6. Orchestrating the web search queries and updating the tool logs
+    # 4. Orchestrating the web search queries and updating the tool logs
     for query in response.candidates[0].grounding_metadata.web_search_queries:
         state["tool_logs"].append(
             {
@@ -107,8 +168,9 @@ async def fe_actions_node(state: AgentState, config: RunnableConfig):
     try:
         if state["messages"][-2].type == "tool":
             return Command(goto="end_node", update=state)
-    except Exception as e:
-        print("Moved")
+    except Exception:
+        # Fewer than two messages: nothing was generated yet
+        pass
         
     state["tool_logs"].append(
         {
@@ -118,7 +180,7 @@ async def fe_actions_node(state: AgentState, config: RunnableConfig):
         }
     )
     await copilotkit_emit_state(config, state)
-    # 6. Initializing the model to generate the post along with the content that was scraped from the google search previously.
+    # 5. Initializing the model to generate the post along with the content that was scraped from the google search previously.
     model = ChatGoogleGenerativeAI(
         model="gemini-2.5-pro",
         temperature=1.0,
@@ -126,14 +188,78 @@ async def fe_actions_node(state: AgentState, config: RunnableConfig):
         google_api_key=os.getenv("GOOGLE_API_KEY"),
     )
     await copilotkit_emit_state(config, state)
-    response = await model.bind_tools([*state["copilotkit"]["actions"]]).ainvoke(
-        [system_prompt_3.replace("{context}", state["response"]), *state["messages"]],
-        config,
+    prompt = system_prompt_3.replace("{context}", state["response"])
+    history = await compact_history(
+        state["messages"], state.get("history_summary"), reserved_tokens=admission.estimate_tokens(prompt)
     )
+    tokens = admission.estimate_tokens(prompt, *(str(m.content) for m in [*history.preamble, *history.messages]))
+    update: Dict[str, Any] = {"history_summary": history.state, "redraft": False}
+    response = None
+    count = drafts.requested_count(state.get("draft_count"))
+    if count > 1 and any(_action_name(a) == "generate_post" for a in state["copilotkit"]["actions"]):
+        ranked = await _draft_candidates(
+            model, [*history.preamble, drafts.candidate_prompt(prompt, count), *history.messages],
+            tokens, config, shown=state.get("drafts") if state.get("redraft") else None,
+        )
+        if ranked:
+            best = ranked[0]
+            response = await _emit_generate_post(config, {"tweet": best["tweet"], "linkedIn": best["linkedIn"]})
+            update["drafts"] = ranked
+    if response is None:
+        async with admission.gemini.slot(tokens):
+            response = await deadlines.call(model.bind_tools([*state["copilotkit"]["actions"]]).ainvoke(
+                [*history.preamble, prompt, *history.messages],
+                config,
+            ))
     state["tool_logs"] = []
     await copilotkit_emit_state(config, state)
-    # 7. Returning the response to the frontend as a message which will invoke the correct calling of the Frontend useCopilotAction necessary.
-    return Command(goto="end_node", update={"messages": response})
+    # 6. Returning the response to the frontend as a message which will invoke the correct calling of the Frontend useCopilotAction necessary.
+    return Command(goto="end_node", update={"messages": response, **update})
+
+
+def _action_name(action: Any) -> str:
+    if isinstance(action, dict):
+        return action.get("name") or (action.get("function") or {}).get("name", "")
+    return getattr(action, "name", "")
+
+
+# Ask for several drafts in one structured call and rank them; empty when the call yields none
+async def _draft_candidates(
+    model: ChatGoogleGenerativeAI,
+    messages: List[Any],
+    tokens: int,
+    config: RunnableConfig,
+    shown: Any = None,
+) -> List[Dict[str, Any]]:
+    # The structured reply is internal; only the chosen draft reaches the frontend
+    quiet = copilotkit_customize_config(config, emit_messages=False, emit_tool_calls=False)
+    try:
+        async with admission.gemini.slot(tokens):
+            reply = await deadlines.call(
+                model.with_structured_output(drafts.DraftCandidates).ainvoke(messages, quiet)
+            )
+    except (admission.AdmissionRejected, deadlines.RunCancelled):
+        raise
+    except Exception:
+        logger.warning("Draft candidates call failed, falling back to a single draft", exc_info=True)
+        return []
+    return drafts.rank_candidates(drafts.parse_candidates(reply), shown)
+
+
+# Send a generate_post call to the frontend and return the matching message for the state.
+# Same event as copilotkit_emit_tool_call, but with our id so the frontend's copy of the call merges with it.
+async def _emit_generate_post(config: RunnableConfig, args: Dict[str, Any]) -> AIMessage:
+    call_id = str(uuid.uuid4())
+    await adispatch_custom_event(
+        "copilotkit_manually_emit_tool_call",
+        {"name": "generate_post", "args": args, "id": call_id},
+        config=config,
+    )
+    return AIMessage(
+        content="",
+        id=call_id,
+        tool_calls=[{"name": "generate_post", "args": args, "id": call_id}],
+    )
 
 
 async def end_node(state: AgentState, config: RunnableConfig):
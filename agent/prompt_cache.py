@@ -0,0 +1,228 @@
+"""
+Explicit Gemini context caches for static prompt prefixes.
+
+A prefix (system instruction, leading turns and tool declarations that never
+change between requests) is registered once under a key. `get(key)` returns
+the name of a live cache for it, creating the cache on first use and extending
+its TTL before it expires; requests then send only their dynamic suffix with
+`cached_content=<name>`. A background task keeps recently used prefixes warm;
+it starts with the first cache actually created, so a process whose prefixes
+are all too small to cache never runs it.
+
+Whenever caching is not possible - disabled, prefix below the model's minimum
+cacheable size, API errors - `get` returns None and callers send the full
+prompt as before. Failed creations are retried after a backoff.
+
+The client is injectable (anything with `aio.caches.create/update`), so the
+manager can be exercised against a local stub.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import registry as metrics
+
+ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "1") != "0"
+TTL_SECONDS = int(os.getenv("PROMPT_CACHE_TTL", "3600"))
+REFRESH_MARGIN = int(os.getenv("PROMPT_CACHE_REFRESH_MARGIN", "300"))
+RETRY_AFTER = int(os.getenv("PROMPT_CACHE_RETRY_AFTER", "600"))
+
+# Smallest prefix (in tokens) the API accepts for explicit caching, per model
+MIN_TOKENS = {"gemini-2.5-pro": 4096, "gemini-2.5-flash": 1024, "gemini-2.5-flash-lite": 1024}
+DEFAULT_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "4096"))
+
+cache_events = metrics.counter(
+    "prompt_cache_events_total", "Prefix cache creations, refreshes, hits and fallbacks", ("prefix", "event")
+)
+prompt_tokens = metrics.counter(
+    "prompt_input_tokens_total", "Input tokens reported by Gemini", ("prefix",)
+)
+cached_tokens = metrics.counter(
+    "prompt_cached_tokens_total", "Input tokens served from a context cache", ("prefix",)
+)
+call_seconds = metrics.counter(
+    "prompt_call_seconds_total", "Time to the model's response", ("prefix", "cached")
+)
+call_count = metrics.counter(
+    "prompt_calls_total", "Model calls measured for time to response", ("prefix", "cached")
+)
+
+
+class PrefixSpec:
+    """The static part of a prompt, in google-genai terms."""
+
+    def __init__(
+        self,
+        model: str,
+        contents: Optional[List[Any]] = None,
+        system_instruction: Optional[str] = None,
+        tools: Optional[List[Any]] = None,
+        approx_tokens: int = 0,
+    ):
+        self.model = model
+        self.contents = contents or []
+        self.system_instruction = system_instruction
+        self.tools = tools or []
+        self.approx_tokens = approx_tokens
+
+
+class _Entry:
+    def __init__(self, spec: PrefixSpec):
+        self.spec = spec
+        self.name: Optional[str] = None
+        self.expires_at = 0.0
+        self.failed_until = 0.0
+        self.last_used = 0.0
+        self.lock = asyncio.Lock()
+
+
+class PrefixCache:
+    """Creates, refreshes and hands out explicit caches for registered prefixes."""
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any],
+        ttl: int = TTL_SECONDS,
+        refresh_margin: int = REFRESH_MARGIN,
+        retry_after: int = RETRY_AFTER,
+        enabled: bool = ENABLED,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._client_factory = client_factory
+        self._client = None
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.retry_after = retry_after
+        self.enabled = enabled
+        self.clock = clock
+        self._entries: Dict[str, _Entry] = {}
+        self._refresher: Optional[asyncio.Task] = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    def register(self, key: str, spec: PrefixSpec) -> None:
+        if key not in self._entries:
+            self._entries[key] = _Entry(spec)
+
+    def cacheable(self, key: str) -> bool:
+        spec = self._entries[key].spec
+        return spec.approx_tokens >= MIN_TOKENS.get(spec.model, DEFAULT_MIN_TOKENS)
+
+    async def get(self, key: str) -> Optional[str]:
+        """Name of a live cache for `key`, or None to send the full prompt."""
+        entry = self._entries.get(key)
+        if entry is None or not self.enabled:
+            return None
+        if not self.cacheable(key):
+            cache_events.inc(prefix=key, event="too_small")
+            return None
+        now = self.clock()
+        entry.last_used = now
+        if entry.name and entry.expires_at - self.refresh_margin > now:
+            cache_events.inc(prefix=key, event="hit")
+            return entry.name
+        if entry.failed_until > now:
+            cache_events.inc(prefix=key, event="fallback")
+            return entry.name if entry.expires_at > now else None
+        async with entry.lock:
+            if not (entry.name and entry.expires_at - self.refresh_margin > self.clock()):
+                await self._ensure(key, entry)
+        if entry.name and entry.expires_at > self.clock():
+            cache_events.inc(prefix=key, event="hit")
+            return entry.name
+        cache_events.inc(prefix=key, event="fallback")
+        return None
+
+    def invalidate(self, key: str) -> None:
+        """Forget the cache for `key`, e.g. after the API reported it missing."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.name = None
+            entry.expires_at = 0.0
+
+    async def _ensure(self, key: str, entry: _Entry) -> None:
+        from google.genai import types
+
+        ttl = f"{self.ttl}s"
+        try:
+            if entry.name and entry.expires_at > self.clock():
+                await self.client.aio.caches.update(
+                    name=entry.name, config=types.UpdateCachedContentConfig(ttl=ttl)
+                )
+                cache_events.inc(prefix=key, event="refreshed")
+            else:
+                spec = entry.spec
+                cached = await self.client.aio.caches.create(
+                    model=spec.model,
+                    config=types.CreateCachedContentConfig(
+                        display_name=key,
+                        contents=spec.contents or None,
+                        system_instruction=spec.system_instruction,
+                        tools=spec.tools or None,
+                        ttl=ttl,
+                    ),
+                )
+                entry.name = cached.name
+                cache_events.inc(prefix=key, event="created")
+                self.start()
+            entry.expires_at = self.clock() + self.ttl
+            entry.failed_until = 0.0
+        except Exception:
+            entry.failed_until = self.clock() + self.retry_after
+            cache_events.inc(prefix=key, event="error")
+
+    async def refresh_due(self) -> None:
+        """Extend caches close to expiry that were used within the last TTL."""
+        now = self.clock()
+        for key, entry in self._entries.items():
+            if (
+                entry.name
+                and now - entry.last_used < self.ttl
+                and entry.expires_at - self.refresh_margin <= now
+                and entry.failed_until <= now
+            ):
+                async with entry.lock:
+                    await self._ensure(key, entry)
+
+    async def _refresh_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.refresh_due()
+
+    # Start the refresher, unless caching is off or no registered prefix is large enough to cache
+    def start(self, interval: Optional[float] = None) -> None:
+        if not self.enabled or self._refresher is not None:
+            return
+        if any(self.cacheable(key) for key in self._entries):
+            interval = interval or max(30.0, self.refresh_margin / 2)
+            self._refresher = asyncio.get_running_loop().create_task(self._refresh_loop(interval))
+
+    async def stop(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+            await asyncio.gather(self._refresher, return_exceptions=True)
+            self._refresher = None
+
+
+# Record token usage and time to response for one call
+def record_usage(key: str, input_tokens: int, cache_read_tokens: int, seconds: float) -> None:
+    cached = "true" if cache_read_tokens else "false"
+    prompt_tokens.inc(input_tokens or 0, prefix=key)
+    cached_tokens.inc(cache_read_tokens or 0, prefix=key)
+    call_seconds.inc(seconds, prefix=key, cached=cached)
+    call_count.inc(prefix=key, cached=cached)
+
+
+def _default_client():
+    from google import genai
+
+    return genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+
+
+cache = PrefixCache(_default_client)
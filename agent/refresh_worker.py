@@ -0,0 +1,137 @@
+"""
+Background worker that keeps stored stack analyses of popular repositories fresh.
+
+Every `ANALYSIS_REFRESH_INTERVAL` seconds the worker walks the configured watch
+list plus the most requested repositories, compares the default-branch commit
+SHA with the one recorded next to the stored analysis, and re-analyzes only
+when it changed. It runs with its own hourly GitHub and Gemini budgets, its own
+thread pool and a small concurrency limit, and its upstream calls go through
+the background admission pools, so it never competes with interactive
+requests for their share.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import admission
+import analysis_service
+import logs
+from analysis_store import store
+
+logger = logging.getLogger(__name__)
+
+# Rough number of GitHub requests one full gather makes
+GATHER_GITHUB_COST = 40
+
+
+# Budget of `per_hour` units with bursts up to `burst` (default: five minutes' worth)
+def _hourly_budget(per_hour: float, burst: Optional[float] = None) -> admission.RateBudget:
+    return admission.RateBudget(per_hour / 3600.0, burst if burst is not None else max(per_hour / 12.0, 1.0))
+
+
+def _parse_watchlist(raw: str) -> List[Tuple[str, str]]:
+    repos = []
+    for item in raw.split(","):
+        owner, _, repo = item.strip().partition("/")
+        if owner and repo:
+            repos.append((owner, repo))
+    return repos
+
+
+class RefreshWorker:
+    """Periodically re-analyzes watched and popular repositories whose HEAD moved."""
+
+    def __init__(
+        self,
+        watchlist: List[Tuple[str, str]],
+        top_requested: int = 20,
+        interval: float = 900.0,
+        workers: int = 2,
+        github_per_hour: float = 500.0,
+        analyses_per_hour: float = 20.0,
+    ):
+        self.watchlist = watchlist
+        self.top_requested = top_requested
+        self.interval = interval
+        self.github_budget = _hourly_budget(github_per_hour, burst=max(GATHER_GITHUB_COST * workers, github_per_hour / 4.0))
+        self.gemini_budget = _hourly_budget(analyses_per_hour)
+        self._semaphore = asyncio.Semaphore(workers)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis-refresh")
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"checked": 0, "refreshed": 0, "unchanged": 0, "skipped_budget": 0, "failed": 0}
+
+    def candidates(self) -> List[Tuple[str, str]]:
+        seen, result = set(), []
+        since = time.time() - 7 * 24 * 3600
+        for owner, repo in self.watchlist + store.most_requested(self.top_requested, since):
+            key = store.key(owner, repo)
+            if key not in seen:
+                seen.add(key)
+                result.append((owner, repo))
+        return result
+
+    async def refresh_one(self, owner: str, repo: str) -> None:
+        async with self._semaphore:
+            if analysis_service.is_refreshing(owner, repo):
+                return
+            if not self.github_budget.try_spend(1):
+                self.stats["skipped_budget"] += 1
+                return
+            self.stats["checked"] += 1
+            sha = await analysis_service.head_sha(owner, repo, self._executor)
+            record = await asyncio.to_thread(store.get, owner, repo)
+            if sha and record and record.get("commit_sha") == sha:
+                self.stats["unchanged"] += 1
+                return
+            if not self.github_budget.try_spend(GATHER_GITHUB_COST) or not self.gemini_budget.try_spend(1):
+                self.stats["skipped_budget"] += 1
+                return
+            try:
+                result = await analysis_service.analyze_repository(owner, repo, self._executor)
+            except Exception:
+                logger.warning("Refresh failed", exc_info=True, extra=logs.fields(repo=f"{owner}/{repo}"))
+                result = None
+            self.stats["refreshed" if result else "failed"] += 1
+
+    async def run_once(self) -> None:
+        with admission.background():
+            candidates = await asyncio.to_thread(self.candidates)
+            await asyncio.gather(*(self.refresh_one(o, r) for o, r in candidates))
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Refresh round failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_worker() -> RefreshWorker:
+    """Build the worker from ANALYSIS_REFRESH_* environment settings."""
+    return RefreshWorker(
+        watchlist=_parse_watchlist(os.getenv("ANALYSIS_WATCHLIST", "")),
+        top_requested=int(os.getenv("ANALYSIS_REFRESH_TOP", "20")),
+        interval=float(os.getenv("ANALYSIS_REFRESH_INTERVAL", "900")),
+        workers=int(os.getenv("ANALYSIS_REFRESH_WORKERS", "2")),
+        github_per_hour=float(os.getenv("ANALYSIS_REFRESH_GITHUB_PER_HOUR", "500")),
+        analyses_per_hour=float(os.getenv("ANALYSIS_REFRESH_ANALYSES_PER_HOUR", "20")),
+    )
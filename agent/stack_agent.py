@@ -1,9 +1,12 @@
 import os
 import re
-import base64
 import json
-from typing import Any, Dict, List, Optional, Tuple
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import tomllib
 import uuid
+import asyncio
+import time
 
 import requests
 from dotenv import load_dotenv
@@ -20,11 +23,24 @@ from copilotkit.langgraph import copilotkit_emit_state
 from copilotkit.langchain import copilotkit_customize_config
 
 from langchain_google_genai import ChatGoogleGenerativeAI
+from google.genai import types as genai_types
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
 
+from analysis_store import store as analysis_store
+import admission
+from lockfiles import LOCKFILE_SUMMARIZERS, iter_lines
+import local_repo
+import prompt_cache
+import deadlines
+import github_tokens
+from blob_store import store as blob_store
+import logs
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 # Define the agent's runtime state schema for CopilotKit/LangGraph
 class StackAgentState(CopilotKitState):
@@ -119,19 +135,37 @@ def _parse_github_url(url: str) -> Optional[Tuple[str, str]]:
     return match.group("owner"), match.group("repo")
 
 
-# Build GitHub API headers and attach token when available
+# Build GitHub API headers; the token is added per request from the token pool
 def _github_headers() -> Dict[str, str]:
-    token = os.getenv("GITHUB_TOKEN")
-    headers = {"Accept": "application/vnd.github+json"}
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
-    return headers
+    return {"Accept": "application/vnd.github+json"}
+
+
+# Send a GET with the pooled token that has the most quota left. A response saying the token
+# is rate limited parks it, and the request moves on to the next token.
+def _gh_request(url: str, headers: Dict[str, str], stream: bool = False) -> requests.Response:
+    for attempt in range(max(1, github_tokens.pool.size)):
+        with github_tokens.pool.lease() as token:
+            resp = requests.get(
+                url,
+                headers={**headers, **github_tokens.auth_headers(token)},
+                timeout=deadlines.timeout(30),
+                stream=stream,
+            )
+            limited = github_tokens.pool.observe(token, resp.status_code, resp.headers)
+        if not limited or attempt == github_tokens.pool.size - 1:
+            return resp
+        resp.close()
+    return resp
 
 
 # Issue a GET request to the GitHub API and return a successful response or None
-def _gh_get(url: str) -> Optional[requests.Response]:
+def _gh_get(url: str, accept: Optional[str] = None) -> Optional[requests.Response]:
+    headers = _github_headers()
+    if accept:
+        headers["Accept"] = accept
     try:
-        resp = requests.get(url, headers=_github_headers(), timeout=30)
+        with admission.github.slot():
+            resp = _gh_request(url, headers)
         if resp.status_code == 200:
             return resp
         return None
@@ -139,6 +173,56 @@ def _gh_get(url: str) -> Optional[requests.Response]:
         return None
 
 
+# Characters of each manifest and of the README that go into the prompt
+MANIFEST_PROMPT_CHARS = 2000
+README_PROMPT_CHARS = 8000
+
+# Bytes downloaded per file; enough to cover the prompt excerpt even with multi-byte text
+MANIFEST_MAX_BYTES = int(os.getenv("MANIFEST_MAX_BYTES", str(4 * MANIFEST_PROMPT_CHARS)))
+README_MAX_BYTES = int(os.getenv("README_MAX_BYTES", str(4 * README_PROMPT_CHARS)))
+
+
+# Stream at most `max_bytes` of a file, asking for just that range and closing the
+# connection once the cap is reached. Raises requests.RequestException on failure.
+def _gh_stream(
+    url: str,
+    max_bytes: int,
+    size: Optional[int] = None,
+    accept: Optional[str] = None,
+) -> Iterator[bytes]:
+    if size == 0 or max_bytes <= 0:
+        return
+    headers = _github_headers()
+    if accept:
+        headers["Accept"] = accept
+    if size is None or size > max_bytes:
+        headers["Range"] = f"bytes=0-{max_bytes - 1}"
+    received = 0
+    with admission.github.slot():
+        with _gh_request(url, headers, stream=True) as resp:
+            if resp.status_code not in (200, 206):
+                raise requests.HTTPError(f"{resp.status_code} for {url}", response=resp)
+            for chunk in resp.iter_content(chunk_size=16384):
+                if received + len(chunk) >= max_bytes:
+                    yield chunk[: max_bytes - received]
+                    return
+                received += len(chunk)
+                yield chunk
+
+
+# Download at most `max_bytes` of a file; None when the request fails
+def _gh_get_capped(
+    url: str,
+    max_bytes: int,
+    size: Optional[int] = None,
+    accept: Optional[str] = None,
+) -> Optional[bytes]:
+    try:
+        return b"".join(_gh_stream(url, max_bytes, size, accept))
+    except requests.RequestException:
+        return None
+
+
 # Fetch general repository metadata
 def _fetch_repo_info(owner: str, repo: str) -> Dict[str, Any]:
     info = {}
@@ -148,32 +232,52 @@ def _fetch_repo_info(owner: str, repo: str) -> Dict[str, Any]:
     return info
 
 
+# Fetch the commit SHA at the tip of the default branch
+def _fetch_head_sha(owner: str, repo: str) -> Optional[str]:
+    r = _gh_get(
+        f"https://api.github.com/repos/{owner}/{repo}/commits/HEAD",
+        accept="application/vnd.github.sha",
+    )
+    return r.text.strip() if r else None
+
+
 # Fetch language usage in bytes for the repository
 def _fetch_languages(owner: str, repo: str) -> Dict[str, int]:
     r = _gh_get(f"https://api.github.com/repos/{owner}/{repo}/languages")
     return r.json() if r else {}
 
 
-# Fetch README content, falling back to scanning root contents when needed
-def _fetch_readme(owner: str, repo: str) -> str:
-    r = _gh_get(f"https://api.github.com/repos/{owner}/{repo}/readme")
-    if r:
-        data = r.json()
-        content = data.get("content")
-        if content:
-            try:
-                return base64.b64decode(content).decode("utf-8", errors="ignore")
-            except Exception:
-                pass
-    contents = _gh_get(f"https://api.github.com/repos/{owner}/{repo}/contents/")
-    if contents:
-        for item in contents.json():
-            name = item.get("name", "").lower()
-            if name in {"readme.md", "readme", "readme.txt", "readme.rst"}:
-                file_resp = _gh_get(item.get("download_url", ""))
-                if file_resp:
-                    return file_resp.text
-    return ""
+# Download the start of a listed file, or reuse the copy stored under its git blob SHA
+# from any repository seen before
+def _fetch_blob(url: str, item: Dict[str, Any], max_bytes: int) -> Optional[bytes]:
+    sha, size = item.get("sha"), item.get("size")
+    if sha:
+        data = blob_store.get(sha)
+        needed = max_bytes if size is None else min(size, max_bytes)
+        if data is not None and len(data) >= needed:
+            return data[:max_bytes]
+    data = _gh_get_capped(url, max_bytes, size)
+    if data is not None and sha:
+        blob_store.put(sha, data, size)
+    return data
+
+
+# Fetch README content from the root listing, falling back to the README endpoint for
+# READMEs kept elsewhere. The raw media type skips the base64 JSON envelope so only
+# README_MAX_BYTES are read.
+def _fetch_readme(owner: str, repo: str, root_items: List[Dict[str, Any]]) -> str:
+    for item in root_items:
+        name = item.get("name", "").lower()
+        if name in {"readme.md", "readme", "readme.txt", "readme.rst"} and item.get("download_url"):
+            data = _fetch_blob(item["download_url"], item, README_MAX_BYTES)
+            if data is not None:
+                return data.decode("utf-8", errors="ignore")
+    data = _gh_get_capped(
+        f"https://api.github.com/repos/{owner}/{repo}/readme",
+        README_MAX_BYTES,
+        accept="application/vnd.github.raw",
+    )
+    return data.decode("utf-8", errors="ignore") if data else ""
 
 
 # List files and directories in the repository root
@@ -216,7 +320,23 @@ ROOT_MANIFEST_CANDIDATES = [
 ]
 
 
-# Download contents of known manifest files when present in root
+# Lockfiles are streamed whole into a compact summary instead of being excerpted
+LOCKFILE_MAX_BYTES = int(os.getenv("LOCKFILE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+
+# Resolve the download URL of a root file
+def _root_file_url(
+    owner: str, repo: str, default_branch: Optional[str], item: Dict[str, Any]
+) -> Optional[str]:
+    url = item.get("download_url")
+    if not url and default_branch:
+        url = f"https://raw.githubusercontent.com/{owner}/{repo}/{default_branch}/{item.get('name')}"
+    return url
+
+
+# Download the start of each known manifest file present in root, using the size
+# from the contents listing to skip empty files and avoid ranges on small ones, and
+# its blob SHA to skip files already stored
 def _fetch_manifest_contents(
     owner: str,
     repo: str,
@@ -228,24 +348,53 @@ def _fetch_manifest_contents(
 
     for name in ROOT_MANIFEST_CANDIDATES:
         item = by_name.get(name)
-        if not item:
+        if not item or name in LOCKFILE_SUMMARIZERS:
             continue
-        download_url = item.get("download_url")
-        text: Optional[str] = None
-        if download_url:
-            r = _gh_get(download_url)
-            if r:
-                text = r.text
-        elif default_branch:
-            raw_url = f"https://raw.githubusercontent.com/{owner}/{repo}/{default_branch}/{name}"
-            r = _gh_get(raw_url)
-            if r:
-                text = r.text
-        if text is not None:
-            manifest_map[name] = text
+        url = _root_file_url(owner, repo, default_branch, item)
+        if not url:
+            continue
+        data = _fetch_blob(url, item, MANIFEST_MAX_BYTES)
+        if data is not None:
+            manifest_map[name] = data.decode("utf-8", errors="ignore")
     return manifest_map
 
 
+# Parse a manifest excerpt, or None when it is missing or was cut off
+def _parse_manifest(manifests: Dict[str, str], name: str, loads) -> Optional[Dict[str, Any]]:
+    try:
+        return loads(manifests[name])
+    except (KeyError, ValueError):
+        return None
+
+
+# Stream each lockfile present in root through its parser and keep only the summary
+def _summarize_lockfiles(
+    owner: str,
+    repo: str,
+    default_branch: Optional[str],
+    root_items: List[Dict[str, Any]],
+    manifests: Dict[str, str],
+) -> Dict[str, Dict[str, Any]]:
+    by_name = {item.get("name"): item for item in root_items}
+    direct_sources = {
+        "yarn.lock": _parse_manifest(manifests, "package.json", json.loads),
+        "Pipfile.lock": _parse_manifest(manifests, "Pipfile", tomllib.loads),
+    }
+    summaries: Dict[str, Dict[str, Any]] = {}
+    for name, summarize in LOCKFILE_SUMMARIZERS.items():
+        item = by_name.get(name)
+        url = _root_file_url(owner, repo, default_branch, item) if item else None
+        if not url:
+            continue
+        lines = iter_lines(_gh_stream(url, LOCKFILE_MAX_BYTES, item.get("size")))
+        args = (direct_sources[name],) if name in direct_sources else ()
+        try:
+            summaries[name] = summarize(lines, *args)
+        except (requests.RequestException, ValueError):
+            continue
+    return summaries
+
+
 # Summarize root items as "name (type)" strings
 def _summarize_root_files(root_items: List[Dict[str, Any]]) -> List[str]:
     names = []
@@ -254,6 +403,41 @@ def _summarize_root_files(root_items: List[Dict[str, Any]]) -> List[str]:
     return names
 
 
+# Context values whose JSON is larger than this are kept in the blob store and referenced
+# by SHA in graph state, so checkpoints and state emits carry only the references
+CONTEXT_INLINE_MAX_BYTES = int(os.getenv("CONTEXT_INLINE_MAX_BYTES", "512"))
+BLOB_REF = "$blob"
+
+
+# Replace large context values with blob references; runs blocking disk writes
+def _offload_context(context: Dict[str, Any]) -> Dict[str, Any]:
+    offloaded = {}
+    for key, value in context.items():
+        data = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        sha = blob_store.put_content(data) if len(data) > CONTEXT_INLINE_MAX_BYTES else None
+        offloaded[key] = {BLOB_REF: sha, "bytes": len(data)} if sha else value
+    return offloaded
+
+
+def _is_blob_ref(value: Any) -> bool:
+    return isinstance(value, dict) and BLOB_REF in value
+
+
+# Load the values behind blob references; a missing blob leaves its key out
+def _materialize_context(context: Dict[str, Any]) -> Dict[str, Any]:
+    materialized = {}
+    for key, value in context.items():
+        if not _is_blob_ref(value):
+            materialized[key] = value
+            continue
+        data = blob_store.get(value[BLOB_REF])
+        if data is None:
+            logger.warning("Context blob missing", extra=logs.fields(key=key, sha=value[BLOB_REF]))
+            continue
+        materialized[key] = json.loads(data)
+    return materialized
+
+
 # Build the analysis prompt by embedding gathered repository context
 def _build_analysis_prompt(context: Dict[str, Any]) -> str:
     return (
@@ -263,14 +447,222 @@ def _build_analysis_prompt(context: Dict[str, Any]) -> str:
         f"Repository metadata:\n{json.dumps(context.get('repo_info', {}), indent=2)}\n\n"
         f"Languages (bytes of code):\n{json.dumps(context.get('languages', {}), indent=2)}\n\n"
         f"Root items:\n{json.dumps(context.get('root_files', []), indent=2)}\n\n"
-        f"Manifests (truncated to first 2000 chars each):\n{json.dumps({k: v[:2000] for k, v in context.get('manifests', {}).items()}, indent=2)}\n\n"
-        "README content (truncated to first 8000 chars):\n"
-        + context.get("readme", "")[:8000]
+        f"Manifests (truncated to first {MANIFEST_PROMPT_CHARS} chars each):\n{json.dumps({k: v[:MANIFEST_PROMPT_CHARS] for k, v in context.get('manifests', {}).items()}, indent=2)}\n\n"
+        f"Lockfile summaries:\n{json.dumps(context.get('lockfiles', {}), separators=(',', ':'))}\n\n"
+        f"README content (truncated to first {README_PROMPT_CHARS} chars):\n"
+        + context.get("readme", "")[:README_PROMPT_CHARS]
         + "\n\n"
         "Infer the stack with specific frameworks and libraries when possible (e.g., Next.js, Express, FastAPI, Prisma, Postgres)."
     )
 
 
+# Fetch everything the analysis needs and assemble the context dict
+def _gather_repo_context(owner: str, repo: str) -> Dict[str, Any]:
+    repo_info = _fetch_repo_info(owner, repo)
+    default_branch = repo_info.get("default_branch")
+    languages = _fetch_languages(owner, repo)
+    root_items = _list_root(owner, repo)
+    readme = _fetch_readme(owner, repo, root_items)
+    manifests = _fetch_manifest_contents(owner, repo, default_branch, root_items)
+    lockfiles = _summarize_lockfiles(owner, repo, default_branch, root_items, manifests)
+
+    # Assemble the gathered context for downstream analysis
+    return {
+        "owner": owner,
+        "repo": repo,
+        "commit_sha": _fetch_head_sha(owner, repo),
+        "repo_info": repo_info,
+        "languages": languages,
+        "readme": readme,
+        "root_files": _summarize_root_files(root_items),
+        "manifests": manifests,
+        "lockfiles": lockfiles,
+    }
+
+
+# Build the same context as `_gather_repo_context` from a local checkout, without network calls
+def _gather_local_context(path: str) -> Dict[str, Any]:
+    walk = local_repo.walk_repository(path)
+    commit_sha, branch = local_repo.read_git_head(path)
+    by_name = {item["name"]: item for item in walk.root_items}
+
+    manifests: Dict[str, str] = {}
+    for name in ROOT_MANIFEST_CANDIDATES:
+        if by_name.get(name, {}).get("type") == "file" and name not in LOCKFILE_SUMMARIZERS:
+            data = local_repo.read_prefix(os.path.join(path, name), MANIFEST_MAX_BYTES)
+            if data is not None:
+                manifests[name] = data.decode("utf-8", errors="ignore")
+
+    direct_sources = {
+        "yarn.lock": _parse_manifest(manifests, "package.json", json.loads),
+        "Pipfile.lock": _parse_manifest(manifests, "Pipfile", tomllib.loads),
+    }
+    lockfiles: Dict[str, Dict[str, Any]] = {}
+    for name, summarize in LOCKFILE_SUMMARIZERS.items():
+        if by_name.get(name, {}).get("type") != "file":
+            continue
+        lines = iter_lines(local_repo.iter_mapped(os.path.join(path, name), LOCKFILE_MAX_BYTES))
+        args = (direct_sources[name],) if name in direct_sources else ()
+        try:
+            lockfiles[name] = summarize(lines, *args)
+        except (OSError, ValueError):
+            continue
+
+    readme = ""
+    for item in walk.root_items:
+        if item["type"] == "file" and item["name"].lower() in {"readme.md", "readme", "readme.txt", "readme.rst"}:
+            data = local_repo.read_prefix(os.path.join(path, item["name"]), README_MAX_BYTES)
+            readme = data.decode("utf-8", errors="ignore") if data else ""
+            break
+
+    name = os.path.basename(path.rstrip(os.sep))
+    return {
+        "source": "local",
+        "owner": "local",
+        "repo": name,
+        "commit_sha": commit_sha,
+        "repo_info": {
+            "name": name,
+            "full_name": path,
+            "default_branch": branch,
+            "size": walk.total_bytes // 1024,
+            "file_count": walk.files,
+            "directory_count": walk.directories,
+        },
+        "languages": walk.languages,
+        "readme": readme,
+        "root_files": _summarize_root_files(walk.root_items),
+        "manifests": manifests,
+        "lockfiles": lockfiles,
+    }
+
+
+ANALYSIS_SYSTEM_INSTRUCTIONS = (
+    "You are a senior software architect. Analyze the repository context provided by the user. "
+    "When responding, do not write free-form text. Always call the tool `return_stack_analysis` "
+    "with all applicable fields filled."
+)
+
+
+# System instructions and the tool declaration never change, so they form a cacheable prefix
+ANALYSIS_PREFIX = "stack_analysis"
+prompt_cache.cache.register(
+    ANALYSIS_PREFIX,
+    prompt_cache.PrefixSpec(
+        model="gemini-2.5-pro",
+        system_instruction=ANALYSIS_SYSTEM_INSTRUCTIONS,
+        tools=[
+            genai_types.Tool(
+                function_declarations=[
+                    genai_types.FunctionDeclaration(
+                        name="return_stack_analysis",
+                        description=return_stack_analysis_tool.description,
+                        parameters_json_schema=StructuredStackAnalysis.model_json_schema(),
+                    )
+                ]
+            )
+        ],
+        approx_tokens=admission.estimate_tokens(
+            ANALYSIS_SYSTEM_INSTRUCTIONS, json.dumps(StructuredStackAnalysis.model_json_schema())
+        ),
+    ),
+)
+
+
+# Pull the return_stack_analysis call out of a model reply, as (payload, message) or None
+def _tool_payload(tool_msg: Any) -> Optional[Tuple[Dict[str, Any], AIMessage]]:
+    if not isinstance(tool_msg, AIMessage):
+        return None
+    for call in getattr(tool_msg, "tool_calls", None) or []:
+        if call.get("name") == "return_stack_analysis":
+            args = call.get("args", {}) or {}
+            try:
+                payload = StructuredStackAnalysis(**args).model_dump(exclude_none=True)
+            except Exception:
+                payload = dict(args)
+            tool_msg.tool_calls = [call]
+            return payload, tool_msg
+    return None
+
+
+# Record prompt and cache-read tokens reported on a LangChain reply
+def _record_analysis_usage(message: Any, started: float) -> None:
+    usage = getattr(message, "usage_metadata", None) or {}
+    prompt_cache.record_usage(
+        ANALYSIS_PREFIX,
+        usage.get("input_tokens", 0),
+        (usage.get("input_token_details") or {}).get("cache_read", 0),
+        time.perf_counter() - started,
+    )
+
+
+# Ask Gemini for the structured analysis: a tool call first, schema-coerced output as fallback.
+# Returns the payload (or None) and the AI message carrying the tool call, when there was one.
+async def _run_structured_analysis(
+    context: Dict[str, Any], config: Optional[RunnableConfig]
+) -> Tuple[Optional[Dict[str, Any]], Optional[AIMessage]]:
+    messages = [
+        SystemMessage(content=ANALYSIS_SYSTEM_INSTRUCTIONS),
+        HumanMessage(content=_build_analysis_prompt(context)),
+    ]
+    tokens = admission.estimate_tokens(*(m.content for m in messages))
+    model = ChatGoogleGenerativeAI(
+        model="gemini-2.5-pro",
+        temperature=0.4,
+        max_retries=2,
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+    )
+
+    # With a live prefix cache only the repository context is sent; instructions and tool come from the cache
+    cache_name = await prompt_cache.cache.get(ANALYSIS_PREFIX)
+    if cache_name:
+        try:
+            async with admission.gemini.slot(tokens):
+                started = time.perf_counter()
+                tool_msg = await deadlines.call(model.ainvoke(messages[1:], config, cached_content=cache_name))
+            _record_analysis_usage(tool_msg, started)
+            result = _tool_payload(tool_msg)
+            if result is not None:
+                return result
+        except (admission.AdmissionRejected, deadlines.RunCancelled):
+            raise
+        except Exception:
+            prompt_cache.cache.invalidate(ANALYSIS_PREFIX)
+
+    # Attempt tool-based structured output first
+    try:
+        bound = model.bind_tools([return_stack_analysis_tool])
+        async with admission.gemini.slot(tokens):
+            started = time.perf_counter()
+            tool_msg = await deadlines.call(bound.ainvoke(messages, config))
+        _record_analysis_usage(tool_msg, started)
+        result = _tool_payload(tool_msg)
+        if result is not None:
+            return result
+    except (admission.AdmissionRejected, deadlines.RunCancelled):
+        raise
+    except Exception:
+        pass
+
+    # Fall back to schema-coerced structured output if no tool call is returned
+    try:
+        structured_model = model.with_structured_output(StructuredStackAnalysis)
+        async with admission.gemini.slot(tokens):
+            structured_response = await deadlines.call(structured_model.ainvoke(messages, config))
+        if isinstance(structured_response, StructuredStackAnalysis):
+            return structured_response.model_dump(exclude_none=True), None
+        if isinstance(structured_response, dict):
+            return structured_response, None
+        try:
+            return structured_response.dict(exclude_none=True), None  # type: ignore[attr-defined]
+        except Exception:
+            return None, None
+    except (admission.AdmissionRejected, deadlines.RunCancelled):
+        raise
+    except Exception:
+        return None, None
+
+
 async def gather_context_node(state: StackAgentState, config: RunnableConfig):
     # 1. Configure execution to emit intermediate messages and tool calls
     config = copilotkit_customize_config(
@@ -279,10 +671,32 @@ async def gather_context_node(state: StackAgentState, config: RunnableConfig):
         emit_tool_calls=True,
     )
 
-    # Parse the last user message for a GitHub URL; fall back when absent
+    # Parse the last user message for a GitHub URL or an allowed local path; fall back when absent
     last_user_content = state["messages"][-1].content if state["messages"] else ""
     parsed = _parse_github_url(last_user_content)
-    
+    local_path = None if parsed else local_repo.resolve_local_path(last_user_content)
+
+    if local_path:
+        state["tool_logs"] = state.get("tool_logs", [])
+        state["tool_logs"].append(
+            {"id": str(uuid.uuid4()), "message": "Scanning local repository", "status": "processing"}
+        )
+        await copilotkit_emit_state(config, state)
+        context = await deadlines.call(asyncio.to_thread(_gather_local_context, local_path))
+        context = await asyncio.to_thread(_offload_context, context)
+        state["tool_logs"][-1]["status"] = "completed"
+        await copilotkit_emit_state(config, state)
+        return Command(
+            goto= "analyze",
+            update = {
+                "analysis": state["analysis"],
+                "context": context,
+                "tool_logs": state["tool_logs"],
+                "show_cards": False,
+                "last_user_content": last_user_content
+            }
+        )
+
     if not parsed:
         return Command(
             goto= "analyze",
@@ -309,6 +723,7 @@ async def gather_context_node(state: StackAgentState, config: RunnableConfig):
 
 
     owner, repo = parsed
+    analysis_store.record_request(owner, repo)
     state["tool_logs"][-1]["status"] = "completed"
     await copilotkit_emit_state(config, state)
 
@@ -322,24 +737,10 @@ async def gather_context_node(state: StackAgentState, config: RunnableConfig):
     )
     await copilotkit_emit_state(config, state)
 
-    # 4. Fetch metadata, languages, README, root items, and manifests
-    repo_info = _fetch_repo_info(owner, repo)
-    default_branch = repo_info.get("default_branch")
-    languages = _fetch_languages(owner, repo)
-    readme = _fetch_readme(owner, repo)
-    root_items = _list_root(owner, repo)
-    manifests = _fetch_manifest_contents(owner, repo, default_branch, root_items)
-
-    # 5. Assemble the gathered context for downstream analysis
-    context: Dict[str, Any] = {
-        "owner": owner,
-        "repo": repo,
-        "repo_info": repo_info,
-        "languages": languages,
-        "readme": readme,
-        "root_files": _summarize_root_files(root_items),
-        "manifests": manifests,
-    }
+    # 4. Fetch metadata, languages, README, root items, and manifests (blocking I/O, off the event loop),
+    # keeping the large parts in the blob store rather than in the checkpointed state
+    context = await deadlines.call(asyncio.to_thread(_gather_repo_context, owner, repo))
+    context = await asyncio.to_thread(_offload_context, context)
 
     state["tool_logs"][-1]["status"] = "completed"
     await copilotkit_emit_state(config, state)
@@ -378,76 +779,32 @@ async def analyze_with_gemini_node(state: StackAgentState, config: RunnableConfi
     )
     await copilotkit_emit_state(config, state)
 
-    # 8. Build the prompt and system instructions for structured tool usage
-    prompt = _build_analysis_prompt(context)
-    system_instructions = (
-        "You are a senior software architect. Analyze the repository context provided by the user. "
-        "When responding, do not write free-form text. Always call the tool `return_stack_analysis` "
-        "with all applicable fields filled."
-    )
-    messages = [
-        SystemMessage(content=system_instructions),
-        HumanMessage(content=prompt),
-    ]
-
-    # 9. Initialize Gemini client for tool call and fallback passes
-    model = ChatGoogleGenerativeAI(
-        model="gemini-2.5-pro",
-        temperature=0.4,
-        max_retries=2,
-        google_api_key=os.getenv("GOOGLE_API_KEY"),
-    )
-
-    pretty: str
-    structured_payload: Optional[Dict[str, Any]] = None
-
-    # 10. Attempt tool-based structured output first
-    try:
-        bound = model.bind_tools([return_stack_analysis_tool])
-        tool_msg = await bound.ainvoke(messages, config)
-        if isinstance(tool_msg, AIMessage):
-            tool_calls = getattr(tool_msg, "tool_calls", None)
-            if tool_calls:
-                for call in tool_calls:
-                    if call.get("name") == "return_stack_analysis":
-                        args = call.get("args", {}) or {}
-                        state['analysis'] = json.dumps(args)
-                        state['show_cards'] = True
-                        await copilotkit_emit_state(config, state)
-                        try:
-                            structured_payload = StructuredStackAnalysis(
-                                **args
-                            ).model_dump(exclude_none=True)
-                        except Exception:
-                            structured_payload = dict(args)
-                        break
-    except Exception:
-        pass
-
-    if structured_payload is None:
-        # 11. Fall back to schema-coerced structured output if no tool call is returned
-        try:
-            structured_model = model.with_structured_output(StructuredStackAnalysis)
-            structured_response = await structured_model.ainvoke(messages, config)
-            if isinstance(structured_response, StructuredStackAnalysis):
-                structured_payload = structured_response.model_dump(exclude_none=True)
-            elif isinstance(structured_response, dict):
-                structured_payload = structured_response
-            else:
-                try:
-                    structured_payload = structured_response.dict(exclude_none=True)  # type: ignore[attr-defined]
-                except Exception:
-                    structured_payload = None
-        except Exception:
-            structured_payload = None
+    # 8-11. Load the offloaded context, request the structured analysis and show the cards as soon as it arrives
+    context = await asyncio.to_thread(_materialize_context, context)
+    structured_payload, tool_msg = await _run_structured_analysis(context, config)
+    if structured_payload is not None:
+        args = tool_msg.tool_calls[0].get("args", {}) if tool_msg else structured_payload
+        state['analysis'] = json.dumps(args)
+        state['show_cards'] = True
+        await copilotkit_emit_state(config, state)
+        if context.get("source") != "local":
+            await asyncio.to_thread(
+                analysis_store.save, context["owner"], context["repo"], structured_payload, context.get("commit_sha")
+            )
 
     # 12. Mark the analysis step complete and prepare a concise summary request
     state["tool_logs"][-1]["status"] = "completed"
     await copilotkit_emit_state(config, state)
-    messages[-1].content = state["last_user_content"]
-    messages.append(AIMessage(tool_calls=tool_calls, id = tool_msg.id, type = "ai", content= ''))
-    messages.append(ToolMessage(content= "The GitHub Repository has been analyzed", tool_call_id = tool_calls[0]["id"], type = "tool"))
-    messages[0].content = "Generate a summary of the GitHub Repository. It should be in a concise and strictly textual"
+    messages = [
+        SystemMessage(content="Generate a summary of the GitHub Repository. It should be in a concise and strictly textual"),
+        HumanMessage(content=state["last_user_content"]),
+    ]
+    if tool_msg is not None:
+        messages.append(AIMessage(tool_calls=tool_msg.tool_calls, id = tool_msg.id, type = "ai", content= ''))
+        messages.append(ToolMessage(content= "The GitHub Repository has been analyzed", tool_call_id = tool_msg.tool_calls[0]["id"], type = "tool"))
+    elif structured_payload is not None:
+        messages.append(AIMessage(content=json.dumps(structured_payload)))
+        messages.append(HumanMessage(content="Summarize the analysis above."))
     
     # 13. Generate a user-facing summary referencing the tool call outcome
     client = ChatGoogleGenerativeAI(
@@ -458,10 +815,15 @@ async def analyze_with_gemini_node(state: StackAgentState, config: RunnableConfi
     )
     state["tool_logs"].append({"id": str(uuid.uuid4()), "message": "Generating Summary", "status": "processing"})
     await copilotkit_emit_state(config, state)
-    model_response = await client.ainvoke(messages, config)
+    async with admission.gemini.slot(admission.estimate_tokens(*(str(m.content) for m in messages))):
+        model_response = await deadlines.call(client.ainvoke(messages, config))
     state["tool_logs"][-1]["status"] = "completed"
     await copilotkit_emit_state(config, state)
-    print(model_response, "model_response")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Analysis summary response",
+            extra=logs.fields(content=model_response.content, usage=getattr(model_response, "usage_metadata", None)),
+        )
    
     state["messages"].append(AIMessage(content= model_response.content))
     # 14. Return a message containing the analysis
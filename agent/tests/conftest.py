@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The agent modules are imported from the agent directory, as `main:app` does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Building the Gemini chat models needs a key, but the tests never call Gemini
+os.environ.setdefault("GOOGLE_API_KEY", "test")
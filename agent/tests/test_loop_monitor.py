@@ -0,0 +1,96 @@
+import asyncio
+import os
+import time
+from typing import TypedDict
+
+import pytest
+from langchain_core.messages import HumanMessage
+from langgraph.graph import END, START, StateGraph
+
+import local_repo
+import loop_monitor
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _State(TypedDict):
+    done: bool
+
+
+def _single_node_graph(node):
+    graph = StateGraph(_State)
+    graph.add_node("node", node)
+    graph.add_edge(START, "node")
+    graph.add_edge("node", END)
+    return graph.compile()
+
+
+async def blocking_node(state: _State):
+    time.sleep(0.3)
+    return {"done": True}
+
+
+async def yielding_node(state: _State):
+    await asyncio.sleep(0.3)
+    return {"done": True}
+
+
+def test_blocking_node_raises():
+    async def run():
+        async with loop_monitor.no_blocking():
+            await _single_node_graph(blocking_node).ainvoke({"done": False})
+
+    with pytest.raises(loop_monitor.LoopBlocked) as excinfo:
+        asyncio.run(run())
+    assert "blocking_node" in str(excinfo.value)
+
+
+def test_yielding_node_passes():
+    async def run():
+        async with loop_monitor.no_blocking():
+            return await _single_node_graph(yielding_node).ainvoke({"done": False})
+
+    assert asyncio.run(run())["done"]
+
+
+def test_gather_context_node_does_not_block(tmp_path, monkeypatch):
+    import stack_agent
+
+    for i in range(200):
+        (tmp_path / f"module_{i}.py").write_text("import os\n" * 50)
+    (tmp_path / "README.md").write_text("# Example\n")
+    (tmp_path / "requirements.txt").write_text("fastapi\nhttpx\n")
+    monkeypatch.setattr(local_repo, "ALLOWED_ROOTS", [os.path.realpath(tmp_path)])
+    monkeypatch.setattr(stack_agent.blob_store, "directory", str(tmp_path / "blobs"))
+
+    async def analyze(state):
+        return {}
+
+    graph = StateGraph(stack_agent.StackAgentState)
+    graph.add_node("gather_context", stack_agent.gather_context_node)
+    graph.add_node("analyze", analyze)
+    graph.add_edge(START, "gather_context")
+    graph.add_edge("analyze", END)
+    initial = {
+        "messages": [HumanMessage(content=str(tmp_path))],
+        "tool_logs": [],
+        "analysis": {},
+        "show_cards": False,
+        "context": {},
+        "last_user_content": "",
+    }
+
+    async def run():
+        async with loop_monitor.no_blocking():
+            return await graph.compile().ainvoke(initial)
+
+    final = asyncio.run(run())
+    assert final["context"]
+
+
+def test_fashtml_copy_matches():
+    with open(os.path.join(AGENT_DIR, "loop_monitor.py"), "rb") as f:
+        agent_copy = f.read()
+    with open(os.path.join(AGENT_DIR, "..", "fashtml", "loop_monitor.py"), "rb") as f:
+        fashtml_copy = f.read()
+    assert agent_copy == fashtml_copy
@@ -71,6 +71,20 @@ interface PostInterface {
   }
 }
 
+interface DraftInterface extends PostInterface {
+  score: number
+}
+
+interface AgentState {
+  tool_logs: any[]
+  drafts?: DraftInterface[]
+  draft_count?: number
+  redraft?: boolean
+}
+
+// How many alternatives to ask for when the user wants more options
+const REDRAFT_COUNT = 3
+
 
 export default function PostGenerator() {
   const router = useRouter()
@@ -80,7 +94,7 @@ export default function PostGenerator() {
   const [posts, setPosts] = useState<PostInterface>({ tweet: { title: "", content: "" }, linkedIn: { title: "", content: "" } })
   const [isAgentActive, setIsAgentActive] = useState(false)
   const [isDropdownOpen, setIsDropdownOpen] = useState(false)
-  const { setState, running } = useCoAgent({
+  const { state, setState, running } = useCoAgent<AgentState>({
     name: "post_generation_agent",
     initialState: {
       tool_logs: []
@@ -356,6 +370,27 @@ export default function PostGenerator() {
 
         {/* Main Canvas */}
         <div className="flex-1 p-6 overflow-y-auto">
+          {showColumns && (
+            <div className="flex items-center gap-2 mb-4">
+              {(state?.drafts?.length ?? 0) > 1 && state.drafts!.map((draft, index) => (
+                <Button key={index} variant="outline" size="sm" className="rounded-xl"
+                  onClick={() => setPosts({ tweet: draft.tweet, linkedIn: draft.linkedIn })}>
+                  Draft {index + 1}
+                </Button>
+              ))}
+              <Button variant="outline" size="sm" className="rounded-xl ml-auto" disabled={running}
+                onClick={() => {
+                  setState((prevState) => ({ ...prevState, tool_logs: prevState?.tool_logs || [], redraft: true, draft_count: REDRAFT_COUNT }))
+                  appendMessage(new TextMessage({
+                    role: Role.User,
+                    content: "Give me a few alternative versions of these posts"
+                  }))
+                }}>
+                <Sparkles className="mr-2 h-4 w-4" />
+                More options
+              </Button>
+            </div>
+          )}
           {showColumns ? (
             <div className="flex gap-6 min-h-full">
               {/* LinkedIn Column - 75% */}
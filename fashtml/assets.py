@@ -0,0 +1,144 @@
+"""
+Static assets, caching headers and response compression for the FastHTML canvas.
+
+Stylesheets are served from memory under content-hashed URLs with immutable
+cache headers, so browsers fetch them once per deploy. Everything else is
+compressed with brotli (when installed) or gzip, except event streams, which
+must reach the browser unbuffered.
+"""
+
+import gzip
+import hashlib
+import os
+from typing import Dict, List, Optional
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip covers every browser
+    brotli = None
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def etag_for(content: bytes) -> str:
+    """Strong ETag derived from the content."""
+    return '"%s"' % hashlib.sha256(content).hexdigest()[:16]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value covers `etag`."""
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+class Asset:
+    """A static file served from memory under a fingerprinted URL."""
+
+    def __init__(self, path: str, media_type: str, prefix: str = "/assets"):
+        with open(path, "rb") as f:
+            self.content = f.read()
+        self.media_type = media_type
+        self.digest = hashlib.sha256(self.content).hexdigest()[:12]
+        name, ext = os.path.splitext(os.path.basename(path))
+        self.url = f"{prefix}/{name}.{self.digest}{ext}"
+        self.etag = f'"{self.digest}"'
+
+
+class AssetMiddleware:
+    """Serve fingerprinted assets before routing, with immutable cache headers."""
+
+    def __init__(self, app, assets: List[Asset]):
+        self.app = app
+        self.assets: Dict[str, Asset] = {a.url: a for a in assets}
+
+    async def __call__(self, scope, receive, send):
+        asset = self.assets.get(scope.get("path")) if scope["type"] == "http" else None
+        if asset is None or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        not_modified = etag_matches(headers.get(b"if-none-match", b"").decode("latin-1"), asset.etag)
+        body = b"" if not_modified or scope["method"] == "HEAD" else asset.content
+        await send({
+            "type": "http.response.start",
+            "status": 304 if not_modified else 200,
+            "headers": [
+                (b"content-type", asset.media_type.encode()),
+                (b"content-length", str(0 if not_modified else len(asset.content)).encode()),
+                (b"cache-control", IMMUTABLE.encode()),
+                (b"etag", asset.etag.encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {part.split(";")[0].strip() for part in accept_encoding.lower().split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    """Compress buffered responses with brotli or gzip; pass event streams through."""
+
+    def __init__(self, app, minimum_size: int = 500, gzip_level: int = 6, brotli_quality: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _choose_encoding(dict(scope["headers"]).get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        chunks: List[bytes] = []
+        passthrough = False
+
+        async def wrapped_send(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                headers = {k.lower(): v for k, v in message.get("headers", [])}
+                content_type = headers.get(b"content-type", b"")
+                # Raster images are already compressed
+                raster = content_type.startswith(b"image/") and not content_type.startswith(b"image/svg")
+                if content_type.startswith(b"text/event-stream") or raster or b"content-encoding" in headers:
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            headers = [(k, v) for k, v in start.get("headers", []) if k.lower() != b"content-length"]
+            if len(body) >= self.minimum_size:
+                body = self._compress(body, encoding)
+                headers.append((b"content-encoding", encoding.encode()))
+                headers.append((b"vary", b"Accept-Encoding"))
+            headers.append((b"content-length", str(len(body)).encode()))
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, wrapped_send)
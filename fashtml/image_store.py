@@ -0,0 +1,124 @@
+"""
+Content-addressed cache of generated post images on local disk.
+
+An image is looked up by the hash of the prompt that produced it, so the same
+prompt is never generated twice. Files are named `<prompt hash>-<content
+hash>.<ext>`: the name changes whenever the bytes do, which makes the URLs safe
+to serve as immutable. Images are addressed by that name without the extension,
+which keeps their URLs clear of static-file routes. The directory is capped in
+size and the least recently used images are evicted first.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/webp": "webp"}
+MEDIA_TYPES = {ext: media_type for media_type, ext in EXTENSIONS.items()}
+FILENAME = re.compile(r"^(?P<key>[0-9a-f]{32})-[0-9a-f]{16}\.(?P<ext>png|jpg|webp)$")
+IMAGE_ID = re.compile(r"^(?P<key>[0-9a-f]{32})-[0-9a-f]{16}$")
+
+
+def prompt_key(prompt: str, model: str) -> str:
+    """Cache key of an image prompt: whitespace and case do not matter."""
+    normalized = " ".join(prompt.lower().split())
+    return hashlib.sha256(f"{model}\n{normalized}".encode()).hexdigest()[:32]
+
+
+class ImageStore:
+    """Images on disk by prompt key, least recently used evicted past `max_bytes`."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+        # key -> (filename, size), oldest use first
+        self._entries: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+        found = []
+        for name in os.listdir(directory):
+            match = FILENAME.match(name)
+            if match:
+                stat = os.stat(os.path.join(directory, name))
+                found.append((stat.st_mtime, match["key"], name, stat.st_size))
+        for _, key, name, size in sorted(found):
+            self._add(key, name, size)
+
+    def _add(self, key: str, name: str, size: int) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.total_bytes -= previous[1]
+            if previous[0] != name:
+                self._remove_file(previous[0])
+        self._entries[key] = (name, size)
+        self.total_bytes += size
+
+    def _remove_file(self, name: str) -> None:
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def get(self, key: str) -> Optional[str]:
+        """Id of the image for `key`, or None; counts as a use."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return _image_id(entry[0])
+
+    def put(self, key: str, data: bytes, media_type: str) -> str:
+        """Store image bytes under `key` and return its id; evicts old images past the cap."""
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        name = f"{key}-{digest}.{EXTENSIONS.get(media_type, 'png')}"
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, os.path.join(self.directory, name))
+        except BaseException:
+            self._remove_file(os.path.basename(tmp))
+            raise
+        with self._lock:
+            self._add(key, name, len(data))
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (old_name, size) = self._entries.popitem(last=False)
+                self.total_bytes -= size
+                self._remove_file(old_name)
+        return _image_id(name)
+
+    def open(self, image_id: str) -> Optional[Tuple[bytes, str]]:
+        """Bytes and media type of a stored image, or None for unknown or evicted ids."""
+        match = IMAGE_ID.match(image_id)
+        if match is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(match["key"])
+            if entry is None or _image_id(entry[0]) != image_id:
+                return None
+            self._entries.move_to_end(match["key"])
+            name = entry[0]
+        try:
+            with open(os.path.join(self.directory, name), "rb") as f:
+                return f.read(), MEDIA_TYPES[name.rsplit(".", 1)[1]]
+        except OSError:
+            return None
+
+
+def _image_id(name: str) -> str:
+    return name.rsplit(".", 1)[0]
+
+
+def create_image_store() -> ImageStore:
+    """Build the store from FASHTML_IMAGE_* environment settings."""
+    default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "generated_images")
+    return ImageStore(
+        os.getenv("FASHTML_IMAGE_DIR", default_dir),
+        int(os.getenv("FASHTML_IMAGE_CACHE_BYTES", str(200 * 1024 * 1024))),
+    )
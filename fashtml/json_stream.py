@@ -0,0 +1,224 @@
+"""
+Incremental JSON parsing for streamed model output.
+
+`IncrementalJSONParser` consumes a JSON document in arbitrary chunks and keeps
+the partially built value up to date, including the string currently being
+written, so fields can be rendered while the model is still producing them.
+Text before the first `{` or `[` (such as a Markdown code fence) is skipped.
+After the closing bracket only whitespace and a closing code fence are
+allowed; anything else, like trailing commas inside the document, raises
+JSONStreamError so callers can retry the request.
+"""
+
+from typing import Any, List, Optional
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_LITERAL_CHARS = set("-+.0123456789eEtruefalsn")
+
+
+class JSONStreamError(ValueError):
+    """Raised when the streamed text cannot be valid JSON."""
+
+
+_FENCE = "```"
+
+
+class _Frame:
+    __slots__ = ("container", "key", "expect", "after_comma")
+
+    def __init__(self, container):
+        self.container = container
+        self.key = None
+        self.expect = "key" if isinstance(container, dict) else "value"
+        # A comma was read and no member followed yet; closing now would be a trailing comma
+        self.after_comma = False
+
+
+class IncrementalJSONParser:
+    """Feed chunks with `feed()`; read the partial document from `value`."""
+
+    def __init__(self):
+        self.value: Any = None
+        self.done = False
+        self._stack: List[_Frame] = []
+        self._string: Optional[List[str]] = None
+        self._string_is_key = False
+        self._string_slot = None
+        self._escape: Optional[str] = None
+        self._high_surrogate: Optional[int] = None
+        self._literal = ""
+        self._tail = ""
+
+    def feed(self, chunk: str) -> Any:
+        """Consume `chunk` and return the partial value."""
+        for i, ch in enumerate(chunk):
+            if self.done:
+                self._trailing(chunk[i:])
+                break
+            self._char(ch)
+        self._publish_partial_string()
+        return self.value
+
+    def close(self) -> Any:
+        """Finish parsing; raise JSONStreamError if the document is incomplete."""
+        if self._literal:
+            self._finish_literal()
+        if not self.done:
+            raise JSONStreamError("unexpected end of JSON input")
+        if self._tail.strip() not in ("", _FENCE):
+            raise JSONStreamError("unexpected text after JSON document")
+        return self.value
+
+    def _trailing(self, text: str):
+        self._tail += text
+        if not _FENCE.startswith(self._tail.strip()):
+            raise JSONStreamError("unexpected text after JSON document")
+
+    # -- character handling -------------------------------------------------
+
+    def _char(self, ch: str):
+        if self._string is not None:
+            self._string_char(ch)
+            return
+        if self._literal:
+            if ch in _LITERAL_CHARS:
+                self._literal += ch
+                return
+            self._finish_literal()
+            if self.done:
+                return
+
+        if ch in " \t\r\n":
+            return
+        if self.value is None and not self._stack:
+            # Skip any preamble until the document starts
+            if ch in "{[":
+                self._open(ch)
+            return
+
+        frame = self._stack[-1]
+        if ch in "{[":
+            self._expect(frame, "value")
+            self._open(ch)
+        elif ch in "}]":
+            closes_dict = ch == "}"
+            if closes_dict != isinstance(frame.container, dict) or frame.expect in ("colon", "value") and frame.key is not None:
+                raise JSONStreamError(f"unexpected {ch!r}")
+            if frame.after_comma:
+                raise JSONStreamError(f"trailing comma before {ch!r}")
+            self._stack.pop()
+            if not self._stack:
+                self.done = True
+        elif ch == '"':
+            if isinstance(frame.container, dict) and frame.expect == "key":
+                self._string_is_key = True
+                frame.after_comma = False
+            else:
+                self._expect(frame, "value")
+                self._string_is_key = False
+                self._string_slot = self._attach("")
+            self._string = []
+        elif ch == ":":
+            self._expect(frame, "colon")
+            frame.expect = "value"
+        elif ch == ",":
+            self._expect(frame, "comma")
+            frame.expect = "key" if isinstance(frame.container, dict) else "value"
+            frame.after_comma = True
+        elif ch in _LITERAL_CHARS:
+            self._expect(frame, "value")
+            self._literal = ch
+        else:
+            raise JSONStreamError(f"unexpected {ch!r}")
+
+    def _string_char(self, ch: str):
+        if self._escape is not None:
+            if self._escape == "":
+                if ch == "u":
+                    self._escape = "u"
+                    return
+                if ch not in _ESCAPES:
+                    raise JSONStreamError(f"invalid escape \\{ch}")
+                self._escape = None
+                self._append(_ESCAPES[ch])
+                return
+            self._escape += ch
+            if len(self._escape) == 5:
+                try:
+                    code = int(self._escape[1:], 16)
+                except ValueError:
+                    raise JSONStreamError(f"invalid escape \\{self._escape}")
+                self._escape = None
+                self._append_code_point(code)
+            return
+        if ch == "\\":
+            self._escape = ""
+        elif ch == '"':
+            self._finish_string()
+        else:
+            self._append(ch)
+
+    def _append_code_point(self, code: int):
+        # Hold a high surrogate until its low half arrives so partial text stays encodable
+        if 0xD800 <= code <= 0xDBFF:
+            self._high_surrogate = code
+            return
+        if 0xDC00 <= code <= 0xDFFF and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        self._append(chr(code))
+
+    def _append(self, text: str):
+        self._high_surrogate = None
+        self._string.append(text)
+
+    # -- structure ----------------------------------------------------------
+
+    def _expect(self, frame: _Frame, expected: str):
+        if frame.expect != expected:
+            raise JSONStreamError(f"expected {frame.expect}, got {expected}")
+
+    def _open(self, ch: str):
+        container = {} if ch == "{" else []
+        self._attach(container)
+        self._stack.append(_Frame(container))
+
+    def _attach(self, value):
+        """Place `value` in the current container and return its slot."""
+        if not self._stack:
+            self.value = value
+            return None
+        frame = self._stack[-1]
+        frame.expect = "comma"
+        frame.after_comma = False
+        if isinstance(frame.container, dict):
+            frame.container[frame.key] = value
+            return frame.key
+        frame.container.append(value)
+        return len(frame.container) - 1
+
+    def _finish_string(self):
+        text = "".join(self._string)
+        self._string = None
+        if self._string_is_key:
+            frame = self._stack[-1]
+            frame.key = text
+            frame.expect = "colon"
+        else:
+            self._stack[-1].container[self._string_slot] = text
+
+    def _finish_literal(self):
+        literal, self._literal = self._literal, ""
+        constants = {"true": True, "false": False, "null": None}
+        if literal in constants:
+            value = constants[literal]
+        else:
+            try:
+                value = float(literal) if any(c in literal for c in ".eE") else int(literal)
+            except ValueError:
+                raise JSONStreamError(f"invalid literal {literal!r}")
+        self._attach(value)
+
+    def _publish_partial_string(self):
+        if self._string is not None and not self._string_is_key:
+            self._stack[-1].container[self._string_slot] = "".join(self._string)
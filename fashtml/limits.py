@@ -0,0 +1,66 @@
+"""
+Concurrency limits for Gemini calls made by the FastHTML canvas.
+
+A single limiter is shared by every request in the process: at most
+`max_concurrent` generations run at once, at most `max_queue` wait for a slot,
+and each call gets `timeout` seconds end to end (queueing included).
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class GenerationBusy(Exception):
+    """Raised when the wait queue is full and the request should be turned away."""
+
+
+class GenerationLimiter:
+    """Semaphore with a bounded wait queue and per-call timeouts."""
+
+    def __init__(self, max_concurrent: int = 8, max_queue: int = 32, timeout: float = 60.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold a generation slot for the body of the block; raise GenerationBusy or TimeoutError."""
+        if self.active + self.waiting >= self.max_concurrent + self.max_queue:
+            raise GenerationBusy()
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            async with asyncio.timeout_at(deadline):
+                yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    async def run(self, make_call: Callable[[], Awaitable[T]]) -> T:
+        """Run `make_call()` once a slot is free."""
+        async with self.slot():
+            return await make_call()
+
+
+def create_limiter() -> GenerationLimiter:
+    """Build the limiter from FASHTML_* environment settings."""
+    return GenerationLimiter(
+        max_concurrent=int(os.getenv("FASHTML_MAX_CONCURRENT_GENERATIONS", "8")),
+        max_queue=int(os.getenv("FASHTML_MAX_QUEUED_GENERATIONS", "32")),
+        timeout=float(os.getenv("FASHTML_GENERATION_TIMEOUT", "60")),
+    )
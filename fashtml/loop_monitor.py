@@ -0,0 +1,224 @@
+"""
+Opt-in event-loop diagnostics: loop lag and the code that blocked the loop.
+
+A heartbeat task on the loop notes when it last ran; a watchdog thread checks
+it every LOOP_MONITOR_INTERVAL_MS. When the heartbeat is more than
+LOOP_MONITOR_THRESHOLD_MS late, the watchdog samples the loop thread's stack
+(whatever runs there at that moment is what blocks the loop) and, once the
+loop answers again, charges the stall to that location. `report()` lists the
+worst offenders with their stack traces.
+
+For test suites, `no_blocking()` turns stalls into failures:
+
+    async with loop_monitor.no_blocking():
+        await graph.ainvoke(state, config)
+
+raises LoopBlocked when the loop stalled inside the block.
+
+Enable the monitor in a server with LOOP_MONITOR_ENABLED=1.
+
+The agent and the FastHTML canvas deploy separately, so fashtml/loop_monitor.py
+is a vendored copy of agent/loop_monitor.py. Edit this file and copy it over;
+agent/tests/test_loop_monitor.py fails when the two differ.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "0") == "1"
+THRESHOLD = float(os.getenv("LOOP_MONITOR_THRESHOLD_MS", "100")) / 1000
+INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "20")) / 1000
+MAX_OFFENDERS = 50
+STACK_DEPTH = 25
+
+# Frames under this directory are "ours"; a stall is charged to the innermost of them
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Stall:
+    """One period during which the loop did not run, and where it was stuck."""
+
+    def __init__(self, location: str, stack: List[str], started: float):
+        self.location = location
+        self.stack = stack
+        self.started = started
+        self.seconds = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"location": self.location, "seconds": round(self.seconds, 4), "stack": self.stack}
+
+
+class LoopBlocked(AssertionError):
+    def __init__(self, stalls: List[Stall]):
+        self.stalls = stalls
+        worst = max(stalls, key=lambda s: s.seconds)
+        super().__init__(
+            f"Event loop blocked {len(stalls)} time(s), worst {worst.seconds * 1000:.0f}ms at {worst.location}\n"
+            + "".join(worst.stack)
+        )
+
+
+class _Offender:
+    def __init__(self, location: str):
+        self.location = location
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.stack: List[str] = []
+        self.last_seen = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "location": self.location,
+            "count": self.count,
+            "total_ms": round(self.total_seconds * 1000, 1),
+            "max_ms": round(self.max_seconds * 1000, 1),
+            "last_seen": self.last_seen,
+            "stack": self.stack,
+        }
+
+
+def _locate(frame) -> tuple:
+    summary = traceback.extract_stack(frame)[-STACK_DEPTH:]
+    location = None
+    for entry in reversed(summary):
+        if entry.filename.startswith(APP_DIR) and entry.filename != __file__:
+            location = f"{os.path.relpath(entry.filename, APP_DIR)}:{entry.lineno} in {entry.name}"
+            break
+    if location is None and summary:
+        entry = summary[-1]
+        location = f"{entry.filename}:{entry.lineno} in {entry.name}"
+    return location or "unknown", traceback.format_list(summary)
+
+
+class LoopMonitor:
+    """Heartbeat on the loop plus a watchdog thread that samples the loop when it stalls."""
+
+    def __init__(self, threshold: float = THRESHOLD, interval: float = INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._beat = time.monotonic()
+        self._loop_thread: Optional[int] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._current: Optional[Stall] = None
+        self._offenders: Dict[str, _Offender] = {}
+        self._listeners: List[List[Stall]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._heartbeat is not None
+
+    def start(self) -> None:
+        """Start monitoring the running loop; call from the loop's thread."""
+        if self.running:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._heartbeat = asyncio.get_running_loop().create_task(self._beat_loop())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        if self._heartbeat is None:
+            return
+        self._stopped.set()
+        self._heartbeat.cancel()
+        await asyncio.gather(self._heartbeat, return_exceptions=True)
+        self._heartbeat = None
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+
+    async def _beat_loop(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._beat = time.monotonic()
+            self.lag = max(0.0, self._beat - started - self.interval)
+            self.max_lag = max(self.max_lag, self.lag)
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.interval):
+            late = time.monotonic() - self._beat - self.interval
+            if late > self.threshold:
+                if self._current is None:
+                    frame = sys._current_frames().get(self._loop_thread)
+                    if frame is None:
+                        continue
+                    location, stack = _locate(frame)
+                    self._current = Stall(location, stack, self._beat)
+                self._current.seconds = late
+            elif self._current is not None:
+                self._record(self._current)
+                self._current = None
+
+    def _record(self, stall: Stall) -> None:
+        with self._lock:
+            self.stalls += 1
+            offender = self._offenders.get(stall.location)
+            if offender is None:
+                if len(self._offenders) >= MAX_OFFENDERS:
+                    least = min(self._offenders.values(), key=lambda o: o.max_seconds)
+                    if least.max_seconds >= stall.seconds:
+                        return
+                    del self._offenders[least.location]
+                offender = self._offenders[stall.location] = _Offender(stall.location)
+            offender.count += 1
+            offender.total_seconds += stall.seconds
+            if stall.seconds >= offender.max_seconds:
+                offender.max_seconds = stall.seconds
+                offender.stack = stall.stack
+            offender.last_seen = time.time()
+            for listener in self._listeners:
+                listener.append(stall)
+
+    def report(self, limit: int = 10) -> Dict[str, Any]:
+        """Current and worst lag, and the locations that blocked the loop longest."""
+        with self._lock:
+            offenders = sorted(self._offenders.values(), key=lambda o: o.max_seconds, reverse=True)
+            return {
+                "running": self.running,
+                "threshold_ms": self.threshold * 1000,
+                "lag_ms": round(self.lag * 1000, 1),
+                "max_lag_ms": round(self.max_lag * 1000, 1),
+                "stalls": self.stalls,
+                "offenders": [o.as_dict() for o in offenders[:limit]],
+            }
+
+    @asynccontextmanager
+    async def no_blocking(self):
+        """Raise LoopBlocked if the loop stalls past the threshold inside the block."""
+        started_here = not self.running
+        if started_here:
+            self.start()
+        collected: List[Stall] = []
+        with self._lock:
+            self._listeners.append(collected)
+        try:
+            yield self
+            # Give the watchdog a beat to close a stall that ended just now
+            await asyncio.sleep(self.interval * 3)
+        finally:
+            with self._lock:
+                self._listeners.remove(collected)
+            if started_here:
+                await self.stop()
+        if collected:
+            raise LoopBlocked(collected)
+
+
+monitor = LoopMonitor()
+no_blocking = monitor.no_blocking
@@ -3,197 +3,111 @@
 import os
 import json
 import asyncio
+import base64
+import functools
+import inspect
+import logging
+import time
+import uuid
 from typing import Dict, List, Optional
 from fasthtml.common import *
 from fasthtml.components import *
 import google.generativeai as genai
+import httpx
 from dotenv import load_dotenv
+from session_store import create_store
+from limits import GenerationBusy, GenerationLimiter, create_limiter
+from image_store import create_image_store, prompt_key
+from precompute import PrecomputedPosts, normalize_prompt
+from json_stream import IncrementalJSONParser, JSONStreamError
+from metrics import registry as metrics
+import loop_monitor
+from assets import IMMUTABLE, Asset, AssetMiddleware, CompressionMiddleware, etag_for, etag_matches
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger("fashtml")
+
 # Configure Google AI
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
+# Stylesheet served under a content-hashed URL with immutable cache headers
+canvas_css = Asset(os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "canvas.css"), "text/css")
+
+page_hdrs = (
+    Link(rel="stylesheet", href="https://cdn.jsdelivr.net/npm/@picocss/pico@2/css/pico.min.css"),
+    Link(rel="stylesheet", href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css"),
+    Link(rel="stylesheet", href=canvas_css.url),
+)
+
+# Start the event-loop monitor with the app when LOOP_MONITOR_ENABLED=1
+async def start_loop_monitor():
+    if loop_monitor.ENABLED:
+        loop_monitor.monitor.start()
+
+# Keep quick-action posts precomputed while the app runs
+async def start_precompute():
+    if QUICK_ACTIONS_ENABLED:
+        precomputed.start(QUICK_ACTIONS_CHECK_EVERY, record_precompute_pass)
+
+async def stop_precompute():
+    await precomputed.stop()
+
 # Set up the FastHTML app
 app, rt = fast_app(
-    hdrs=(
-        Link(rel="stylesheet", href="https://cdn.jsdelivr.net/npm/@picocss/pico@2/css/pico.min.css"),
-        Link(rel="stylesheet", href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css"),
-        Style("""
-            :root {
-                --primary-color: #3b82f6;
-                --secondary-color: #8b5cf6;
-                --accent-color: #ec4899;
-                --background-gradient: linear-gradient(135deg, #f8fafc 0%, #e0e7ff 50%, #e0f2fe 100%);
-            }
-            
-            body {
-                background: var(--background-gradient);
-                min-height: 100vh;
-            }
-            
-            .sidebar {
-                background: rgba(255, 255, 255, 0.8);
-                backdrop-filter: blur(20px);
-                border-right: 1px solid rgba(229, 231, 235, 0.5);
-                box-shadow: 0 25px 50px -12px rgba(0, 0, 0, 0.25);
-                width: 320px;
-                min-height: 100vh;
-                position: fixed;
-                left: 0;
-                top: 0;
-                overflow-y: auto;
-            }
-            
-            .main-content {
-                margin-left: 320px;
-                min-height: 100vh;
-                padding: 0;
-            }
-            
-            .header {
-                background: rgba(255, 255, 255, 0.8);
-                backdrop-filter: blur(20px);
-                border-bottom: 1px solid rgba(229, 231, 235, 0.5);
-                padding: 1.5rem;
-                box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-            }
-            
-            .canvas-area {
-                padding: 1.5rem;
-                min-height: calc(100vh - 120px);
-            }
-            
-            .gradient-text {
-                background: linear-gradient(135deg, #3b82f6, #8b5cf6, #ec4899);
-                -webkit-background-clip: text;
-                -webkit-text-fill-color: transparent;
-                background-clip: text;
-            }
-            
-            .gradient-bg {
-                background: linear-gradient(135deg, #3b82f6, #8b5cf6, #ec4899);
-            }
-            
-            .post-card {
-                background: rgba(255, 255, 255, 0.9);
-                backdrop-filter: blur(10px);
-                border: 1px solid rgba(229, 231, 235, 0.5);
-                border-radius: 12px;
-                padding: 1.5rem;
-                margin-bottom: 1rem;
-                box-shadow: 0 10px 25px -5px rgba(0, 0, 0, 0.1);
-            }
-            
-            .quick-action-btn {
-                background: rgba(255, 255, 255, 0.5);
-                backdrop-filter: blur(10px);
-                border: 1px solid rgba(229, 231, 235, 0.5);
-                border-radius: 12px;
-                padding: 1.5rem;
-                text-align: center;
-                transition: all 0.3s ease;
-                cursor: pointer;
-                display: flex;
-                flex-direction: column;
-                align-items: center;
-                gap: 0.75rem;
-            }
-            
-            .quick-action-btn:hover {
-                background: rgba(255, 255, 255, 0.7);
-                transform: translateY(-2px);
-                box-shadow: 0 15px 35px -5px rgba(0, 0, 0, 0.15);
-            }
-            
-            .agent-selector {
-                background: rgba(255, 255, 255, 0.5);
-                backdrop-filter: blur(10px);
-                border: 1px solid rgba(229, 231, 235, 0.5);
-                border-radius: 12px;
-                padding: 1rem;
-                margin-bottom: 1rem;
-            }
-            
-            .chat-input {
-                background: rgba(255, 255, 255, 0.9);
-                border: 1px solid rgba(229, 231, 235, 0.5);
-                border-radius: 12px;
-                padding: 1rem;
-                resize: vertical;
-                min-height: 80px;
-            }
-            
-            .send-btn {
-                background: linear-gradient(135deg, #3b82f6, #8b5cf6, #ec4899);
-                border: none;
-                border-radius: 12px;
-                color: white;
-                padding: 0.75rem 1.5rem;
-                font-weight: 600;
-                cursor: pointer;
-                transition: all 0.3s ease;
-            }
-            
-            .send-btn:hover {
-                transform: translateY(-1px);
-                box-shadow: 0 10px 25px -5px rgba(59, 130, 246, 0.5);
-            }
-            
-            .status-badge {
-                background: linear-gradient(135deg, #10b981, #059669);
-                color: white;
-                padding: 0.5rem 1rem;
-                border-radius: 20px;
-                font-size: 0.875rem;
-                font-weight: 600;
-                display: inline-flex;
-                align-items: center;
-                gap: 0.5rem;
-            }
-            
-            .pulse {
-                width: 8px;
-                height: 8px;
-                background: white;
-                border-radius: 50%;
-                animation: pulse 2s infinite;
-            }
-            
-            @keyframes pulse {
-                0%, 100% { opacity: 1; }
-                50% { opacity: 0.5; }
-            }
-            
-            .columns-layout {
-                display: flex;
-                gap: 1.5rem;
-                min-height: 100%;
-            }
-            
-            .linkedin-column {
-                flex: 3;
-            }
-            
-            .twitter-column {
-                flex: 1;
-            }
-        """)
+    hdrs=page_hdrs,
+    on_startup=[start_loop_monitor, start_precompute],
+    on_shutdown=[loop_monitor.monitor.stop, stop_precompute],
+    middleware=(
+        Middleware(CompressionMiddleware),
+        Middleware(AssetMiddleware, assets=[canvas_css]),
     )
 )
 
-# Global state
-app_state = {
-    "current_agent": "post_generation_agent",
-    "is_generating": False,
-    "posts": {
-        "linkedin": {"title": "", "content": ""},
-        "twitter": {"title": "", "content": ""}
-    },
-    "show_posts": False,
-    "chat_messages": []
-}
+# Per-session state, keyed by an id stored in the signed session cookie
+sessions = create_store()
+
+# Shared limit on concurrent Gemini generations
+generation_limiter = create_limiter()
+
+# Minimum seconds between partial post repaints on the SSE stream
+STREAM_REPAINT_INTERVAL = 0.15
+
+# Gemini model and how often an answer that isn't valid JSON is regenerated
+GEMINI_MODEL = os.getenv("FASHTML_GEMINI_MODEL", "gemini-2.5-flash")
+PARSE_RETRIES = int(os.getenv("FASHTML_PARSE_RETRIES", "1"))
+
+parse_failures = metrics.counter("fashtml_post_parse_failures_total", "Model answers that were not valid posts JSON")
+generation_retries = metrics.counter("fashtml_post_generation_retries_total", "Generations repeated after a parse failure")
+prompt_resends = metrics.counter("fashtml_prompt_resends_total", "Prompts a session submitted again right after the same prompt")
+
+# Post images, generated in the background next to the text and cached on disk by prompt hash
+IMAGE_MODEL = os.getenv("FASHTML_IMAGE_MODEL", "gemini-2.5-flash-image")
+IMAGES_ENABLED = os.getenv("FASHTML_IMAGES_ENABLED", "1") == "1" and bool(os.getenv("GOOGLE_API_KEY"))
+# Seconds an image slot request waits for its image before htmx asks again
+IMAGE_POLL_WAIT = float(os.getenv("FASHTML_IMAGE_POLL_WAIT", "20"))
+images = create_image_store()
+# Images get their own slots so they never hold up post text
+image_limiter = GenerationLimiter(
+    max_concurrent=int(os.getenv("FASHTML_MAX_CONCURRENT_IMAGES", "4")),
+    max_queue=int(os.getenv("FASHTML_MAX_QUEUED_IMAGES", "16")),
+    timeout=float(os.getenv("FASHTML_IMAGE_TIMEOUT", "90")),
+)
+# Generations in flight by prompt key, so concurrent requests for one prompt share a call
+image_tasks: Dict[str, asyncio.Task] = {}
+
+images_generated = metrics.counter("fashtml_images_generated_total", "Post images generated by Gemini")
+image_cache_hits = metrics.counter("fashtml_image_cache_hits_total", "Post images served from the image store or an in-flight generation")
+image_failures = metrics.counter("fashtml_image_failures_total", "Post image generations that failed")
+
+def get_session_id(session) -> str:
+    """Return the session id, assigning one on first visit"""
+    sid = session.get("sid")
+    if not sid:
+        sid = uuid.uuid4().hex
+        session["sid"] = sid
+    return sid
 
 # Agent configurations
 agents = [
@@ -220,7 +134,38 @@ quick_actions = [
     {"label": "Post about Social Media", "icon": "fab fa-twitter", "color": "#8b5cf6", "prompt": "Generate a post about Instagram"},
     {"label": "Post about Stocks", "icon": "fas fa-chart-line", "color": "#f59e0b", "prompt": "Generate a post about Nvidia"}
 ]
+quick_action_prompts = {normalize_prompt(action["prompt"]) for action in quick_actions}
 
+# Quick-action posts are generated ahead of time and served from this cache while fresh
+QUICK_ACTIONS_REFRESH = float(os.getenv("FASHTML_QUICK_ACTIONS_REFRESH", "3600"))
+QUICK_ACTIONS_MAX_AGE = float(os.getenv("FASHTML_QUICK_ACTIONS_MAX_AGE", str(2 * QUICK_ACTIONS_REFRESH)))
+QUICK_ACTIONS_CHECK_EVERY = 60.0
+QUICK_ACTIONS_ENABLED = QUICK_ACTIONS_REFRESH > 0 and bool(os.getenv("GOOGLE_API_KEY"))
+quick_action_hits = metrics.counter("fashtml_quick_action_hits_total", "Quick-action clicks served from precomputed posts")
+quick_action_misses = metrics.counter("fashtml_quick_action_misses_total", "Quick-action clicks generated live because no fresh posts were precomputed")
+quick_action_refreshes = metrics.counter("fashtml_quick_action_refreshes_total", "Quick-action posts regenerated in the background")
+quick_action_refresh_failures = metrics.counter("fashtml_quick_action_refresh_failures_total", "Background quick-action generations that failed")
+
+def record_precompute_pass(counts: Dict[str, int]):
+    quick_action_refreshes.inc(counts["refreshed"])
+    quick_action_refresh_failures.inc(counts["failed"])
+
+def render_cached(fn):
+    """Render a component once per distinct arguments and reuse the HTML"""
+    @functools.lru_cache(maxsize=None)
+    def cached(*args):
+        return NotStr(to_xml(fn(*args)))
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # Normalize keyword calls so they share the positional cache entry
+        bound = inspect.signature(fn).bind(*args, **kwargs)
+        bound.apply_defaults()
+        return cached(*bound.args)
+
+    return wrapper
+
+@render_cached
 def create_sidebar():
     """Create the sidebar component"""
     return Div(
@@ -287,6 +232,7 @@ def create_sidebar():
         cls="sidebar"
     )
 
+@render_cached
 def create_header(is_generating=False):
     """Create the header component"""
     return Div(
@@ -314,6 +260,7 @@ def create_header(is_generating=False):
         cls="header"
     )
 
+@render_cached
 def create_welcome_screen():
     """Create the welcome screen with quick actions"""
     return Div(
@@ -347,9 +294,17 @@ def create_welcome_screen():
         cls="canvas-area"
     )
 
-def create_posts_view(linkedin_post, twitter_post):
+def freshness_note(generated_at: float):
+    """When precomputed posts were generated"""
+    minutes = int((time.time() - generated_at) // 60)
+    age = "just now" if minutes < 1 else f"{minutes} min ago" if minutes < 120 else f"{minutes // 60} h ago"
+    return P(I(cls="fas fa-bolt", style="margin-right: 0.5rem;"), f"Precomputed {age}", cls="freshness-note")
+
+def create_posts_view(linkedin_post, twitter_post, image_key: Optional[str] = None, precomputed_at: Optional[float] = None):
     """Create the posts view with LinkedIn and Twitter columns"""
     return Div(
+        freshness_note(precomputed_at) if precomputed_at else "",
+        image_slot(image_key) if image_key else "",
         Div(
             # LinkedIn column
             Div(
@@ -427,14 +382,33 @@ def create_twitter_post(title, content):
         )
     )
 
+def create_busy_view():
+    """Fragment returned when too many generations are already queued"""
+    return Div(
+        create_header(False),
+        Div(
+            Div(
+                I(cls="fas fa-hourglass-half", style="color: #f59e0b; font-size: 2rem; margin-bottom: 1rem;"),
+                H3("The canvas is busy", style="margin-bottom: 0.5rem;"),
+                P("Too many posts are being generated right now. Please try again in a few seconds.", style="color: #6b7280;"),
+                style="text-align: center; padding: 4rem 0;"
+            ),
+            cls="canvas-area",
+            id="main-content"
+        ),
+        cls="main-content"
+    )
+
 @rt("/")
-def get():
+def get(session):
     """Main page route"""
+    app_state = sessions.load(get_session_id(session))
     return Html(
         Head(
             Title("Open Gemini Canvas"),
             Meta(charset="utf-8"),
-            Meta(name="viewport", content="width=device-width, initial-scale=1")
+            Meta(name="viewport", content="width=device-width, initial-scale=1"),
+            *page_hdrs
         ),
         Body(
             create_sidebar(),
@@ -443,22 +417,36 @@ def get():
                 Div(
                     create_welcome_screen() if not app_state["show_posts"] else create_posts_view(
                         app_state["posts"]["linkedin"], 
-                        app_state["posts"]["twitter"]
+                        app_state["posts"]["twitter"],
+                        app_state.get("image_key"),
+                        app_state.get("precomputed_at")
                     ),
                     id="main-content"
                 ),
                 cls="main-content"
             ),
-            Script(src="https://unpkg.com/htmx.org@1.9.10")
+            Script(src="https://unpkg.com/htmx.org@1.9.10"),
+            Script(src="https://unpkg.com/htmx.org@1.9.10/dist/ext/sse.js")
         )
     )
 
-async def generate_posts_with_ai(prompt: str):
-    """Generate posts using Google Gemini AI"""
-    try:
-        model = genai.GenerativeModel('gemini-pro')
-        
-        system_prompt = f"""You are an advanced AI research agent powered by Google DeepMind and Gemini technologies. Generate both a LinkedIn post and a Twitter/X post based on the user's request: "{prompt}"
+# JSON schema the model's answer is constrained to
+POSTS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        platform: {
+            "type": "object",
+            "properties": {"title": {"type": "string"}, "content": {"type": "string"}},
+            "required": ["title", "content"],
+        }
+        for platform in ("linkedin", "twitter")
+    },
+    "required": ["linkedin", "twitter"],
+}
+
+def build_post_prompt(prompt: str) -> str:
+    """Build the Gemini prompt asking for both posts as JSON"""
+    return f"""You are an advanced AI research agent powered by Google DeepMind and Gemini technologies. Generate both a LinkedIn post and a Twitter/X post based on the user's request: "{prompt}"
 
 Please respond with a JSON object containing:
 {{
@@ -474,81 +462,361 @@ Please respond with a JSON object containing:
 
 Make the content engaging, professional, and relevant to the topic. Include appropriate hashtags and emojis where suitable."""
 
-        response = model.generate_content(system_prompt)
-        
-        # Try to parse JSON response
-        try:
-            import re
-            json_match = re.search(r'\{.*\}', response.text, re.DOTALL)
-            if json_match:
-                posts_data = json.loads(json_match.group())
-                return posts_data
-        except:
-            pass
-        
-        # Fallback if JSON parsing fails
-        return {
-            "linkedin": {
-                "title": "AI-Generated Insights",
-                "content": response.text[:500] + "\n\n#AI #Technology #Innovation"
-            },
-            "twitter": {
-                "title": "",
-                "content": response.text[:250] + " #AI #Tech"
-            }
+def fallback_posts(prompt: str):
+    """Mock posts used when generation fails"""
+    return {
+        "linkedin": {
+            "title": "AI-Powered Content Generation",
+            "content": f"Exploring: {prompt}\n\nThe integration of advanced AI systems is transforming how we approach content creation and research.\n\n#AI #Innovation #Technology"
+        },
+        "twitter": {
+            "title": "",
+            "content": f"🤖 AI insights on {prompt}! The future of intelligent content creation is here. #AI #Tech #Innovation"
         }
-        
-    except Exception as e:
-        print(f"AI generation error: {e}")
-        # Fallback to mock data
-        return {
-            "linkedin": {
-                "title": "AI-Powered Content Generation",
-                "content": f"Exploring: {prompt}\n\nThe integration of advanced AI systems is transforming how we approach content creation and research.\n\n#AI #Innovation #Technology"
-            },
-            "twitter": {
-                "title": "",
-                "content": f"🤖 AI insights on {prompt}! The future of intelligent content creation is here. #AI #Tech #Innovation"
-            }
+    }
+
+def raw_text_posts(text: str):
+    """Posts built from unparseable model text, used only after every retry failed"""
+    return {
+        "linkedin": {
+            "title": "AI-Generated Insights",
+            "content": text[:500] + "\n\n#AI #Technology #Innovation"
+        },
+        "twitter": {
+            "title": "",
+            "content": text[:250] + " #AI #Tech"
         }
+    }
 
-@rt("/send_message", methods=["POST"])
-async def send_message(message: str):
-    """Handle chat message submission"""
-    app_state["is_generating"] = True
-    app_state["chat_messages"].append({"role": "user", "content": message})
-    
-    # Generate posts using AI
-    posts_data = await generate_posts_with_ai(message)
-    
-    app_state["posts"]["linkedin"] = posts_data["linkedin"]
-    app_state["posts"]["twitter"] = posts_data["twitter"]
-    
-    app_state["show_posts"] = True
-    app_state["is_generating"] = False
-    
-    # Return updated main content
+def normalize_posts(value):
+    """Coerce a (possibly partial) parsed document into the posts shape"""
+    value = value if isinstance(value, dict) else {}
+    posts = {}
+    for platform in ("linkedin", "twitter"):
+        post = value.get(platform)
+        post = post if isinstance(post, dict) else {}
+        posts[platform] = {
+            field: post[field] if isinstance(post.get(field), str) else ""
+            for field in ("title", "content")
+        }
+    return posts
+
+def parse_posts(text: str):
+    """Parse a complete model answer; raise JSONStreamError when it isn't valid posts JSON"""
+    parser = IncrementalJSONParser()
+    parser.feed(text)
+    value = parser.close()
+    if not isinstance(value, dict) or not all(isinstance(value.get(p), dict) for p in ("linkedin", "twitter")):
+        raise JSONStreamError("missing linkedin or twitter object")
+    return normalize_posts(value)
+
+def posts_model():
+    """Gemini model constrained to answer with POSTS_SCHEMA JSON"""
+    return genai.GenerativeModel(
+        GEMINI_MODEL,
+        generation_config=genai.GenerationConfig(
+            response_mime_type="application/json",
+            response_schema=POSTS_SCHEMA,
+        ),
+    )
+
+class UnparsedPosts(Exception):
+    """Every attempt answered with text that isn't valid posts JSON"""
+
+    def __init__(self, text: str):
+        super().__init__("model answer is not valid posts JSON")
+        self.text = text
+
+async def request_posts(prompt: str):
+    """Generate posts, retrying unparseable answers; raise instead of falling back"""
+    text = ""
+    for attempt in range(PARSE_RETRIES + 1):
+        if attempt:
+            generation_retries.inc()
+        response = await generation_limiter.run(lambda: posts_model().generate_content_async(build_post_prompt(prompt)))
+        text = response.text
+        try:
+            return parse_posts(text)
+        except JSONStreamError:
+            parse_failures.inc()
+    raise UnparsedPosts(text)
+
+# Only real answers are precomputed: failures are retried on the next pass instead of caching fallback posts
+precomputed = PrecomputedPosts(
+    [action["prompt"] for action in quick_actions],
+    request_posts,
+    os.getenv("FASHTML_QUICK_ACTIONS_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "quick_actions_cache.json")),
+    QUICK_ACTIONS_REFRESH,
+    QUICK_ACTIONS_MAX_AGE,
+)
+
+async def stream_posts_with_ai(prompt: str):
+    """Yield (posts, done) pairs as Gemini streams its answer; the last pair is final"""
+    partial, text = normalize_posts(None), ""
+    try:
+        for attempt in range(PARSE_RETRIES + 1):
+            if attempt:
+                generation_retries.inc()
+            parser, text = IncrementalJSONParser(), ""
+            async with generation_limiter.slot():
+                response = await posts_model().generate_content_async(build_post_prompt(prompt), stream=True)
+                try:
+                    async for chunk in response:
+                        text += chunk.text
+                        partial = normalize_posts(parser.feed(chunk.text))
+                        yield partial, False
+                    yield parse_posts(text), True
+                    return
+                except JSONStreamError:
+                    parse_failures.inc()
+    except GenerationBusy:
+        raise
+    except Exception:
+        logger.warning("AI generation failed", exc_info=True)
+        yield fallback_posts(prompt), True
+        return
+    # Every attempt produced invalid JSON; keep whatever was readable
+    if partial["linkedin"]["content"] or partial["twitter"]["content"]:
+        yield partial, True
+    else:
+        yield raw_text_posts(text), True
+
+# Image instructions, after agent/prompts.py system_prompt_2
+IMAGE_INSTRUCTIONS = """You are an amazing artist. Generate one image to illustrate a social media post written for the user's prompt.
+Be creative and use your imagination; do not put any text or lettering in the image."""
+
+async def generate_image(prompt: str):
+    """Ask Gemini for an image; return (bytes, media type) or None when the answer has no image"""
+    # The google-generativeai SDK cannot return images, so this calls the REST API directly
+    url = f"https://generativelanguage.googleapis.com/v1beta/models/{IMAGE_MODEL}:generateContent"
+    body = {
+        "systemInstruction": {"parts": [{"text": IMAGE_INSTRUCTIONS}]},
+        "contents": [{"role": "user", "parts": [{"text": f"User Prompt : {prompt}"}]}],
+        "generationConfig": {"responseModalities": ["TEXT", "IMAGE"]},
+    }
+    async with httpx.AsyncClient(timeout=image_limiter.timeout) as client:
+        response = await client.post(url, json=body, headers={"x-goog-api-key": os.getenv("GOOGLE_API_KEY", "")})
+        response.raise_for_status()
+    for candidate in response.json().get("candidates", []):
+        for part in candidate.get("content", {}).get("parts", []):
+            inline = part.get("inlineData")
+            if inline and inline.get("data"):
+                return base64.b64decode(inline["data"]), inline.get("mimeType", "image/png")
+    return None
+
+async def _store_generated_image(key: str, prompt: str):
+    try:
+        result = await image_limiter.run(lambda: generate_image(prompt))
+        if result is None:
+            image_failures.inc()
+            return
+        await asyncio.to_thread(images.put, key, *result)
+        images_generated.inc()
+    except Exception:
+        image_failures.inc()
+        logger.warning("AI image generation failed", exc_info=True)
+
+def start_image(prompt: str) -> Optional[str]:
+    """Start generating the image for `prompt` in the background unless it is stored or in flight; return its key"""
+    if not IMAGES_ENABLED:
+        return None
+    key = prompt_key(prompt, IMAGE_MODEL)
+    if images.get(key) or key in image_tasks:
+        image_cache_hits.inc()
+        return key
+    task = asyncio.create_task(_store_generated_image(key, prompt))
+    image_tasks[key] = task
+    task.add_done_callback(lambda _: image_tasks.pop(key, None))
+    return key
+
+def image_slot(key: str):
+    """The post image, or a placeholder that htmx swaps for it once it is ready"""
+    image_id = images.get(key)
+    if image_id:
+        return Div(Img(src=f"/images/{image_id}", alt="Post image", cls="post-image"), cls="post-image-slot")
+    if key in image_tasks:
+        return Div(
+            Img(src="/api/placeholder/1200/630", alt="Generating image...", cls="post-image"),
+            cls="post-image-slot",
+            hx_get=f"/images/slot/{key}",
+            hx_trigger="load",
+            hx_swap="outerHTML"
+        )
+    # Generation failed; show the posts without an image
+    return ""
+
+def create_result_view(app_state):
+    """Header plus posts view, as swapped in once generation finishes"""
     return Div(
         create_header(app_state["is_generating"]),
         Div(
             create_posts_view(
                 app_state["posts"]["linkedin"], 
-                app_state["posts"]["twitter"]
+                app_state["posts"]["twitter"],
+                app_state.get("image_key"),
+                app_state.get("precomputed_at")
             ),
             id="main-content"
         ),
         cls="main-content"
     )
 
+def create_streaming_view(stream_id: str):
+    """Skeleton that connects to the SSE stream and fills in as posts arrive"""
+    return Div(
+        Div(
+            create_header(is_generating=True),
+            Div(
+                Div(
+                    P(I(cls="fas fa-search", style="margin-right: 0.5rem;"), "Researching your topic...", style="color: #6b7280;"),
+                    sse_swap="status"
+                ),
+                Div(
+                    Div(sse_swap="linkedin", cls="linkedin-column"),
+                    Div(sse_swap="twitter", cls="twitter-column"),
+                    cls="columns-layout"
+                ),
+                cls="canvas-area",
+                id="main-content"
+            ),
+            cls="main-content"
+        ),
+        hx_ext="sse",
+        sse_connect=f"/stream/{stream_id}",
+        sse_swap="done",
+        sse_close="done"
+    )
+
+def status_message(text: str):
+    return P(I(cls="fas fa-pen-nib", style="margin-right: 0.5rem;"), text, style="color: #6b7280;")
+
+@rt("/send_message", methods=["POST"])
+async def send_message(message: str, session):
+    """Handle chat message submission with precomputed posts or by starting a streamed generation"""
+    sid = get_session_id(session)
+    app_state = sessions.load(sid)
+    stream_id = uuid.uuid4().hex
+    previous = app_state["chat_messages"][-1:]
+    if previous and previous[0]["content"] == message:
+        prompt_resends.inc()
+    app_state["chat_messages"].append({"role": "user", "content": message})
+
+    # Quick actions are answered from precomputed posts while they are fresh
+    if normalize_prompt(message) in quick_action_prompts:
+        entry = precomputed.get(message)
+        if entry is not None:
+            quick_action_hits.inc()
+            app_state["posts"] = {platform: dict(post) for platform, post in entry["posts"].items()}
+            app_state["show_posts"] = True
+            app_state["precomputed_at"] = entry["generated_at"]
+            app_state["image_key"] = start_image(message)
+            sessions.save(sid, app_state)
+            return create_result_view(app_state)
+        quick_action_misses.inc()
+    app_state["is_generating"] = True
+    app_state["pending"] = {"id": stream_id, "prompt": message}
+    app_state["precomputed_at"] = None
+    sessions.save(sid, app_state)
+
+    # Paint the skeleton right away; the posts arrive over /stream/{stream_id}
+    return create_streaming_view(stream_id)
+
+@rt("/stream/{stream_id}")
+async def stream(stream_id: str, session):
+    """Stream generation progress and partial posts as server-sent events"""
+    sid = get_session_id(session)
+    app_state = sessions.load(sid)
+    pending = app_state.get("pending")
+    if not pending or pending["id"] != stream_id:
+        # 204 tells EventSource not to reconnect
+        return Response(status_code=204)
+    app_state["pending"] = None
+    # The image runs next to the text and never delays it
+    app_state["image_key"] = start_image(pending["prompt"])
+    sessions.save(sid, app_state)
+
+    async def events():
+        yield sse_message(status_message("Writing posts..."), event="status")
+        shown = {"linkedin": "", "twitter": ""}
+        last_emit = 0.0
+        result, busy = None, False
+        try:
+            async for posts, done in stream_posts_with_ai(pending["prompt"]):
+                if done:
+                    result = posts
+                    break
+                # Throttle partial repaints so long posts don't flood the stream
+                now = time.monotonic()
+                if now - last_emit < STREAM_REPAINT_INTERVAL:
+                    continue
+                last_emit = now
+                if posts["linkedin"]["content"] != shown["linkedin"]:
+                    shown["linkedin"] = posts["linkedin"]["content"]
+                    yield sse_message(create_linkedin_post(posts["linkedin"]["title"], shown["linkedin"]), event="linkedin")
+                if posts["twitter"]["content"] != shown["twitter"]:
+                    shown["twitter"] = posts["twitter"]["content"]
+                    yield sse_message(create_twitter_post(posts["twitter"]["title"], shown["twitter"]), event="twitter")
+        except GenerationBusy:
+            busy = True
+        finally:
+            # Runs on disconnects and errors too, so the session never stays stuck generating;
+            # reload first so changes made while the stream ran aren't overwritten
+            latest = sessions.load(sid)
+            if result is not None:
+                latest["posts"]["linkedin"] = result["linkedin"]
+                latest["posts"]["twitter"] = result["twitter"]
+                latest["show_posts"] = True
+            latest["is_generating"] = False
+            sessions.save(sid, latest)
+        yield sse_message(create_busy_view() if busy else create_result_view(latest), event="done")
+
+    return EventStream(events())
+
+@rt("/metrics")
+def get_metrics():
+    """Prometheus metrics"""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@rt("/debug/loop")
+def get_loop_report(limit: int = 10):
+    """Event-loop lag and the code that blocked the loop longest"""
+    if not loop_monitor.monitor.running:
+        return JSONResponse({"detail": "Loop monitor disabled; set LOOP_MONITOR_ENABLED=1"}, status_code=404)
+    return JSONResponse(loop_monitor.monitor.report(limit))
+
+@rt("/images/slot/{key}")
+async def get_image_slot(key: str):
+    """Long-poll for a post image: answer once it is ready or after IMAGE_POLL_WAIT seconds"""
+    task = image_tasks.get(key)
+    if task is not None:
+        await asyncio.wait({task}, timeout=IMAGE_POLL_WAIT)
+    return image_slot(key)
+
+@rt("/images/{image_id}")
+async def get_image(image_id: str, request):
+    """Serve a stored post image; ids carry the content hash, so they are cached forever"""
+    found = await asyncio.to_thread(images.open, image_id)
+    if found is None:
+        return Response(status_code=404)
+    data, media_type = found
+    headers = {"ETag": f'"{image_id}"', "Cache-Control": IMMUTABLE}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(data, media_type=media_type, headers=headers)
+
 @rt("/api/placeholder/{width}/{height}")
-def placeholder_image(width: int, height: int):
+def placeholder_image(width: int, height: int, request):
     """Serve placeholder images"""
     # Return a simple SVG placeholder
     svg = f'''<svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg">
         <rect width="100%" height="100%" fill="#e5e7eb"/>
         <text x="50%" y="50%" text-anchor="middle" dy=".3em" fill="#9ca3af">{width}x{height}</text>
     </svg>'''
-    return Response(svg, media_type="image/svg+xml")
+    etag = etag_for(svg.encode())
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=86400"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(svg, media_type="image/svg+xml", headers=headers)
 
 if __name__ == "__main__":
     serve(port=5002)
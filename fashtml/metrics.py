@@ -0,0 +1,43 @@
+"""
+In-process counters for the FastHTML canvas, exposed in Prometheus text format.
+"""
+
+import threading
+from typing import Dict
+
+
+class Counter:
+    """Monotonic counter."""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Registry:
+    """Named counters rendered together by `render()`."""
+
+    def __init__(self):
+        self.counters: Dict[str, Counter] = {}
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        if name not in self.counters:
+            self.counters[name] = Counter(name, help_text)
+        return self.counters[name]
+
+    def render(self) -> str:
+        lines = []
+        for c in self.counters.values():
+            lines.append(f"# HELP {c.name} {c.help_text}")
+            lines.append(f"# TYPE {c.name} counter")
+            lines.append(f"{c.name} {c.value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
@@ -0,0 +1,135 @@
+"""
+Precomputed posts for the welcome screen's quick actions.
+
+Quick actions send fixed prompts, so their posts are generated ahead of time
+by a background task and served from this cache when clicked. Every result
+carries the time it was generated: results older than `interval` are
+regenerated on the next pass, and results older than `max_age` are no longer
+served, so a click falls back to live generation. A prompt whose generation
+failed is retried after `retry_after` seconds.
+
+Results are kept in a JSON file as well as in memory, so a restart or a
+second worker on the same host reuses them instead of generating again.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+Posts = Dict[str, Dict[str, str]]
+
+logger = logging.getLogger("fashtml")
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.lower().split())
+
+
+class PrecomputedPosts:
+    """Quick-action posts by prompt, refreshed every `interval` seconds and served up to `max_age`."""
+
+    def __init__(
+        self,
+        prompts: List[str],
+        generate: Callable[[str], Awaitable[Posts]],
+        path: str,
+        interval: float,
+        max_age: float,
+        retry_after: float = 300.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.prompts = prompts
+        self.generate = generate
+        self.path = path
+        self.interval = interval
+        self.max_age = max_age
+        self.retry_after = retry_after
+        self.clock = clock
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.failed_until: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, entry in stored.items():
+            current = self.entries.get(key)
+            if current is None or entry.get("generated_at", 0) > current["generated_at"]:
+                self.entries[key] = entry
+
+    def _save(self) -> None:
+        # A failed write only costs other workers a regeneration
+        tmp = None
+        try:
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+
+    def get(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """`{"posts", "generated_at"}` for a quick-action prompt, or None when missing or too old."""
+        entry = self.entries.get(normalize_prompt(prompt))
+        if entry is None or self.clock() - entry["generated_at"] > self.max_age:
+            return None
+        return entry
+
+    def due(self) -> List[str]:
+        """Prompts whose result is missing or older than the refresh interval, except recent failures."""
+        now = self.clock()
+        return [
+            prompt for prompt in self.prompts
+            if now - self.entries.get(normalize_prompt(prompt), {}).get("generated_at", 0) >= self.interval
+            and self.failed_until.get(normalize_prompt(prompt), 0) <= now
+        ]
+
+    async def refresh(self, prompt: str) -> None:
+        """Generate and store the posts for one prompt; errors propagate to the caller."""
+        posts = await self.generate(prompt)
+        self.entries[normalize_prompt(prompt)] = {"posts": posts, "generated_at": self.clock()}
+        await asyncio.to_thread(self._save)
+
+    async def refresh_due(self) -> Dict[str, int]:
+        """Refresh the due prompts one at a time, after picking up results other workers saved."""
+        await asyncio.to_thread(self._load)
+        counts = {"refreshed": 0, "failed": 0}
+        for prompt in self.due():
+            try:
+                await self.refresh(prompt)
+                counts["refreshed"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Quick action generation failed for %r; it is served live until a retry succeeds", prompt, exc_info=True)
+                self.failed_until[normalize_prompt(prompt)] = self.clock() + self.retry_after
+                counts["failed"] += 1
+        return counts
+
+    async def _loop(self, check_every: float, on_pass: Callable[[Dict[str, int]], None]) -> None:
+        while True:
+            # A failed pass (e.g. the cache file can't be written) must not end the task for good
+            try:
+                on_pass(await self.refresh_due())
+            except Exception:
+                logger.warning("Quick action refresh pass failed", exc_info=True)
+            await asyncio.sleep(check_every)
+
+    def start(self, check_every: float = 60.0, on_pass: Callable[[Dict[str, int]], None] = lambda counts: None) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop(check_every, on_pass))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,139 @@
+"""
+Session-scoped UI state for the FastHTML canvas.
+
+Each browser session gets its own state dict, keyed by an id kept in the signed
+session cookie. The in-memory backend is bounded (LRU + idle eviction); the
+SQLite backend lets several workers share state and survives restarts.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Cap on the chat history kept per session
+MAX_CHAT_MESSAGES = int(os.getenv("FASHTML_MAX_CHAT_MESSAGES", "50"))
+
+
+def default_state() -> Dict[str, Any]:
+    """Fresh state for a session that has none yet."""
+    return {
+        "current_agent": "post_generation_agent",
+        "is_generating": False,
+        "posts": {
+            "linkedin": {"title": "", "content": ""},
+            "twitter": {"title": "", "content": ""}
+        },
+        "show_posts": False,
+        "pending": None,
+        "image_key": None,
+        "precomputed_at": None,
+        "chat_messages": []
+    }
+
+
+class MemoryBackend:
+    """Per-process LRU of session states with idle eviction."""
+
+    def __init__(self, max_sessions: int = 1000, idle_ttl: float = 3600.0):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float):
+        # Entries are kept in last-touched order, so idle ones sit at the front
+        while self._items:
+            sid, (touched, _) = next(iter(self._items.items()))
+            if now - touched <= self.idle_ttl and len(self._items) <= self.max_sessions:
+                break
+            del self._items[sid]
+
+    def get(self, sid: str) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            item = self._items.get(sid)
+            if item is None:
+                return None
+            self._items[sid] = (now, item[1])
+            self._items.move_to_end(sid)
+            return item[1]
+
+    def put(self, sid: str, state: Dict[str, Any]):
+        now = time.monotonic()
+        with self._lock:
+            self._items[sid] = (now, state)
+            self._items.move_to_end(sid)
+            self._evict(now)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class DiskBackend:
+    """SQLite-backed session states shared by every worker on the host."""
+
+    def __init__(self, path: str, max_sessions: int = 100000, idle_ttl: float = 7 * 24 * 3600.0):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (sid TEXT PRIMARY KEY, state TEXT NOT NULL, touched REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_touched ON sessions (touched)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, sid: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT state FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, sid: str, state: Dict[str, Any]):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (sid, state, touched) VALUES (?, ?, ?)",
+                (sid, json.dumps(state), now),
+            )
+            conn.execute("DELETE FROM sessions WHERE touched < ?", (now - self.idle_ttl,))
+            conn.execute(
+                "DELETE FROM sessions WHERE sid IN (SELECT sid FROM sessions ORDER BY touched DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,),
+            )
+
+
+class SessionStore:
+    """Loads and saves the canvas state of one browser session."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def load(self, sid: str) -> Dict[str, Any]:
+        state = self.backend.get(sid)
+        return state if state is not None else default_state()
+
+    def save(self, sid: str, state: Dict[str, Any]):
+        state["chat_messages"] = state["chat_messages"][-MAX_CHAT_MESSAGES:]
+        self.backend.put(sid, state)
+
+
+def create_store() -> SessionStore:
+    """Build the store selected by FASHTML_SESSION_BACKEND (memory or disk)."""
+    idle_ttl = float(os.getenv("FASHTML_SESSION_IDLE_TTL", "3600"))
+    if os.getenv("FASHTML_SESSION_BACKEND", "memory") == "disk":
+        path = os.getenv("FASHTML_SESSION_DB", "sessions.db")
+        return SessionStore(DiskBackend(path, idle_ttl=idle_ttl))
+    max_sessions = int(os.getenv("FASHTML_MAX_SESSIONS", "1000"))
+    return SessionStore(MemoryBackend(max_sessions=max_sessions, idle_ttl=idle_ttl))
@@ -0,0 +1,59 @@
+"""
+Measure bytes per page view and render CPU time of the FastHTML canvas.
+
+Loads `/` in-process and reports the response
+size on the wire for identity, gzip and brotli encodings, plus the CPU time
+spent per request. Static assets referenced by the page are fetched once to
+show their size and cache headers. CPU time is reported both per HTTP request
+and for building and rendering the page component tree alone.
+
+Usage:
+    python scripts/bench-fashtml-page.py [-n 200]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+FASHTML_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "fashtml")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the canvas page")
+    parser.add_argument("-n", "--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    sys.path.insert(0, FASHTML_DIR)
+    os.chdir(FASHTML_DIR)
+    import main as canvas
+    from fasthtml.common import to_xml
+    from starlette.testclient import TestClient
+
+    client = TestClient(canvas.app)
+    for encoding in ("identity", "gzip", "br"):
+        resp = client.get("/", headers={"Accept-Encoding": encoding})
+        wire = resp.headers.get("content-length") or len(resp.content)
+        print(f"/ {encoding:<9} {wire:>7} bytes on the wire (content-encoding: {resp.headers.get('content-encoding', 'none')})")
+
+    page = client.get("/").text
+    for href in re.findall(r'href="(/assets/[^"]+)"', page):
+        resp = client.get(href, headers={"Accept-Encoding": "br, gzip"})
+        print(f"{href}: {resp.headers.get('content-length') or len(resp.content)} bytes, cache-control: {resp.headers.get('cache-control')}")
+
+    started = time.process_time()
+    for _ in range(args.requests):
+        client.get("/", headers={"Accept-Encoding": "identity"})
+    cpu = (time.process_time() - started) / args.requests
+    print(f"/ request  {cpu * 1000:.2f} ms CPU per request over {args.requests} requests")
+
+    started = time.process_time()
+    for _ in range(args.requests):
+        to_xml(canvas.get({}))
+    cpu = (time.process_time() - started) / args.requests
+    print(f"/ render   {cpu * 1000:.2f} ms CPU to build and render the page")
+
+
+if __name__ == "__main__":
+    main()
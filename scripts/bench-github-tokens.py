@@ -0,0 +1,127 @@
+"""
+GitHub throughput of the stack analyzer's request path with 1..N pooled tokens.
+
+Starts a local stand-in for the GitHub API that enforces a per-token quota in
+short windows and answers with the same `X-RateLimit-*` headers and 403s as
+GitHub. Client threads then fetch through `stack_agent._gh_get` (token pool
+and admission included) for a fixed time with each pool size, and the script
+prints successful requests per second. With quota as the bottleneck this
+should grow linearly with the number of tokens.
+
+Usage:
+    python scripts/bench-github-tokens.py [--tokens 1 2 4] [--quota 40] [--window 2] [--seconds 6]
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+AGENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent")
+sys.path.insert(0, AGENT_DIR)
+# The bench measures token quotas, not the admission budget
+os.environ.setdefault("GITHUB_REQUESTS_PER_HOUR", "100000000")
+os.environ.setdefault("GITHUB_MAX_CONCURRENT", "256")
+
+
+class QuotaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, quota: int, window: float):
+        super().__init__(("127.0.0.1", 0), QuotaHandler)
+        self.quota = quota
+        self.window = window
+        self.windows = {}
+        self.lock = threading.Lock()
+
+
+class QuotaHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server: QuotaServer = self.server
+        token = self.headers.get("Authorization", "anonymous")
+        now = time.time()
+        with server.lock:
+            start, used = server.windows.get(token, (now, 0))
+            if now - start >= server.window:
+                start, used = now, 0
+            allowed = used < server.quota
+            used += allowed
+            server.windows[token] = (start, used)
+        reset = math.ceil(start + server.window)
+        headers = {
+            "X-RateLimit-Limit": str(server.quota),
+            "X-RateLimit-Remaining": str(server.quota - used),
+            "X-RateLimit-Reset": str(reset),
+        }
+        body = json.dumps({"ok": allowed}).encode()
+        self.send_response(200 if allowed else 403)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _run(url: str, seconds: float, workers: int):
+    import stack_agent
+
+    ok = failed = 0
+    lock = threading.Lock()
+    stop_at = time.monotonic() + seconds
+
+    def client():
+        nonlocal ok, failed
+        while time.monotonic() < stop_at:
+            try:
+                resp = stack_agent._gh_get(url)
+            except Exception:
+                resp = None
+            with lock:
+                if resp is not None:
+                    ok += 1
+                else:
+                    failed += 1
+            if resp is None:
+                time.sleep(0.05)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for _ in range(workers):
+            pool.submit(client)
+    return ok, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tokens", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--quota", type=int, default=40, help="requests per token per window")
+    parser.add_argument("--window", type=float, default=2.0, help="rate-limit window in seconds")
+    parser.add_argument("--seconds", type=float, default=6.0)
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    import github_tokens
+
+    server = QuotaServer(args.quota, args.window)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/repos/o/r"
+    print(f"Quota {args.quota} requests per token per {args.window}s, {args.workers} client threads\n")
+    print(f"{'tokens':>6s} {'ok/s':>8s} {'refused':>8s} {'per token/s':>12s}")
+    for count in args.tokens:
+        github_tokens.pool = github_tokens.TokenPool([f"bench-token-{count}-{i}" for i in range(count)])
+        ok, failed = _run(url, args.seconds, args.workers)
+        rate = ok / args.seconds
+        print(f"{count:6d} {rate:8.1f} {failed:8d} {rate / count:12.1f}")
+    print(f"\n(ceiling: {args.quota / args.window:.1f} requests/s per token)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
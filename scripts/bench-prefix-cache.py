@@ -0,0 +1,148 @@
+"""
+Input tokens and time to response with and without prompt-prefix caching.
+
+Reports, for each prefix registered by the agents, its approximate size and
+whether it is large enough for Gemini's explicit caching. It then sends the
+same requests twice, once with the full prompt and once with the prefix served
+from a context cache, and prints the input tokens billed at full price and the
+mean time to response.
+
+By default it runs against a local stub client that accounts tokens like the
+API (four characters per token, cached tokens reported separately) and answers
+instantly. That exercises the cache manager (creation, TTL refresh, fallback)
+and the token arithmetic, but not latency. With `--live` it calls Gemini with
+GOOGLE_API_KEY; `--pad-tokens` grows the prefix past the model's minimum
+cacheable size.
+
+Usage:
+    python scripts/bench-prefix-cache.py [-n 20] [--prefix posts_research] [--pad-tokens 4200] [--live]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import types as pytypes
+
+AGENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent")
+sys.path.insert(0, AGENT_DIR)
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _text_of(contents) -> str:
+    return "".join(part.text or "" for content in contents or [] for part in content.parts or [])
+
+
+class StubClient:
+    """Minimal stand-in for google.genai.Client with explicit caching."""
+
+    def __init__(self):
+        self.caches_store = {}
+        self.aio = pytypes.SimpleNamespace(
+            caches=pytypes.SimpleNamespace(create=self._create, update=self._update),
+            models=pytypes.SimpleNamespace(generate_content=self._generate),
+        )
+
+    async def _create(self, *, model, config):
+        name = f"cachedContents/stub-{len(self.caches_store)}"
+        prefix = _text_of(config.contents) + (config.system_instruction or "")
+        self.caches_store[name] = _tokens(prefix)
+        return pytypes.SimpleNamespace(name=name)
+
+    async def _update(self, *, name, config):
+        if name not in self.caches_store:
+            raise KeyError(name)
+
+    async def _generate(self, *, model, contents, config=None):
+        cached = self.caches_store.get(getattr(config, "cached_content", None), 0)
+        prompt = _tokens(_text_of(contents)) + cached
+        usage = pytypes.SimpleNamespace(prompt_token_count=prompt, cached_content_token_count=cached)
+        return pytypes.SimpleNamespace(usage_metadata=usage, text="ok")
+
+
+def _live_client():
+    from google import genai
+
+    return genai.Client(api_key=os.environ["GOOGLE_API_KEY"])
+
+
+async def _run(args):
+    from google.genai import types
+
+    import prompt_cache
+    import posts_generator_agent  # noqa: F401  (registers posts_research)
+    import stack_agent  # noqa: F401  (registers stack_analysis)
+
+    print("Registered prefixes:")
+    for key, entry in prompt_cache.cache._entries.items():
+        spec = entry.spec
+        minimum = prompt_cache.MIN_TOKENS.get(spec.model, prompt_cache.DEFAULT_MIN_TOKENS)
+        print(f"  {key:16s} ~{spec.approx_tokens:5d} tokens  minimum {minimum}  cacheable={spec.approx_tokens >= minimum}")
+
+    spec = prompt_cache.cache._entries[args.prefix].spec
+    padding = "Reference notes. " * (args.pad_tokens * 4 // 17) if args.pad_tokens else ""
+    contents = list(spec.contents) or [types.Content(role="user", parts=[types.Part(text="")])]
+    if padding:
+        contents = [types.Content(role="user", parts=[types.Part(text=padding)]), *contents]
+    bench_spec = prompt_cache.PrefixSpec(
+        model=args.model,
+        contents=contents,
+        system_instruction=spec.system_instruction,
+        approx_tokens=_tokens(_text_of(contents) + (spec.system_instruction or "")),
+    )
+    client = _live_client() if args.live else StubClient()
+    manager = prompt_cache.PrefixCache(lambda: client, ttl=args.ttl, refresh_margin=args.ttl // 4)
+    manager.register("bench", bench_spec)
+    print(f"\nBenchmark prefix ~{bench_spec.approx_tokens} tokens on {args.model} ({'live' if args.live else 'stub'})")
+
+    question = types.Content(role="user", parts=[types.Part(text="Write a short post about vector databases.")])
+    results = {}
+    for mode in ("full", "cached"):
+        billed = cached_total = 0
+        elapsed = 0.0
+        for _ in range(args.requests):
+            name = await manager.get("bench") if mode == "cached" else None
+            started = time.perf_counter()
+            if name:
+                response = await client.aio.models.generate_content(
+                    model=args.model, contents=[question], config=types.GenerateContentConfig(cached_content=name)
+                )
+            else:
+                config = types.GenerateContentConfig(system_instruction=bench_spec.system_instruction)
+                response = await client.aio.models.generate_content(
+                    model=args.model, contents=[*contents, question], config=config
+                )
+            elapsed += time.perf_counter() - started
+            usage = response.usage_metadata
+            cached = usage.cached_content_token_count or 0
+            billed += (usage.prompt_token_count or 0) - cached
+            cached_total += cached
+        results[mode] = (billed, cached_total, elapsed / args.requests)
+
+    print(f"\n{'mode':8s} {'full-price input':>17s} {'cached input':>13s} {'mean response':>14s}")
+    for mode, (billed, cached, mean) in results.items():
+        print(f"{mode:8s} {billed:17d} {cached:13d} {mean * 1000:12.1f}ms")
+    full_billed, cached_billed = results["full"][0], results["cached"][0]
+    if full_billed:
+        print(f"\nFull-price input tokens reduced by {100 * (1 - cached_billed / full_billed):.1f}%")
+    if not args.live:
+        print("(stub mode: response times are not meaningful; use --live to measure them)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", "--requests", type=int, default=20)
+    parser.add_argument("--prefix", default="posts_research")
+    parser.add_argument("--model", default="gemini-2.5-flash")
+    parser.add_argument("--pad-tokens", type=int, default=0, help="grow the prefix to at least this many tokens")
+    parser.add_argument("--ttl", type=int, default=600)
+    parser.add_argument("--live", action="store_true", help="call Gemini instead of the local stub")
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
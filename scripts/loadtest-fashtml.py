@@ -0,0 +1,153 @@
+"""
+Load test for the FastHTML canvas `/send_message` route.
+
+Fires N concurrent `/send_message` requests, follows each one's SSE stream to
+the final `done` event, and reports time to first paint (the skeleton), time to
+the finished posts, busy responses and throughput. With `--url` it targets a
+running server; otherwise it runs the app in-process with Gemini replaced by a
+fixed-latency stand-in, so the numbers reflect the server's concurrency rather
+than the upstream model. In-process runs also report the peak number of
+generations the stand-in served at once, which is the real concurrency (time
+spent queued in the GenerationLimiter does not count).
+
+Usage:
+    python scripts/loadtest-fashtml.py [--url http://localhost:5002] [-n 50] [--latency 2.0]
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+
+import httpx
+
+FASHTML_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "fashtml")
+
+
+class InFlight:
+    """Generations currently inside the stand-in model, and the most seen at once."""
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+
+    def enter(self):
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+
+    def exit(self):
+        self.current -= 1
+
+
+in_flight = InFlight()
+
+
+def _in_process_app(latency: float):
+    sys.path.insert(0, FASHTML_DIR)
+    os.chdir(FASHTML_DIR)
+    import main
+
+    answer = '{"linkedin": {"title": "Load test", "content": "LinkedIn body"}, "twitter": {"title": "", "content": "X body"}}'
+
+    class _Chunk:
+        def __init__(self, text):
+            self.text = text
+
+    class _Stream:
+        # Spread the answer over ten chunks arriving across `latency` seconds
+        def __aiter__(self):
+            return self._chunks()
+
+        async def _chunks(self):
+            step = len(answer) // 10 + 1
+            in_flight.enter()
+            try:
+                for i in range(0, len(answer), step):
+                    await asyncio.sleep(latency / 10)
+                    yield _Chunk(answer[i:i + step])
+            finally:
+                in_flight.exit()
+
+    class _Model:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        async def generate_content_async(self, *args, stream=False, **kwargs):
+            if stream:
+                return _Stream()
+            in_flight.enter()
+            try:
+                await asyncio.sleep(latency)
+            finally:
+                in_flight.exit()
+            return _Chunk(answer)
+
+    main.genai.GenerativeModel = _Model
+    return main.app
+
+
+async def _one(make_client, i: int):
+    # Each simulated user gets its own client so sessions don't collide
+    async with make_client() as client:
+        started = time.perf_counter()
+        resp = await client.post("/send_message", data={"message": f"load test topic {i}"})
+        first_paint = time.perf_counter() - started
+        match = re.search(r'sse-connect="([^"]+)"', resp.text)
+        if resp.status_code != 200 or not match:
+            return first_paint, first_paint, resp.status_code, False
+        body, done = "", False
+        async with client.stream("GET", match.group(1)) as events:
+            async for line in events.aiter_lines():
+                body += line
+                done = done or line == "event: done"
+                if done and not line:
+                    break
+        return first_paint, time.perf_counter() - started, events.status_code, "The canvas is busy" in body
+
+
+async def run(args):
+    if args.url:
+        def make_client():
+            return httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        transport = httpx.ASGITransport(app=_in_process_app(args.latency))
+
+        def make_client():
+            return httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[_one(make_client, i) for i in range(args.requests)])
+    wall = time.perf_counter() - started
+
+    first_paints = sorted(r[0] for r in results)
+    latencies = sorted(r[1] for r in results)
+    errors = sum(1 for r in results if r[2] != 200)
+    busy = sum(1 for r in results if r[3])
+
+    def pct(values, p):
+        return values[min(len(values) - 1, int(p * len(values)))]
+
+    print(f"requests      {args.requests}")
+    print(f"wall time     {wall:.2f}s")
+    print(f"first paint   p50 {pct(first_paints, 0.50):.3f}s  p95 {pct(first_paints, 0.95):.3f}s")
+    print(f"posts done    p50 {pct(latencies, 0.50):.2f}s  p95 {pct(latencies, 0.95):.2f}s  max {latencies[-1]:.2f}s")
+    print(f"busy          {busy}")
+    print(f"errors        {errors}")
+    print(f"throughput    {(args.requests - busy - errors) / wall:.1f} posts/s")
+    if not args.url:
+        print(f"peak in-flight generations  {in_flight.peak}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /send_message")
+    parser.add_argument("--url", help="Base URL of a running server; omit to run in-process")
+    parser.add_argument("-n", "--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=2.0, help="Simulated Gemini latency (in-process mode)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
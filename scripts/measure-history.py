@@ -0,0 +1,108 @@
+"""
+Per-turn input tokens of the post generator over long sessions, with and
+without history compaction.
+
+Simulates sessions of N turns shaped like the post generator's traffic: each
+turn adds a user request, the `generate_post` tool call carrying both drafts,
+its tool result and the assistant's summary. For every turn it counts the input
+tokens `fe_actions_node` would send (system prompt with research context plus
+history), first with the full history and then through `compact_history`,
+carrying the summary state between turns as the graph does. Tokens are
+estimated at four characters per token; summaries use the extractive
+summarizer so no API key is needed.
+
+Usage:
+    python scripts/measure-history.py [--turns 50] [--sessions 5] [--every 5]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import uuid
+
+AGENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent")
+sys.path.insert(0, AGENT_DIR)
+
+WORDS = (
+    "launch product team growth data cloud AI model latency customers pricing roadmap "
+    "security open source community hiring design research release feedback metrics"
+).split()
+
+
+def _words(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def _turn(rng: random.Random):
+    from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+    call_id = uuid.uuid4().hex
+    args = {
+        "tweet": {"title": _words(rng, 5), "content": _words(rng, 40)},
+        "linkedIn": {"title": _words(rng, 8), "content": _words(rng, 220)},
+    }
+    return [
+        HumanMessage(content=f"Write posts about {_words(rng, rng.randint(8, 30))}", id=uuid.uuid4().hex),
+        AIMessage(content="", tool_calls=[{"name": "generate_post", "args": args, "id": call_id}], id=uuid.uuid4().hex),
+        ToolMessage(content="The posts had been generated successfully.", tool_call_id=call_id, id=uuid.uuid4().hex),
+        AIMessage(content=_words(rng, 70), id=uuid.uuid4().hex),
+    ]
+
+
+async def _session(turns: int, seed: int):
+    import admission
+    from history import compact_history, estimate_tokens, extractive_summary
+    from prompts import system_prompt_3
+
+    rng = random.Random(seed)
+    messages = []
+    cached = None
+    rows = []
+    summaries = 0
+    for _ in range(turns):
+        request, *rest = _turn(rng)
+        messages.append(request)
+        prompt = system_prompt_3.replace("{context}", _words(rng, 300))
+        prompt_tokens = admission.estimate_tokens(prompt)
+        full = prompt_tokens + estimate_tokens(messages)
+        history = await compact_history(
+            messages, cached, summarize=extractive_summary, reserved_tokens=prompt_tokens
+        )
+        if cached is None or history.state["count"] != cached["count"]:
+            summaries += history.state["count"] > 0
+        cached = history.state
+        compacted = prompt_tokens + estimate_tokens([*history.preamble, *history.messages])
+        rows.append((full, compacted))
+        messages.extend(rest)
+    return rows, summaries
+
+
+async def _run(args):
+    sessions = [await _session(args.turns, seed) for seed in range(args.sessions)]
+    print(f"{args.sessions} sessions x {args.turns} turns (mean input tokens per fe_actions_node call)\n")
+    print(f"{'turn':>5s} {'full history':>13s} {'compacted':>10s} {'saved':>7s}")
+    for turn in range(args.turns):
+        if (turn + 1) % args.every and turn != 0:
+            continue
+        full = sum(rows[turn][0] for rows, _ in sessions) / args.sessions
+        compacted = sum(rows[turn][1] for rows, _ in sessions) / args.sessions
+        print(f"{turn + 1:5d} {full:13.0f} {compacted:10.0f} {100 * (1 - compacted / full):6.1f}%")
+    total_full = sum(f for rows, _ in sessions for f, _ in rows)
+    total_compacted = sum(c for rows, _ in sessions for _, c in rows)
+    summaries = sum(s for _, s in sessions) / args.sessions
+    print(f"\nSession total: {total_full / args.sessions:.0f} -> {total_compacted / args.sessions:.0f} tokens "
+          f"({100 * (1 - total_compacted / total_full):.1f}% fewer), {summaries:.0f} summary updates per session")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--every", type=int, default=5, help="print every Nth turn")
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Report import-time cost of the agent modules.
+
+Runs `python -X importtime` for each module in a fresh interpreter (from the
+`agent/` directory) and prints the slowest imports by cumulative time.
+
+Usage:
+    python scripts/profile-imports.py [module ...] [--top N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, Tuple
+
+AGENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent")
+DEFAULT_MODULES = ["main", "agent_registry", "posts_generator_agent", "stack_agent"]
+
+
+# Parse "import time: self [us] | cumulative | imported package" lines
+def _parse_importtime(stderr: str) -> List[Tuple[int, int, str]]:
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0].strip())
+            cumulative_us = int(parts[1].strip())
+        except ValueError:
+            continue
+        rows.append((self_us, cumulative_us, parts[2].rstrip()))
+    return rows
+
+
+# Nesting depth encoded by the indentation importtime puts before each name
+def _depth(name: str) -> int:
+    return (len(name) - len(name.lstrip()) - 1) // 2
+
+
+def profile_module(module: str, top: int) -> None:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=AGENT_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    rows = _parse_importtime(proc.stderr)
+    if proc.returncode != 0 or not rows:
+        print(f"== {module}: import failed (exit {proc.returncode})")
+        print(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "")
+        return
+
+    total_us = rows[-1][1]
+    print(f"== {module}: {total_us / 1000:.1f} ms total, {len(rows)} modules")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    # Report the module and its direct imports so nested costs aren't counted twice
+    shallow = [r for r in rows if _depth(r[2]) <= 1]
+    for self_us, cumulative_us, name in sorted(shallow, key=lambda r: -r[1])[:top]:
+        print(f"{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {name.strip()}")
+    print()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    for module in args.modules:
+        profile_module(module, args.top)
+
+
+if __name__ == "__main__":
+    main()